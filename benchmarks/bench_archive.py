@@ -0,0 +1,157 @@
+# benchmarks/bench_archive.py
+#
+# Архивация закрытых тикетов (bot/archive.py) на синтетической базе: по умолчанию
+# 1 000 000 тикетов (95% закрыты в течение последнего года, остальные open / in_progress)
+# и по сообщению переписки на тикет.
+# Печатает число строк в горячих таблицах и задержку горячих запросов до и после,
+# скорость архивации и самую долгую транзакцию (столько держится блокировка записи).
+# Архивация идёт в два запуска — первый прерывается после --first-batches пачек,
+# второй доделывает остальное.
+#
+# Запуск: python -m benchmarks.bench_archive [--tickets 1000000]
+
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.common import percentile, reset_db
+
+from sqlalchemy import func, select
+
+from bot.archive import Archiver
+from bot.crud import (
+    count_tickets_by_status,
+    get_active_ticket_by_user,
+    get_open_tickets,
+    get_ticket_by_id,
+    get_ticket_messages,
+    get_tickets_by_operator,
+    get_or_create_company
+)
+from bot.database import async_session, engine
+from bot.models import ArchivedTicket, ArchivedTicketMessage, Ticket, TicketMessage
+
+N_USERS = 200_000
+N_OPERATORS = 50
+CHUNK = 20_000
+QUERY_RUNS = 300
+
+FIRST_USER_ID = 1_000_000
+FIRST_OPERATOR_ID = 500
+
+
+async def populate(n_tickets: int) -> None:
+    await reset_db()
+    async with async_session() as session:
+        company = await get_or_create_company(session, "bench")
+        await session.commit()
+    rng = random.Random(1)
+    now = datetime.now(timezone.utc)
+    for start in range(0, n_tickets, CHUNK):
+        tickets, messages = [], []
+        for ticket_id in range(start + 1, min(start + CHUNK, n_tickets) + 1):
+            user_id = str(FIRST_USER_ID + rng.randrange(N_USERS))
+            operator_id = str(FIRST_OPERATOR_ID + rng.randrange(N_OPERATORS))
+            roll = rng.random()
+            if roll < 0.02:
+                status, operator_id, age = "open", None, rng.uniform(0, 1)
+            elif roll < 0.05:
+                status, age = "in_progress", rng.uniform(0, 3)
+            else:
+                status, age = "closed", rng.uniform(0, 365)
+            updated = now - timedelta(days=age)
+            tickets.append({
+                "id": ticket_id, "company_id": company.id, "user_id": user_id, "operator_id": operator_id,
+                "question_text": f"Не работает оплата, заказ {ticket_id}", "status": status,
+                "created_at": updated - timedelta(hours=1), "updated_at": updated,
+            })
+            messages.append({
+                "ticket_id": ticket_id, "direction": "to_operator", "sender_id": user_id,
+                "text": "Подробности проблемы", "created_at": updated,
+            })
+        async with engine.begin() as conn:
+            await conn.execute(Ticket.__table__.insert(), tickets)
+            await conn.execute(TicketMessage.__table__.insert(), messages)
+
+
+async def row_counts() -> dict:
+    async with async_session() as session:
+        return {
+            model.__tablename__: await session.scalar(select(func.count()).select_from(model))
+            for model in (Ticket, TicketMessage, ArchivedTicket, ArchivedTicketMessage)
+        }
+
+
+async def hot_queries() -> dict:
+    rng = random.Random(2)
+    async with async_session() as session:
+        open_ids = (await session.execute(
+            select(Ticket.id).where(Ticket.status != "closed").limit(1000)
+        )).scalars().all()
+        queries = {
+            "get_open_tickets": lambda: get_open_tickets(session, 1),
+            "get_active_ticket_by_user": lambda: get_active_ticket_by_user(
+                session, str(FIRST_USER_ID + rng.randrange(N_USERS))),
+            "get_tickets_by_operator": lambda: get_tickets_by_operator(
+                session, str(FIRST_OPERATOR_ID + rng.randrange(N_OPERATORS)), 1),
+            "get_ticket_by_id": lambda: get_ticket_by_id(session, rng.choice(open_ids)),
+            "get_ticket_messages": lambda: get_ticket_messages(session, rng.choice(open_ids), 5),
+            "count_tickets_by_status": lambda: count_tickets_by_status(session),
+        }
+        results = {}
+        for name, query in queries.items():
+            runs = QUERY_RUNS if name != "count_tickets_by_status" else 10
+            samples = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                await query()
+                samples.append(time.perf_counter() - start)
+                session.expunge_all()
+            results[name] = (percentile(samples, 50), percentile(samples, 99))
+        return results
+
+
+async def main(args):
+    print(f"Populating {args.tickets:,} tickets...")
+    start = time.perf_counter()
+    await populate(args.tickets)
+    print(f"  done in {time.perf_counter() - start:.0f}s")
+
+    counts_before = await row_counts()
+    latency_before = await hot_queries()
+
+    archiver = Archiver(batch_size=args.batch_size)
+    start = time.perf_counter()
+    first = await archiver.run_once(max_batches=args.first_batches)
+    longest = archiver.longest_batch
+    rest = await archiver.run_once()
+    elapsed = time.perf_counter() - start
+    longest = max(longest, archiver.longest_batch)
+    archived = first + rest
+
+    counts_after = await row_counts()
+    latency_after = await hot_queries()
+
+    print()
+    print(f"archived {archived:,} tickets in {elapsed:.1f}s ({archived / elapsed:,.0f} tickets/s); "
+          f"first run stopped after {args.first_batches} batches ({first:,} tickets), second finished the rest")
+    print(f"batch size {args.batch_size}, longest transaction {longest * 1e3:.1f} ms")
+    print()
+    print(f"{'table':<26}{'before':>12}{'after':>12}")
+    for table in counts_before:
+        print(f"{table:<26}{counts_before[table]:>12,}{counts_after[table]:>12,}")
+    print()
+    print(f"{'query':<28}{'p50 before':>12}{'p50 after':>12}{'p99 before':>12}{'p99 after':>12}")
+    for name, (p50, p99) in latency_before.items():
+        a50, a99 = latency_after[name]
+        print(f"{name:<28}{p50 * 1e3:>10.3f}ms{a50 * 1e3:>10.3f}ms{p99 * 1e3:>10.3f}ms{a99 * 1e3:>10.3f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Архивация закрытых тикетов на синтетической базе")
+    parser.add_argument("--tickets", type=int, default=1_000_000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--first-batches", type=int, default=100)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,149 @@
+# benchmarks/bench_assignment.py
+#
+# 1) Стоимость выбора оператора в AssignmentEngine (bot/assignment.py, min-куча)
+#    против линейного поиска наименее загруженного — на 10…10 000 операторов.
+# 2) Событийная симуляция потока тикетов (виртуальное время, без БД и Telegram):
+#    broadcast   — как сейчас: уведомление всем операторам, кто первым нажал «Принять»;
+#    auto-assign — AssignmentEngine сразу назначает наименее загруженного, уведомляется
+#                  один; если все заняты — рассылка всем, как в broadcast.
+#    В обоих режимах освободившийся оператор через время реакции берёт самый старый
+#    открытый тикет из списка. Печатает уведомлений и «холостых» нажатий на тикет
+#    и время до назначения (p50/p99).
+#
+# Запуск: python -m benchmarks.bench_assignment
+
+import heapq
+import itertools
+import random
+import statistics
+import time
+from collections import deque
+
+from benchmarks.common import percentile
+
+from bot.assignment import AssignmentEngine
+
+N_OPERATORS = 20
+CAPACITY = 3
+N_TICKETS = 5000
+ARRIVAL_RATE = 0.8        # тикетов в секунду
+HANDLING_TIME = 60.0      # среднее время работы над тикетом, сек
+REACTION_TIME = 10.0      # среднее время реакции оператора на уведомление, сек
+
+
+def bench_pick():
+    print(f"{'operators':>10}{'heap pick+update':>20}{'linear scan':>14}")
+    for n in (10, 100, 1000, 10_000):
+        rng = random.Random(n)
+        engine = AssignmentEngine(capacity=10 ** 9)
+        engine.set_operators(frozenset(range(n)))
+        load = [0] * n
+        ticket_ids = itertools.count()
+        active = deque()
+        for _ in range(n * 2):
+            op = engine.pick()
+            tid = next(ticket_ids)
+            engine.add_ticket(op, tid)
+            active.append(tid)
+
+        # Установившийся поток: назначить тикет и закрыть случайный из старых
+        rounds = 20_000
+        start = time.perf_counter()
+        for _ in range(rounds):
+            op = engine.pick()
+            tid = next(ticket_ids)
+            engine.add_ticket(op, tid)
+            active.append(tid)
+            engine.remove_ticket(active.popleft())
+        heap_us = (time.perf_counter() - start) / rounds * 1e6
+
+        start = time.perf_counter()
+        for _ in range(rounds):
+            op = min(range(n), key=load.__getitem__)
+            load[op] += 1
+            load[rng.randrange(n)] -= 1
+        linear_us = (time.perf_counter() - start) / rounds * 1e6
+        print(f"{n:>10}{heap_us:>18.2f}µs{linear_us:>12.2f}µs")
+
+
+def simulate(mode: str, seed: int = 1) -> dict:
+    rng = random.Random(seed)
+    engine = AssignmentEngine(capacity=CAPACITY)
+    engine.set_operators(frozenset(range(N_OPERATORS)))
+    events = []
+    order = itertools.count()
+
+    def schedule(at: float, kind: str, *data):
+        heapq.heappush(events, (at, next(order), kind, data))
+
+    created = {}
+    open_tickets = {}          # упорядочен по времени создания
+    waits = []
+    notifications = wasted_clicks = 0
+
+    def assign(ticket_id: int, op: int, now: float):
+        del open_tickets[ticket_id]
+        waits.append(now - created[ticket_id])
+        engine.add_ticket(op, ticket_id)
+        schedule(now + rng.expovariate(1 / HANDLING_TIME), "close", op, ticket_id)
+
+    now = 0.0
+    for ticket_id in range(N_TICKETS):
+        now += rng.expovariate(ARRIVAL_RATE)
+        schedule(now, "arrival", ticket_id)
+
+    while events:
+        now, _, kind, data = heapq.heappop(events)
+        if kind == "arrival":
+            (ticket_id,) = data
+            created[ticket_id] = now
+            open_tickets[ticket_id] = None
+            if mode == "auto-assign":
+                op = engine.pick()
+                if op is not None:
+                    notifications += 1
+                    assign(ticket_id, op, now)
+                    continue
+            notifications += N_OPERATORS
+            for op in range(N_OPERATORS):
+                if engine.load(op) < CAPACITY:
+                    schedule(now + rng.expovariate(1 / REACTION_TIME), "click", op, ticket_id)
+        elif kind == "click":
+            op, ticket_id = data
+            if ticket_id not in open_tickets:
+                wasted_clicks += 1          # «Этот тикет уже взят или закрыт.»
+            elif engine.load(op) < CAPACITY:
+                assign(ticket_id, op, now)
+        elif kind == "close":
+            op, ticket_id = data
+            engine.remove_ticket(ticket_id)
+            if open_tickets:
+                schedule(now + rng.expovariate(1 / REACTION_TIME), "pull", op)
+        elif kind == "pull":
+            (op,) = data
+            if open_tickets and engine.load(op) < CAPACITY:
+                assign(next(iter(open_tickets)), op, now)
+
+    return {
+        "notifications": notifications / N_TICKETS,
+        "wasted": wasted_clicks / N_TICKETS,
+        "p50": percentile(waits, 50),
+        "p99": percentile(waits, 99),
+        "mean": statistics.mean(waits),
+    }
+
+
+def main():
+    bench_pick()
+    print()
+    print(f"{N_TICKETS} tickets, {N_OPERATORS} operators × capacity {CAPACITY}, "
+          f"{ARRIVAL_RATE}/s arrivals, {HANDLING_TIME:.0f}s handling, {REACTION_TIME:.0f}s reaction")
+    print(f"{'mode':<14}{'notif/ticket':>14}{'wasted clicks':>15}{'wait p50':>10}{'wait p99':>10}{'mean':>8}")
+    for mode in ("broadcast", "auto-assign"):
+        r = simulate(mode)
+        print(f"{mode:<14}{r['notifications']:>14.2f}{r['wasted']:>15.2f}"
+              f"{r['p50']:>9.1f}s{r['p99']:>9.1f}s{r['mean']:>7.1f}s")
+
+
+if __name__ == "__main__":
+    main()
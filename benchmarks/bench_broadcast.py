@@ -0,0 +1,65 @@
+# benchmarks/bench_broadcast.py
+#
+# Рассылка уведомления о новом тикете 500 операторам через FakeSession
+# (каждый запрос «идёт» LATENCY секунд, 2% операторов заблокировали бота):
+#   sequential           — прежний цикл await send_message по одному;
+#   broadcaster          — bot/broadcaster.py с лимитами Telegram (30/с);
+#   broadcaster no-limit — тот же сервис без rate limit, только ограничение concurrency.
+# Для broadcaster отдельно показано, сколько ждёт клиент (schedule() не блокирует хэндлер).
+#
+# Запуск: python -m benchmarks.bench_broadcast [N_OPERATORS]
+
+import asyncio
+import sys
+import time
+
+from benchmarks.common import FakeSession
+
+from aiogram import Bot
+
+from bot.broadcaster import Broadcaster
+
+LATENCY = 0.03
+
+
+async def sequential(bot: Bot, chat_ids: list[int]) -> None:
+    for chat_id in chat_ids:
+        try:
+            await bot.send_message(chat_id=chat_id, text="📥 Новый тикет")
+        except Exception:
+            continue
+
+
+async def run(name: str, chat_ids: list[int], forbidden: frozenset, broadcaster=None) -> None:
+    session = FakeSession(latency=LATENCY, forbidden_chats=forbidden)
+    bot = Bot(token="42:BENCHMARK-TOKEN", session=session)
+    start = time.perf_counter()
+    if broadcaster is None:
+        await sequential(bot, chat_ids)
+        handler_time = time.perf_counter() - start
+    else:
+        task = broadcaster.schedule(bot, chat_ids, "📥 Новый тикет")
+        handler_time = time.perf_counter() - start
+        await task
+    total = time.perf_counter() - start
+    print(
+        f"{name:<24} customer waits {handler_time * 1000:9.1f}ms, "
+        f"fan-out done in {total:6.2f}s, api calls={len(session.calls)}"
+    )
+
+
+async def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    chat_ids = list(range(100_000, 100_000 + n))
+    forbidden = frozenset(chat_ids[::50])
+    print(f"{n} operators, {LATENCY * 1000:.0f}ms per API call, {len(forbidden)} blocked the bot")
+    await run("sequential", chat_ids, forbidden)
+    await run("broadcaster", chat_ids, forbidden, Broadcaster())
+    await run(
+        "broadcaster no-limit", chat_ids, forbidden,
+        Broadcaster(concurrency=50, global_rate=1e9, per_chat_rate=1e9),
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
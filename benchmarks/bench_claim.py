@@ -0,0 +1,79 @@
+# benchmarks/bench_claim.py
+#
+# Стресс-тест «одновременного нажатия ✅ Принять тикет»: на каждый тикет
+# CONTENDERS операторов одновременно пытаются его взять.
+#   read-then-write — прежний путь: get_ticket_by_id, проверка status в Python, assign_ticket;
+#   claim_ticket    — один UPDATE ... WHERE status='open' RETURNING.
+# Печатает, сколько тикетов получили больше одного «победителя», и пропускную способность.
+# Код выхода 1, если claim_ticket хоть раз дал не ровно одного победителя.
+#
+# Запуск: python -m benchmarks.bench_claim
+
+import asyncio
+import sys
+import time
+
+from benchmarks.common import reset_db
+
+from bot.crud import assign_ticket, claim_ticket, create_ticket, get_or_create_company, get_ticket_by_id
+from bot.database import async_session
+
+N_TICKETS = 20
+CONTENDERS = 200
+
+
+async def legacy_claim(ticket_id: int, company_id: int, operator_id: str) -> bool:
+    async with async_session() as session:
+        ticket = await get_ticket_by_id(session, ticket_id)
+        if not ticket or ticket.status != "open":
+            return False
+        await assign_ticket(session, ticket_id, operator_id)
+        await session.commit()
+        return True
+
+
+async def atomic_claim(ticket_id: int, company_id: int, operator_id: str) -> bool:
+    async with async_session() as session:
+        claimed = await claim_ticket(session, ticket_id, company_id, operator_id)
+        await session.commit()
+        return claimed is not None
+
+
+async def run(name: str, claim) -> bool:
+    async with async_session() as session:
+        company = await get_or_create_company(session, "claims")
+        ids = [
+            (await create_ticket(session, company.id, user_id=str(1000 + i), question_text="help")).id
+            for i in range(N_TICKETS)
+        ]
+        await session.commit()
+
+    multi_winner = 0
+    no_winner = 0
+    start = time.perf_counter()
+    for ticket_id in ids:
+        results = await asyncio.gather(
+            *(claim(ticket_id, company.id, str(500 + op)) for op in range(CONTENDERS))
+        )
+        winners = sum(results)
+        multi_winner += winners > 1
+        no_winner += winners == 0
+    elapsed = time.perf_counter() - start
+    attempts = N_TICKETS * CONTENDERS
+    print(
+        f"{name:<16} tickets with >1 winner: {multi_winner}/{N_TICKETS}, with 0: {no_winner}; "
+        f"{attempts} claims in {elapsed:5.2f}s = {attempts / elapsed:7.1f} claims/s"
+    )
+    return multi_winner == 0 and no_winner == 0
+
+
+async def main() -> int:
+    await reset_db()
+    await run("read-then-write", legacy_claim)
+    await reset_db()
+    ok = await run("claim_ticket", atomic_claim)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,88 @@
+# benchmarks/bench_cluster.py
+#
+# Масштабирование bot.cluster по числу процессов-воркеров: 1, 2, 4, 8.
+# Супервизор раздаёт синтетические апдейты воркерам по chat_id (без Telegram),
+# воркеры отвечают в FakeSession с задержкой API_LATENCY. Сценарий клиента:
+#   «📚 FAQ» → поисковый запрос (FTS + сборка клавиатуры) → «📚 FAQ» → «ℹ️ О компании».
+# Поиск срабатывает, только если «📚 FAQ» того же чата уже обработан, поэтому
+# нарушение порядка внутри чата видно как ответ «не распознал запрос».
+#
+# Запуск: python -m benchmarks.bench_cluster
+
+import asyncio
+import logging
+import multiprocessing
+import time
+
+from benchmarks.common import FakeSession, message_update, reset_db
+
+from aiogram import Bot
+from aiogram.methods import SendMessage
+
+from bot.cluster import Supervisor
+from bot.crud import create_faq_entry, get_or_create_company
+from bot.database import async_session
+
+WORKER_COUNTS = (1, 2, 4, 8)
+N_CUSTOMERS = 500
+N_FAQ = 1000
+API_LATENCY = 0.01
+
+
+class OrderCheckingSession(FakeSession):
+    """FakeSession, которая при закрытии сообщает об ответах «не распознал запрос»."""
+
+    async def close(self):
+        unrecognized = sum(
+            isinstance(c, SendMessage) and c.text.startswith("Извините, я не распознал")
+            for c in self.calls
+        )
+        if unrecognized:
+            print(f"  !! {unrecognized} updates were handled out of order")
+
+
+def fake_bot() -> Bot:
+    # Вызывается в процессе-воркере (поэтому функция уровня модуля)
+    return Bot(token="42:BENCHMARK-TOKEN", session=OrderCheckingSession(latency=API_LATENCY))
+
+
+def make_updates(first_id: int):
+    updates = []
+    for step, text in enumerate(("📚 FAQ", "оплат", "📚 FAQ", "ℹ️ О компании")):
+        for customer in range(N_CUSTOMERS):
+            update_id = first_id + step * N_CUSTOMERS + customer
+            updates.append(message_update(update_id, 10_000 + customer, text))
+    return [u.model_dump(mode="json", exclude_none=True) for u in updates]
+
+
+async def main():
+    logging.basicConfig(level=logging.WARNING)
+    await reset_db()
+    async with async_session() as session:
+        company = await get_or_create_company(session, "bench")
+        for i in range(N_FAQ):
+            topic = ("оплату", "доставку", "возврат", "аккаунт")[i % 4]
+            await create_faq_entry(session, company.id, f"Вопрос {i} про {topic}", f"Ответ {i}")
+        await session.commit()
+
+    print(f"{N_CUSTOMERS * 4} updates per run, {N_CUSTOMERS} chats, "
+          f"Bot API latency {API_LATENCY * 1e3:.0f}ms, {multiprocessing.cpu_count()} CPU(s)")
+    first_id = 1
+    for workers in WORKER_COUNTS:
+        supervisor = Supervisor(workers, bot_factory=fake_bot, log_level=logging.WARNING)
+        await supervisor.start()
+        updates = make_updates(first_id)
+        first_id += len(updates)
+
+        start = time.perf_counter()
+        for update in updates:
+            await supervisor.dispatch(update)
+        await supervisor.drain()
+        elapsed = time.perf_counter() - start
+
+        await supervisor.stop()
+        print(f"workers={workers:<3} {elapsed:6.2f}s  {len(updates) / elapsed:8,.0f} updates/s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
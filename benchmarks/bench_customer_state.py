@@ -0,0 +1,82 @@
+# benchmarks/bench_customer_state.py
+#
+# Сколько записей в БД стоит состояние клиента в сценарии FAQ:
+#   «📚 FAQ» → выбор вопроса → «📚 FAQ» → «Назад».
+# Считаются INSERT/UPDATE/DELETE и COMMIT, выполненные синхронно внутри апдейтов
+# (их ждёт клиент), и отдельно — фоновой записью FSM-хранилища (dp.storage.flush()).
+#
+# Запуск: python -m benchmarks.bench_customer_state
+
+import asyncio
+import time
+
+from benchmarks.common import FakeSession, callback_update, message_update, reset_db
+
+from aiogram import Bot
+from sqlalchemy import event
+
+from bot.crud import create_faq_entry, get_or_create_company
+from bot.database import async_session, engine
+from bot.main import create_dispatcher
+
+N_CUSTOMERS = 200
+FIRST_CUSTOMER_ID = 10_000
+
+
+def interaction(update_id: int, user_id: int):
+    return [
+        message_update(update_id, user_id, "📚 FAQ"),
+        callback_update(update_id + 1, user_id, "faq:1"),
+        message_update(update_id + 2, user_id, "📚 FAQ"),
+        callback_update(update_id + 3, user_id, "faq:back"),
+    ]
+
+
+async def main():
+    await reset_db()
+    async with async_session() as session:
+        company = await get_or_create_company(session, "bench")
+        await create_faq_entry(session, company.id, "Как оплатить?", "Картой")
+        await session.commit()
+
+    counters = {"writes": 0, "commits": 0}
+
+    def on_query(conn, cursor, statement, *args):
+        if statement.lstrip().split(None, 1)[0].upper() in ("INSERT", "UPDATE", "DELETE"):
+            counters["writes"] += 1
+
+    def on_commit(*args):
+        counters["commits"] += 1
+
+    bot = Bot(token="42:BENCHMARK-TOKEN", session=FakeSession())
+    dp = create_dispatcher()
+    # Прогрев: кэши ролей и FAQ
+    for update in interaction(1, FIRST_CUSTOMER_ID - 1):
+        await dp.feed_update(bot, update)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", on_query)
+    event.listen(engine.sync_engine, "commit", on_commit)
+
+    start = time.perf_counter()
+    for i in range(N_CUSTOMERS):
+        for update in interaction(100 + i * 4, FIRST_CUSTOMER_ID + i):
+            await dp.feed_update(bot, update)
+    elapsed = time.perf_counter() - start
+    inline = dict(counters)
+
+    flush = getattr(dp.storage, "flush", None)
+    if flush is not None:
+        await flush()
+    background = {k: counters[k] - inline[k] for k in counters}
+
+    print(f"{N_CUSTOMERS} customers x (FAQ -> pick -> FAQ -> back), {elapsed * 1e3 / N_CUSTOMERS:.2f}ms per interaction")
+    # Периодический flush FSM-хранилища, сработавший во время прогона, попадает в первую строку
+    print(f"{'':<30}{'writes':>8}{'commits':>9}{'per interaction':>18}")
+    for name, counts in (("during updates", inline), ("final storage flush", background)):
+        print(f"{name:<30}{counts['writes']:>8}{counts['commits']:>9}"
+              f"{counts['writes'] / N_CUSTOMERS:>9.3f} / {counts['commits'] / N_CUSTOMERS:.3f}")
+    await dp.storage.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,226 @@
+# benchmarks/bench_e2e.py
+#
+# Сквозной бенчмарк: настоящий Dispatcher из bot.main.create_dispatcher, синтетические
+# Update через dp.feed_update, Bot с FakeSession (записывает вызовы API), временная
+# SQLite-база. Сценарии идут подряд на одной базе, как день работы поддержки:
+#   faq browsing     — кнопка FAQ, поиск по слову, открытие ответа;
+#   ticket creation  — «Связаться с оператором» + текст, рассылка всем операторам;
+#   claim            — операторы принимают тикеты;
+#   relay burst      — клиенты и операторы переписываются;
+#   close            — операторы закрывают тикеты.
+# Апдейты одного шага сценария подаются волнами по CONCURRENCY одновременно.
+# Метод API, возвращённый хэндлером, отправляется, как при polling. Время сценария
+# включает фоновую работу, которую он породил (рассылки, outbox, журнал переписки;
+# лимиты рассылки Telegram сняты). По каждому сценарию: updates/s, p50/p99 задержки
+# апдейта, SQL-запросов и вызовов Bot API на апдейт.
+#
+# Результаты сравниваются с benchmarks/results/bench_e2e_baseline.json.
+#
+# Запуск: python -m benchmarks.bench_e2e                   — прогон и сравнение с базовой линией
+#         python -m benchmarks.bench_e2e --save-baseline   — записать результаты как базовую линию
+
+import argparse
+import asyncio
+import json
+import time
+from pathlib import Path
+
+from benchmarks.common import FakeSession, callback_update, message_update, percentile, reset_db
+
+from aiogram import Bot
+from aiogram.methods import TelegramMethod
+from sqlalchemy import event
+
+from bot.broadcaster import TokenBucket, broadcaster
+from bot.crud import add_operator, count_outbox_messages, create_faq_entry, get_or_create_company
+from bot.database import async_session, engine
+from bot.main import create_dispatcher
+from bot.transcript import transcript
+
+BASELINE_FILE = Path(__file__).parent / "results" / "bench_e2e_baseline.json"
+
+N_CUSTOMERS = 200
+N_OPERATORS = 10
+N_FAQ = 50
+RELAY_ROUNDS = 5
+CONCURRENCY = 20
+
+FIRST_CUSTOMER_ID = 10_000
+FIRST_OPERATOR_ID = 500
+
+
+class Harness:
+    """Dispatcher + фейковый Bot + счётчик SQL-запросов; run() прогоняет один сценарий."""
+
+    def __init__(self, latency: float = 0.0):
+        self.fake = FakeSession(latency=latency)
+        self.bot = Bot(token="42:BENCHMARK-TOKEN", session=self.fake)
+        self.dp = create_dispatcher()
+        self.queries = 0
+        self._update_id = 0
+
+    def _on_query(self, *args):
+        self.queries += 1
+
+    def next_update_id(self) -> int:
+        self._update_id += 1
+        return self._update_id
+
+    async def start(self):
+        # Лимиты Telegram (30 msg/s, 1 msg/s в чат) растянули бы рассылку о 200 тикетах
+        # десяти операторам на минуты — меряем бота, а не лимиты: снимаем их
+        broadcaster.per_chat_interval = 0.0
+        broadcaster._global = TokenBucket(1e9)
+        event.listen(engine.sync_engine, "before_cursor_execute", self._on_query)
+        await self.dp.emit_startup(bot=self.bot, dispatcher=self.dp)
+
+    async def stop(self):
+        await self.dp.emit_shutdown(bot=self.bot, dispatcher=self.dp)
+        event.remove(engine.sync_engine, "before_cursor_execute", self._on_query)
+
+    async def _feed(self, update, samples: list):
+        start = time.perf_counter()
+        result = await self.dp.feed_update(self.bot, update)
+        # Как Dispatcher._process_update при polling: ответ хэндлера уходит отдельным запросом
+        if isinstance(result, TelegramMethod):
+            await self.bot(result)
+        samples.append(time.perf_counter() - start)
+
+    async def settle(self):
+        """Дожидается фоновой работы: рассылок, доставки outbox и записи журнала."""
+        await broadcaster.drain()
+        while True:
+            async with async_session() as session:
+                if not await count_outbox_messages(session):
+                    break
+            await asyncio.sleep(0.005)
+        await transcript.flush()
+
+    async def run(self, name: str, steps: list) -> dict:
+        """steps — список шагов; шаг — список фабрик апдейтов (update_id → Update)."""
+        samples = []
+        queries_before, calls_before = self.queries, len(self.fake.calls)
+        start = time.perf_counter()
+        for step in steps:
+            for i in range(0, len(step), CONCURRENCY):
+                await asyncio.gather(*(
+                    self._feed(make(self.next_update_id()), samples)
+                    for make in step[i:i + CONCURRENCY]
+                ))
+        await self.settle()
+        elapsed = time.perf_counter() - start
+        n = len(samples)
+        return {
+            "scenario": name,
+            "updates": n,
+            "updates_per_sec": round(n / elapsed, 1),
+            "p50_ms": round(percentile(samples, 50) * 1e3, 2),
+            "p99_ms": round(percentile(samples, 99) * 1e3, 2),
+            "queries_per_update": round((self.queries - queries_before) / n, 2),
+            "api_calls_per_update": round((len(self.fake.calls) - calls_before) / n, 2),
+        }
+
+
+def customers():
+    return range(FIRST_CUSTOMER_ID, FIRST_CUSTOMER_ID + N_CUSTOMERS)
+
+
+def operator_for(ticket_id: int) -> int:
+    return FIRST_OPERATOR_ID + ticket_id % N_OPERATORS
+
+
+def message(user_id: int, text: str):
+    return lambda update_id: message_update(update_id, user_id, text)
+
+
+def callback(user_id: int, data: str):
+    return lambda update_id: callback_update(update_id, user_id, data)
+
+
+def scenarios() -> list:
+    tickets = range(1, N_CUSTOMERS + 1)  # по одному тикету на клиента, id по порядку создания
+    operators = range(FIRST_OPERATOR_ID, FIRST_OPERATOR_ID + N_OPERATORS)
+    relay_steps = []
+    for r in range(RELAY_ROUNDS):
+        relay_steps.append([message(c, f"вопрос {r}") for c in customers()])
+        # Оператор отвечает в свой текущий тикет — последний принятый
+        relay_steps.append([message(op, f"ответ {r}") for op in operators])
+    return [
+        ("faq browsing", [
+            [message(c, "📚 FAQ") for c in customers()],
+            [message(c, "оплата") for c in customers()],
+            [callback(c, f"faq:{1 + c % N_FAQ}") for c in customers()],
+        ]),
+        ("ticket creation", [
+            [message(c, "👨‍💻 Связаться с оператором") for c in customers()],
+            [message(c, f"Не работает оплата, клиент {c}") for c in customers()],
+        ]),
+        ("claim", [
+            [callback(operator_for(t), f"ticket_action:assign:{t}") for t in tickets],
+        ]),
+        ("relay burst", relay_steps),
+        ("close", [
+            [callback(operator_for(t), f"ticket_action:close:{t}") for t in tickets],
+        ]),
+    ]
+
+
+async def prepare():
+    await reset_db()
+    async with async_session() as session:
+        company = await get_or_create_company(session, "bench")
+        for op in range(N_OPERATORS):
+            await add_operator(session, company.id, telegram_id=str(FIRST_OPERATOR_ID + op), full_name=f"op{op}")
+        for i in range(N_FAQ):
+            await create_faq_entry(session, company.id, f"Вопрос {i}: оплата и доставка", f"Ответ {i}")
+        await session.commit()
+
+
+def print_results(results: list, baseline: dict):
+    print(f"{'scenario':<18}{'updates':>8}{'upd/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'sql/upd':>9}{'api/upd':>9}"
+          f"{'  vs baseline (upd/s, p99)':<}")
+    for r in results:
+        line = (f"{r['scenario']:<18}{r['updates']:>8}{r['updates_per_sec']:>9,.0f}{r['p50_ms']:>9.2f}"
+                f"{r['p99_ms']:>9.2f}{r['queries_per_update']:>9.2f}{r['api_calls_per_update']:>9.2f}")
+        base = baseline.get(r["scenario"])
+        if base:
+            throughput = (r["updates_per_sec"] / base["updates_per_sec"] - 1) * 100
+            p99 = (r["p99_ms"] / base["p99_ms"] - 1) * 100
+            line += f"  {throughput:+6.1f}% {p99:+6.1f}%"
+            if r["queries_per_update"] > base["queries_per_update"]:
+                line += f"  sql/upd was {base['queries_per_update']:.2f}"
+        print(line)
+
+
+async def main(save_baseline: bool, latency_ms: float):
+    await prepare()
+    harness = Harness(latency=latency_ms / 1e3)
+    await harness.start()
+    results = []
+    for name, steps in scenarios():
+        results.append(await harness.run(name, steps))
+    await harness.stop()
+
+    baseline = {}
+    if BASELINE_FILE.exists() and not save_baseline:
+        baseline = {r["scenario"]: r for r in json.loads(BASELINE_FILE.read_text(encoding="utf-8"))["results"]}
+    print_results(results, baseline)
+
+    if save_baseline:
+        BASELINE_FILE.parent.mkdir(exist_ok=True)
+        BASELINE_FILE.write_text(json.dumps({
+            "config": {
+                "customers": N_CUSTOMERS, "operators": N_OPERATORS, "faq": N_FAQ,
+                "relay_rounds": RELAY_ROUNDS, "concurrency": CONCURRENCY, "api_latency_ms": latency_ms,
+            },
+            "results": results,
+        }, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        print(f"Baseline written to {BASELINE_FILE}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Сквозной бенчмарк Dispatcher")
+    parser.add_argument("--save-baseline", action="store_true", help="записать результаты как базовую линию")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="имитируемая задержка Bot API, мс")
+    args = parser.parse_args()
+    asyncio.run(main(args.save_baseline, args.latency_ms))
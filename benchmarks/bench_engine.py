@@ -0,0 +1,89 @@
+# benchmarks/bench_engine.py
+#
+# Пропускная способность commit на пути создания тикета (create_ticket + commit,
+# как в хэндлере клиента) для разных профилей движка SQLite:
+#   default           — create_async_engine() без настроек: rollback-журнал, synchronous=FULL;
+#   WAL, sync=FULL    — build_engine() с журналом WAL, но fsync на каждый commit;
+#   WAL, sync=NORMAL  — build_engine() с настройками по умолчанию из BotConfig.
+# Каждый профиль — в своём файле базы (режим WAL сохраняется в файле).
+# Также печатает задержку первого запроса с прогревом пула и без него.
+#
+# Запуск: python -m benchmarks.bench_engine
+
+import asyncio
+import time
+
+from benchmarks.common import BENCH_DIR
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+import bot.models  # noqa: F401 — регистрирует таблицы в Base.metadata
+from bot.config import config
+from bot.crud import create_ticket, get_or_create_company
+from bot.database import Base, build_engine
+
+TICKETS = 2000
+CONCURRENCY = (1, 20)
+
+PROFILES = {
+    "default": lambda url: create_async_engine(url, future=True),
+    "WAL, sync=FULL": lambda url: build_engine(url, config.model_copy(update={"sqlite_synchronous": "FULL"})),
+    "WAL, sync=NORMAL": lambda url: build_engine(url, config),
+}
+
+
+async def create_tickets(session_factory, company_id: int, concurrency: int) -> float:
+    per_worker = TICKETS // concurrency
+
+    async def worker(w: int):
+        for i in range(per_worker):
+            async with session_factory() as session:
+                await create_ticket(session, company_id, str(w * per_worker + i), "помогите")
+                await session.commit()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(w) for w in range(concurrency)))
+    return time.perf_counter() - start
+
+
+async def first_query_ms(engine) -> float:
+    start = time.perf_counter()
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+    return (time.perf_counter() - start) * 1e3
+
+
+async def main():
+    print(f"create_ticket + commit, {TICKETS} tickets per run")
+    for n, (name, factory) in enumerate(PROFILES.items()):
+        url = f"sqlite+aiosqlite:///{BENCH_DIR}/engine_{n}.db"
+        engine = factory(url)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        session_factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+        async with session_factory() as session:
+            company = await get_or_create_company(session, "bench")
+            await session.commit()
+
+        for concurrency in CONCURRENCY:
+            elapsed = await create_tickets(session_factory, company.id, concurrency)
+            print(f"{name:<20} concurrency={concurrency:<3} {TICKETS / elapsed:8,.0f} commits/s")
+        await engine.dispose()
+
+    # Первый запрос после старта: connect + PRAGMA на пути апдейта или заранее
+    url = f"sqlite+aiosqlite:///{BENCH_DIR}/engine_{len(PROFILES) - 1}.db"
+    engine = build_engine(url, config)
+    print(f"{'first query, cold pool':<32} {await first_query_ms(engine):8.2f} ms")
+    await engine.dispose()
+
+    engine = build_engine(url, config)
+    async with engine.connect() as conn:  # то, что делает warm_up_pool()
+        await conn.execute(text("SELECT 1"))
+    print(f"{'first query, warmed pool':<32} {await first_query_ms(engine):8.2f} ms")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,106 @@
+# benchmarks/bench_faq_io.py
+#
+# Массовый импорт / экспорт FAQ (bot/faq_io.py) на 100 000 строк:
+#   • построчно, как /add_faq: create_faq_entry + commit на каждый пункт (на части строк);
+#   • import_faq из CSV и из JSONL — пачки по FAQ_IO_CHUNK строк, executemany;
+#   • export_faq в CSV и в JSONL — курсор с yield_per.
+# Пиковая память (tracemalloc) импорта и экспорта — для 10 000 и 100 000 строк:
+# при потоковой обработке она не должна расти вместе с размером файла.
+#
+# Запуск: python -m benchmarks.bench_faq_io [--rows 100000]
+
+import argparse
+import asyncio
+import csv
+import json
+import time
+import tracemalloc
+from pathlib import Path
+
+from benchmarks.common import BENCH_DIR, reset_db
+
+from bot.crud import create_faq_entry, get_or_create_company
+from bot.database import async_session
+from bot.faq_io import export_faq, import_faq
+
+WORK_DIR = Path(BENCH_DIR)
+ONE_BY_ONE_ROWS = 2000
+
+
+def write_source(rows: int, fmt: str) -> Path:
+    path = WORK_DIR / f"faq_{rows}.{fmt}"
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            writer = csv.writer(f)
+            writer.writerow(("question", "answer"))
+            for i in range(rows):
+                writer.writerow((f"Вопрос {i}: как оплатить заказ?", f"Ответ {i}: картой или по счёту. " * 4))
+        else:
+            for i in range(rows):
+                f.write(json.dumps({"question": f"Вопрос {i}: как оплатить заказ?",
+                                    "answer": f"Ответ {i}: картой или по счёту. " * 4}, ensure_ascii=False) + "\n")
+    return path
+
+
+async def fresh_db() -> int:
+    await reset_db()
+    async with async_session() as session:
+        company = await get_or_create_company(session, "bench")
+        await session.commit()
+    return company.id
+
+
+async def one_by_one(company_id: int) -> float:
+    start = time.perf_counter()
+    for i in range(ONE_BY_ONE_ROWS):
+        async with async_session() as session:
+            await create_faq_entry(session, company_id, f"Вопрос {i}", "Ответ")
+            await session.commit()
+    return ONE_BY_ONE_ROWS / (time.perf_counter() - start)
+
+
+async def timed(coro) -> tuple:
+    start = time.perf_counter()
+    result = await coro
+    return result, time.perf_counter() - start
+
+
+async def peak_memory(coro) -> float:
+    tracemalloc.start()
+    try:
+        await coro
+        return tracemalloc.get_traced_memory()[1] / 2 ** 20
+    finally:
+        tracemalloc.stop()
+
+
+async def main(rows: int):
+    sources = {fmt: write_source(rows, fmt) for fmt in ("csv", "jsonl")}
+
+    company_id = await fresh_db()
+    print(f"{'operation':<34}{'rows':>9}{'seconds':>9}{'rows/s':>10}")
+    rate = await one_by_one(company_id)
+    print(f"{'create_faq_entry + commit':<34}{ONE_BY_ONE_ROWS:>9}{ONE_BY_ONE_ROWS / rate:>9.1f}{rate:>10,.0f}")
+
+    for fmt, path in sources.items():
+        company_id = await fresh_db()
+        result, elapsed = await timed(import_faq(path, company_id))
+        print(f"{'import_faq ' + fmt:<34}{result.imported:>9}{elapsed:>9.1f}{result.imported / elapsed:>10,.0f}")
+    for fmt in ("csv", "jsonl"):
+        count, elapsed = await timed(export_faq(WORK_DIR / f"export.{fmt}", company_id))
+        print(f"{'export_faq ' + fmt:<34}{count:>9}{elapsed:>9.1f}{count / elapsed:>10,.0f}")
+
+    print()
+    print(f"{'peak traced memory, MiB':<34}{'import csv':>12}{'export csv':>12}")
+    for n in sorted({rows // 10, rows}):
+        source = write_source(n, "csv")
+        company_id = await fresh_db()
+        imported = await peak_memory(import_faq(source, company_id))
+        exported = await peak_memory(export_faq(WORK_DIR / "export_mem.csv", company_id))
+        print(f"{f'{n:,} rows':<34}{imported:>12.1f}{exported:>12.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Импорт / экспорт FAQ большими файлами")
+    parser.add_argument("--rows", type=int, default=100_000)
+    asyncio.run(main(parser.parse_args().rows))
@@ -0,0 +1,77 @@
+# benchmarks/bench_faq_search.py
+#
+# Латентность поиска по FAQ на 50k записей:
+#   ilike — прежний полный скан ILIKE '%kw%' по question и answer;
+#   fts   — get_faq_by_keyword (FTS5 + ранжирование + LIMIT).
+#
+# Запуск: python -m benchmarks.bench_faq_search
+
+import asyncio
+import random
+
+from benchmarks.common import BENCH_DIR, report, reset_db, timed
+
+from sqlalchemy import insert, or_, text
+from sqlalchemy.future import select
+
+from bot.crud import get_faq_by_keyword, get_or_create_company
+from bot.database import async_session, engine, init_models
+from bot.models import FAQEntry
+from bot.search import FTS_TABLE
+
+N_ENTRIES = 50_000
+N_QUERIES = 60
+WORDS = [
+    "пароль", "оплата", "доставка", "возврат", "аккаунт", "подписка", "тариф",
+    "ошибка", "приложение", "карта", "заказ", "скидка", "курьер", "договор",
+    "password", "payment", "delivery", "refund", "account", "invoice", "login",
+]
+KEYWORDS = ["пароль", "опл", "доставка курьер", "refund", "invoice login", "тариф"]
+
+
+def _sentence(rnd: random.Random, n: int) -> str:
+    return " ".join(rnd.choice(WORDS) + str(rnd.randint(0, 500)) for _ in range(n))
+
+
+async def legacy_ilike(session, company_id: int, keyword: str):
+    result = await session.execute(
+        select(FAQEntry).where(
+            FAQEntry.company_id == company_id,
+            or_(
+                FAQEntry.question.ilike(f"%{keyword}%"),
+                FAQEntry.answer.ilike(f"%{keyword}%")
+            )
+        )
+    )
+    return result.scalars().all()
+
+
+async def main():
+    await reset_db()
+    rnd = random.Random(42)
+    async with async_session() as session:
+        company = await get_or_create_company(session, "bench")
+        rows = [
+            {"company_id": company.id, "question": _sentence(rnd, 6) + "?", "answer": _sentence(rnd, 30)}
+            for _ in range(N_ENTRIES)
+        ]
+        await session.execute(insert(FAQEntry), rows)
+        await session.commit()
+
+    # Пересоздаём FTS-таблицу, чтобы init_models() заполнил её из faq_entries
+    async with engine.begin() as conn:
+        await conn.execute(text(f"DROP TABLE {FTS_TABLE}"))
+    await init_models()
+
+    print(f"{N_ENTRIES} FAQ entries in {BENCH_DIR}")
+    async with async_session() as session:
+        for name, fn in (("ilike (full scan)", legacy_ilike), ("fts5 ranked, limit=10", get_faq_by_keyword)):
+            samples = await timed(
+                lambda i: fn(session, company.id, KEYWORDS[i % len(KEYWORDS)]),
+                N_QUERIES,
+            )
+            report(name, samples)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
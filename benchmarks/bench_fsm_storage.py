@@ -0,0 +1,84 @@
+# benchmarks/bench_fsm_storage.py
+#
+# Задержки get/set FSM-хранилища:
+#   memory — прежний MemoryStorage (теряет состояние при перезапуске);
+#   sql    — SQLStorage: горячий LRU, холодное чтение (промах → SELECT),
+#            и фоновая запись пачками (flush), которую хэндлер не ждёт.
+# В конце проверяет, что состояние переживает «перезапуск» (новый экземпляр хранилища).
+#
+# Запуск: python -m benchmarks.bench_fsm_storage
+
+import asyncio
+import time
+
+from benchmarks.common import report, reset_db, timed
+
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from bot.fsm_storage import SQLStorage
+from bot.handlers.operator_handlers import OperatorStates
+
+N_KEYS = 5000
+BOT_ID = 42
+
+
+def key(i: int) -> StorageKey:
+    return StorageKey(bot_id=BOT_ID, chat_id=10_000 + i, user_id=10_000 + i)
+
+
+async def bench(name: str, storage) -> None:
+    async def set_both(i: int):
+        await storage.set_state(key(i), OperatorStates.chatting)
+        await storage.update_data(key(i), {"current_ticket": i})
+
+    async def get_both(i: int):
+        await storage.get_state(key(i))
+        await storage.get_data(key(i))
+
+    # FSM-middleware aiogram читает состояние в начале каждого апдейта,
+    # поэтому первое обращение к контексту — всегда чтение
+    report(f"{name}: get_state + get_data (first)", await timed(get_both, N_KEYS))
+    report(f"{name}: set_state + update_data", await timed(set_both, N_KEYS))
+    report(f"{name}: get_state + get_data (hot)", await timed(get_both, N_KEYS))
+
+
+async def main():
+    await reset_db()
+
+    await bench("memory", MemoryStorage())
+
+    storage = SQLStorage(flush_interval=3600)
+    await bench("sql", storage)
+    # В боте это делает фоновая задача по таймеру; здесь сбрасываем всё явно и меряем
+    start = time.perf_counter()
+    written = await storage.flush()
+    elapsed = time.perf_counter() - start
+    print(f"{'sql: final flush (one transaction)':<40} rows={written} "
+          f"{elapsed * 1e3:.1f}ms ({written / elapsed:,.0f} rows/s), "
+          f"total rows written: {storage.writes}")
+    await storage.close()
+
+    # «Перезапуск»: пустой кэш, каждое первое обращение — SELECT
+    restarted = SQLStorage()
+
+    async def get_cold(i: int):
+        await restarted.get_state(key(i))
+        await restarted.get_data(key(i))
+
+    report("sql: get_state + get_data (cold)", await timed(get_cold, N_KEYS))
+    assert await restarted.get_state(key(7)) == OperatorStates.chatting.state
+    assert await restarted.get_data(key(7)) == {"current_ticket": 7}
+    print("state survives restart: ok")
+
+    # Состояние, очищенное через state.clear(), удаляется из таблицы
+    await restarted.set_state(key(7), None)
+    await restarted.set_data(key(7), {})
+    await restarted.close()
+    again = SQLStorage()
+    assert await again.get_state(key(7)) is None
+    print("cleared context removed: ok")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,67 @@
+# benchmarks/bench_outbox.py
+#
+# Outbox: сколько ждёт хэндлер и какая пропускная способность доставки.
+#   inline send    — прежний await bot.send_message прямо в хэндлере;
+#   outbox.enqueue — запись в outbox_messages (то, что теперь делает хэндлер);
+#   drain          — фоновые воркеры отправляют накопленное (workers = 1 / 4 / 16),
+#                    с проверкой, что порядок сообщений внутри каждого чата сохранён.
+#
+# Запуск: python -m benchmarks.bench_outbox
+
+import asyncio
+import time
+
+from benchmarks.common import FakeSession, report, reset_db, timed
+
+from aiogram import Bot
+
+from bot.database import async_session
+from bot.outbox import Outbox
+
+LATENCY = 0.03
+N_MESSAGES = 1000
+N_CHATS = 200
+
+
+async def main():
+    await reset_db()
+    session = FakeSession(latency=LATENCY)
+    bot = Bot(token="42:BENCHMARK-TOKEN", session=session)
+
+    samples = await timed(lambda i: bot.send_message(chat_id=i % N_CHATS, text=f"m{i}"), 100)
+    report("handler: inline send_message", samples)
+    async def enqueue_and_commit(box: Outbox, chat_id: int, text: str):
+        async with async_session() as db:
+            await box.enqueue(db, chat_id, text)
+            await db.commit()
+
+    samples = await timed(lambda i: enqueue_and_commit(Outbox(), i % N_CHATS, f"m{i}"), 100)
+    report("handler: outbox.enqueue + commit", samples)
+    await reset_db()
+
+    for workers in (1, 4, 16):
+        box = Outbox(workers=workers, batch_size=500)
+        async with async_session() as db:
+            for i in range(N_MESSAGES):
+                await box.enqueue(db, i % N_CHATS, str(i))
+            await db.commit()
+
+        session.calls.clear()
+        box._bot = bot
+        start = time.perf_counter()
+        while await box.drain_once():
+            pass
+        elapsed = time.perf_counter() - start
+
+        per_chat: dict[int, list[int]] = {}
+        for call in session.calls:
+            per_chat.setdefault(call.chat_id, []).append(int(call.text))
+        ordered = all(seq == sorted(seq) for seq in per_chat.values())
+        print(
+            f"drain workers={workers:<3} {box.sent} msgs in {elapsed:6.2f}s "
+            f"= {box.sent / elapsed:7.1f} msg/s, per-chat order kept: {ordered}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
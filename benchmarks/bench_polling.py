@@ -0,0 +1,70 @@
+# benchmarks/bench_polling.py
+#
+# Нагрузочный прогон «бот целиком» на одной машине: поддельный Bot API
+# (benchmarks/fake_bot_api.py) с синтетическими клиентами и операторами и настоящий
+# бот в режиме polling (create_bot + create_dispatcher + dp.start_polling), направленный
+# на него через TELEGRAM_API_URL. Бот ходит по HTTP: getUpdates, ответы, рассылки
+# уведомлений операторам, outbox — всё через aiohttp-сессию, как с Telegram.
+# Лимиты рассылки Telegram (1 msg/s в чат) по умолчанию сняты, --telegram-limits их оставляет.
+#
+# Запуск: python -m benchmarks.bench_polling --customers 300 --operators 10 --latency-ms 20 --jitter-ms 10
+
+import argparse
+import asyncio
+import os
+import socket
+import time
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+# До импорта bot.*: config читает TELEGRAM_API_URL при импорте
+PORT = free_port()
+os.environ["TELEGRAM_API_URL"] = f"http://127.0.0.1:{PORT}"
+
+from benchmarks.common import reset_db  # noqa: E402
+from benchmarks.fake_bot_api import add_arguments, build, seed_operators  # noqa: E402
+
+from aiohttp import web  # noqa: E402
+
+from bot.broadcaster import TokenBucket, broadcaster  # noqa: E402
+from bot.main import create_bot, create_dispatcher  # noqa: E402
+
+
+async def main(args):
+    await reset_db()
+    await seed_operators(args.operators)
+    if not args.telegram_limits:
+        broadcaster.per_chat_interval = 0.0
+        broadcaster._global = TokenBucket(1e9)
+
+    api, simulation = build(args)
+    runner = web.AppRunner(api.create_app())
+    await runner.setup()
+    await web.TCPSite(runner, host="127.0.0.1", port=PORT).start()
+
+    bot = create_bot()
+    dp = create_dispatcher()
+    polling = asyncio.create_task(dp.start_polling(bot, handle_signals=False))
+    try:
+        start = time.monotonic()
+        completed = await simulation.run(args.timeout)
+        elapsed = time.monotonic() - start
+        simulation.report(elapsed)
+        print(f"updates generated: {api.pushed}, {api.pushed / elapsed:,.0f} updates/s"
+              + ("" if completed else "  (timeout — не все тикеты закрыты)"))
+    finally:
+        await dp.stop_polling()
+        await polling
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бот в режиме polling против поддельного Bot API")
+    parser.add_argument("--telegram-limits", action="store_true", help="оставить лимиты рассылки Telegram")
+    add_arguments(parser)
+    asyncio.run(main(parser.parse_args()))
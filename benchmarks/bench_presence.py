@@ -0,0 +1,92 @@
+# benchmarks/bench_presence.py
+#
+# Сколько уведомлений о новых тикетах уходит операторам в зависимости от того, какая
+# их доля сейчас не на связи (bot/presence.py). Настоящий Dispatcher (Harness из
+# bench_e2e): часть операторов пишет /online, остальные ни разу не появлялись в боте;
+# затем клиенты создают тикеты. Считаются sendMessage операторам и время, за которое
+# их пропустил бы глобальный лимит Telegram (30 msg/s). Строка «100%» — никого нет
+# на связи: уведомляются все, как было до учёта присутствия.
+# Отдельно — цена presence.touch(), которую PresenceMiddleware платит на каждый апдейт оператора.
+#
+# Запуск: python -m benchmarks.bench_presence
+
+import asyncio
+import time
+
+from benchmarks.bench_e2e import Harness, message
+from benchmarks.common import reset_db
+
+from bot.crud import add_operator, get_or_create_company
+from bot.database import async_session
+from bot.presence import Presence, presence
+
+N_OPERATORS = 50
+N_TICKETS = 40
+IDLE_FRACTIONS = (1.0, 0.0, 0.5, 0.8, 0.9)
+TELEGRAM_GLOBAL_LIMIT = 30.0  # msg/s
+
+FIRST_OPERATOR_ID = 500
+FIRST_CUSTOMER_ID = 10_000
+
+
+async def prepare():
+    await reset_db()
+    async with async_session() as session:
+        company = await get_or_create_company(session, "bench")
+        for op in range(N_OPERATORS):
+            await add_operator(session, company.id, telegram_id=str(FIRST_OPERATOR_ID + op), full_name=f"op{op}")
+        await session.commit()
+
+
+async def run(harness: Harness, idle_fraction: float, first_customer: int) -> dict:
+    presence.reset()
+    operators = range(FIRST_OPERATOR_ID, FIRST_OPERATOR_ID + N_OPERATORS)
+    online = list(operators)[:round(N_OPERATORS * (1 - idle_fraction))]
+    customers = range(first_customer, first_customer + N_TICKETS)
+    if online:
+        await harness.run("online", [[message(op, "/online") for op in online]])
+
+    calls_before = len(harness.fake.calls)
+    result = await harness.run("tickets", [
+        [message(c, "👨‍💻 Связаться с оператором") for c in customers],
+        [message(c, f"Не работает оплата, клиент {c}") for c in customers],
+    ])
+    notifications = sum(
+        1 for call in harness.fake.calls[calls_before:]
+        if getattr(call, "chat_id", None) in operators
+    )
+    return {
+        "online": len(online),
+        "notifications": notifications,
+        "per_ticket": notifications / N_TICKETS,
+        "drain_s": notifications / TELEGRAM_GLOBAL_LIMIT,
+        "p99_ms": result["p99_ms"],
+    }
+
+
+def bench_touch():
+    tracker = Presence()
+    rounds = 200_000
+    start = time.perf_counter()
+    for i in range(rounds):
+        tracker.touch(FIRST_OPERATOR_ID + i % N_OPERATORS)
+    return (time.perf_counter() - start) / rounds * 1e6
+
+
+async def main():
+    await prepare()
+    harness = Harness()
+    await harness.start()
+    print(f"{N_OPERATORS} operators, {N_TICKETS} tickets per run")
+    print(f"{'idle':>6}{'online':>8}{'notifications':>15}{'per ticket':>12}{'at 30 msg/s':>13}{'p99 ms':>9}")
+    for i, idle in enumerate(IDLE_FRACTIONS):
+        r = await run(harness, idle, FIRST_CUSTOMER_ID + i * N_TICKETS)
+        print(f"{idle:>6.0%}{r['online']:>8}{r['notifications']:>15}{r['per_ticket']:>12.1f}"
+              f"{r['drain_s']:>12.1f}s{r['p99_ms']:>9.2f}")
+    await harness.stop()
+    print()
+    print(f"presence.touch(): {bench_touch():.2f} µs")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
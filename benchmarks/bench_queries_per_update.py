@@ -0,0 +1,80 @@
+# benchmarks/bench_queries_per_update.py
+#
+# Считает на каждый апдейт, прогнанный через настоящий Dispatcher (bot.main.create_dispatcher):
+#   checkouts — сколько раз соединение бралось из пула;
+#   commits   — сколько COMMIT (на SQLite каждый — fsync);
+#   queries   — сколько SQL-команд выполнено.
+#
+# Запуск: python -m benchmarks.bench_queries_per_update
+
+import asyncio
+
+from benchmarks.common import FakeSession, callback_update, message_update, reset_db
+
+from aiogram import Bot
+from sqlalchemy import event
+
+from bot.crud import add_operator, create_faq_entry, get_or_create_company
+from bot.database import async_session, engine
+from bot.main import create_dispatcher
+
+OPERATOR_ID = 500
+CUSTOMER_ID = 1000
+
+SCENARIO = [
+    ("customer: 📚 FAQ", lambda: message_update(1, CUSTOMER_ID, "📚 FAQ")),
+    ("customer: faq:1", lambda: callback_update(2, CUSTOMER_ID, "faq:1")),
+    ("customer: contact operator", lambda: message_update(3, CUSTOMER_ID, "👨‍💻 Связаться с оператором")),
+    ("customer: ticket text", lambda: message_update(4, CUSTOMER_ID, "Не работает оплата")),
+    ("operator: 📋 open tickets", lambda: message_update(5, OPERATOR_ID, "📋 Открытые тикеты")),
+    ("operator: assign", lambda: callback_update(6, OPERATOR_ID, "ticket_action:assign:1")),
+    ("customer: relay to operator", lambda: message_update(7, CUSTOMER_ID, "Здравствуйте!")),
+    ("operator: relay to customer", lambda: message_update(8, OPERATOR_ID, "Добрый день")),
+    ("operator: close", lambda: callback_update(9, OPERATOR_ID, "ticket_action:close:1")),
+]
+
+
+async def prepare() -> None:
+    """Пустая база с компанией, оператором и одной статьёй FAQ (общая с check_query_counts)."""
+    await reset_db()
+    async with async_session() as session:
+        company = await get_or_create_company(session, "bench")
+        await add_operator(session, company.id, telegram_id=str(OPERATOR_ID), full_name="op")
+        await create_faq_entry(session, company.id, "Как оплатить?", "Картой")
+        await session.commit()
+
+
+async def main():
+    await prepare()
+
+    counters = {"checkouts": 0, "commits": 0, "queries": 0}
+
+    def on_checkout(*args):
+        counters["checkouts"] += 1
+
+    def on_commit(*args):
+        counters["commits"] += 1
+
+    def on_query(*args):
+        counters["queries"] += 1
+
+    event.listen(engine.sync_engine.pool, "checkout", on_checkout)
+    event.listen(engine.sync_engine, "commit", on_commit)
+    event.listen(engine.sync_engine, "before_cursor_execute", on_query)
+
+    bot = Bot(token="42:BENCHMARK-TOKEN", session=FakeSession())
+    dp = create_dispatcher()
+    totals = dict.fromkeys(counters, 0)
+    print(f"{'update':<32}{'checkouts':>10}{'commits':>9}{'queries':>9}")
+    for name, make_update in SCENARIO:
+        for key in counters:
+            counters[key] = 0
+        await dp.feed_update(bot, make_update())
+        for key in counters:
+            totals[key] += counters[key]
+        print(f"{name:<32}{counters['checkouts']:>10}{counters['commits']:>9}{counters['queries']:>9}")
+    print(f"{'total':<32}{totals['checkouts']:>10}{totals['commits']:>9}{totals['queries']:>9}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,70 @@
+# benchmarks/bench_relay.py
+#
+# Задержка пересылки сообщения в активном тикете через Dispatcher (p50/p99)
+# и число SQL-команд на одно сообщение:
+#   customer → operator — текст клиента с тикетом in_progress;
+#   operator → customer — текст оператора в режиме chatting.
+#
+# Запуск: python -m benchmarks.bench_relay
+
+import asyncio
+
+from benchmarks.common import FakeSession, callback_update, message_update, report, reset_db, timed
+
+from aiogram import Bot
+from sqlalchemy import event
+
+from bot.crud import add_operator, create_ticket, get_or_create_company
+from bot.database import async_session, engine
+from bot.main import create_dispatcher
+
+OPERATOR_ID = 500
+N_CUSTOMERS = 200
+FIRST_CUSTOMER_ID = 10_000
+N_MESSAGES = 1000
+
+
+async def main():
+    await reset_db()
+    async with async_session() as session:
+        company = await get_or_create_company(session, "bench")
+        await add_operator(session, company.id, telegram_id=str(OPERATOR_ID), full_name="op")
+        for c in range(N_CUSTOMERS):
+            await create_ticket(session, company.id, str(FIRST_CUSTOMER_ID + c), "помогите")
+        await session.commit()
+
+    bot = Bot(token="42:BENCHMARK-TOKEN", session=FakeSession())
+    dp = create_dispatcher()
+    await dp.emit_startup(bot=bot, dispatcher=dp)
+
+    # Оператор принимает все тикеты; последним принятым он и «чатится»
+    for ticket_id in range(1, N_CUSTOMERS + 1):
+        await dp.feed_update(bot, callback_update(ticket_id, OPERATOR_ID, f"ticket_action:assign:{ticket_id}"))
+
+    queries = 0
+
+    def on_query(*args):
+        nonlocal queries
+        queries += 1
+
+    event.listen(engine.sync_engine, "before_cursor_execute", on_query)
+
+    samples = await timed(lambda i: dp.feed_update(bot, message_update(
+        100_000 + i, FIRST_CUSTOMER_ID + i % N_CUSTOMERS, f"вопрос {i}"
+    )), N_MESSAGES)
+    report("customer -> operator", samples)
+    print(f"{'':<40} queries/message={queries / N_MESSAGES:.2f}")
+
+    queries = 0
+    samples = await timed(lambda i: dp.feed_update(bot, message_update(
+        200_000 + i, OPERATOR_ID, f"ответ {i}"
+    )), N_MESSAGES)
+    report("operator -> customer", samples)
+    print(f"{'':<40} queries/message={queries / N_MESSAGES:.2f}")
+
+    event.remove(engine.sync_engine, "before_cursor_execute", on_query)
+    await dp.emit_shutdown(bot=bot, dispatcher=dp)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
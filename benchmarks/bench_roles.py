@@ -0,0 +1,87 @@
+# benchmarks/bench_roles.py
+#
+# Сравнивает время диспетчеризации одного апдейта:
+#   before — три роутера с прежними фильтрами, каждый из которых ходит в БД
+#            (get_operators + линейный поиск), как было до RoleMiddleware;
+#   after  — RoleMiddleware классифицирует отправителя один раз, фильтры читают
+#            готовые is_admin / operator из данных хэндлера.
+#
+# Запуск: python -m benchmarks.bench_roles
+
+import asyncio
+
+from benchmarks.common import message_update, report, reset_db, timed
+
+from aiogram import Bot, Dispatcher, Router
+from aiogram.filters import BaseFilter
+
+from bot.config import config
+from bot.crud import add_operator, get_operators
+from bot.database import async_session
+from bot.filters import IsAdmin, IsOperator, IsUser
+from bot.middlewares import RoleMiddleware
+
+N_UPDATES = 2000
+N_OPERATORS = 50
+CUSTOMER_ID = 900_000
+
+
+class LegacyIsOperator(BaseFilter):
+    async def __call__(self, message) -> bool:
+        async with async_session() as session:
+            ops = await get_operators(session, company_id=1)
+        return any(int(op.telegram_id) == message.from_user.id for op in ops)
+
+
+class LegacyIsUser(BaseFilter):
+    async def __call__(self, message) -> bool:
+        if message.from_user.id in config.get_admin_list:
+            return False
+        async with async_session() as session:
+            ops = await get_operators(session, company_id=1)
+        return not any(int(op.telegram_id) == message.from_user.id for op in ops)
+
+
+class LegacyIsAdmin(BaseFilter):
+    async def __call__(self, message) -> bool:
+        return message.from_user.id in config.get_admin_list
+
+
+async def _noop(message):
+    return None
+
+
+def build(filters, with_middleware: bool) -> Dispatcher:
+    dp = Dispatcher()
+    if with_middleware:
+        dp.update.outer_middleware(RoleMiddleware())
+    for flt in filters:
+        router = Router()
+        router.message.filter(flt)
+        router.message.register(_noop)
+        dp.include_router(router)
+    return dp
+
+
+async def main():
+    await reset_db()
+    async with async_session() as session:
+        for i in range(N_OPERATORS):
+            await add_operator(session, 1, telegram_id=str(100_000 + i), full_name=f"op{i}")
+        await session.commit()
+
+    bot = Bot(token=config.bot_token)
+    before = build([LegacyIsAdmin(), LegacyIsOperator(), LegacyIsUser()], with_middleware=False)
+    after = build([IsAdmin(), IsOperator(), IsUser()], with_middleware=True)
+
+    for name, dp in (("before: chained DB filters", before), ("after: RoleMiddleware", after)):
+        samples = await timed(
+            lambda i: dp.feed_update(bot, message_update(i, CUSTOMER_ID, "hello")),
+            N_UPDATES,
+        )
+        report(name, samples)
+    await bot.session.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,83 @@
+# benchmarks/bench_transcript.py
+#
+# Устойчивая скорость пересылки сообщений клиент → оператор через Dispatcher
+# с журналом переписки (bot/transcript.py) и без него. Журнал пишется буфером
+# в фоне, поэтому на пересылку он почти не влияет; в конце проверяется, что
+# в ticket_messages попало ровно столько строк, сколько было сообщений.
+#
+# Запуск: python -m benchmarks.bench_transcript
+
+import asyncio
+import time
+
+from benchmarks.common import FakeSession, message_update, reset_db
+
+from aiogram import Bot
+from sqlalchemy import func, select
+
+from bot.crud import add_operator, claim_ticket, create_ticket, get_or_create_company
+from bot.database import async_session
+from bot.main import create_dispatcher
+from bot.models import TicketMessage
+from bot.transcript import transcript
+
+OPERATOR_ID = 500
+N_CUSTOMERS = 50
+N_MESSAGES = 2000
+FIRST_CUSTOMER_ID = 10_000
+
+
+async def relay(dp, bot, first_update_id: int) -> float:
+    """Шлёт N_MESSAGES сообщений волнами: по одному от каждого клиента одновременно."""
+    start = time.perf_counter()
+    for wave in range(N_MESSAGES // N_CUSTOMERS):
+        await asyncio.gather(*(
+            dp.feed_update(bot, message_update(
+                first_update_id + wave * N_CUSTOMERS + c,
+                FIRST_CUSTOMER_ID + c,
+                f"сообщение {wave}"
+            ))
+            for c in range(N_CUSTOMERS)
+        ))
+    return time.perf_counter() - start
+
+
+async def main():
+    await reset_db()
+    async with async_session() as session:
+        company = await get_or_create_company(session, "bench")
+        await add_operator(session, company.id, telegram_id=str(OPERATOR_ID), full_name="op")
+        for c in range(N_CUSTOMERS):
+            ticket = await create_ticket(session, company.id, str(FIRST_CUSTOMER_ID + c), "помогите")
+            await claim_ticket(session, ticket.id, company.id, str(OPERATOR_ID))
+        await session.commit()
+
+    bot = Bot(token="42:BENCHMARK-TOKEN", session=FakeSession())
+    dp = create_dispatcher()
+    # Прогрев кэшей ролей и FSM
+    await relay(dp, bot, 1)
+
+    print(f"{N_MESSAGES} relayed messages from {N_CUSTOMERS} customers")
+    transcript.enabled = False
+    elapsed = await relay(dp, bot, 100_000)
+    print(f"{'transcript off':<32} {N_MESSAGES / elapsed:8,.0f} msg/s")
+
+    transcript.enabled = True
+    await transcript.flush()
+    written_before = transcript.written
+    elapsed = await relay(dp, bot, 200_000)
+    print(f"{'transcript on (write-behind)':<32} {N_MESSAGES / elapsed:8,.0f} msg/s")
+
+    start = time.perf_counter()
+    await transcript.stop()
+    print(f"{'final flush':<32} {(time.perf_counter() - start) * 1e3:8.1f} ms, "
+          f"{transcript.written - written_before} rows written in the run")
+
+    async with async_session() as session:
+        stored = await session.scalar(select(func.count()).select_from(TicketMessage))
+    assert stored == transcript.written, (stored, transcript.written)
+    print(f"ticket_messages rows: {stored} (warm-up included)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,170 @@
+# benchmarks/bench_webhook.py
+#
+# Пропускная способность polling и webhook на одном и том же наборе апдейтов, офлайн:
+#   polling — dp.start_polling() против фейкового getUpdates (пачки по 100, задержка API);
+#   webhook — локальный aiohttp-сервер из bot.webhook, на который генератор нагрузки
+#             шлёт POST с синтетическими апдейтами (как Telegram, с секретным заголовком).
+# Каждый вызов Bot API (getUpdates, sendMessage) стоит API_LATENCY секунд.
+# Ответ хэндлера в режиме webhook уходит в теле ответа на POST — без вызова API.
+#
+# Запуск: python -m benchmarks.bench_webhook [--updates N] [--concurrency C]
+#
+# Генератор нагрузки можно натравить и на запущенного бота (python -m bot.main --mode webhook):
+#   python -m benchmarks.bench_webhook --url http://127.0.0.1:8080/webhook --secret <WEBHOOK_SECRET>
+
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import FakeSession, message_update, percentile, reset_db
+
+import aiohttp
+from aiogram import Bot
+from aiogram.methods import GetMe, GetUpdates, SendMessage
+from aiogram.types import User
+from aiohttp import web
+
+from bot.crud import create_faq_entry, get_or_create_company
+from bot.database import async_session
+from bot.main import create_dispatcher
+from bot.webhook import create_webhook_app
+
+API_LATENCY = 0.03
+SECRET = "bench-secret"
+N_CUSTOMERS = 500
+
+
+class PollingFakeSession(FakeSession):
+    """FakeSession, которая ещё и отдаёт заранее подготовленные апдейты через getUpdates."""
+
+    def __init__(self, updates, latency: float):
+        super().__init__(latency=latency)
+        self.pending = list(updates)
+
+    async def make_request(self, bot, method, timeout=None):
+        if isinstance(method, GetMe):
+            return User(id=42, is_bot=True, first_name="bench")
+        if isinstance(method, GetUpdates):
+            await asyncio.sleep(self.latency)
+            batch, self.pending = self.pending[:method.limit or 100], self.pending[method.limit or 100:]
+            return batch
+        return await super().make_request(bot, method, timeout)
+
+
+def make_updates(n: int, first_id: int):
+    texts = ("ℹ️ О компании", "📚 FAQ")
+    return [
+        message_update(first_id + i, 10_000 + i % N_CUSTOMERS, texts[i % len(texts)])
+        for i in range(n)
+    ]
+
+
+async def post_updates(url: str, updates, secret: str, concurrency: int):
+    """
+    Генератор нагрузки: шлёт апдейты POST-запросами не больше concurrency одновременно.
+    Возвращает (время, [задержки], сколько ответов пришло прямо в теле webhook).
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    inline_replies = 0
+
+    async with aiohttp.ClientSession() as http:
+        async def post(update):
+            nonlocal inline_replies
+            async with semaphore:
+                start = time.perf_counter()
+                async with http.post(
+                    url,
+                    data=update.model_dump_json(exclude_none=True),
+                    headers={
+                        "Content-Type": "application/json",
+                        "X-Telegram-Bot-Api-Secret-Token": secret,
+                    },
+                ) as resp:
+                    body = await resp.read()
+                    resp.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+                if b'name="method"' in body:
+                    inline_replies += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(post(u) for u in updates))
+        return time.perf_counter() - start, latencies, inline_replies
+
+
+async def run_polling(dp, updates) -> float:
+    session = PollingFakeSession(updates, API_LATENCY)
+    bot = Bot(token="42:BENCHMARK-TOKEN", session=session)
+
+    async def stop_when_done():
+        while sum(isinstance(c, SendMessage) for c in session.calls) < len(updates):
+            await asyncio.sleep(0.01)
+        await dp.stop_polling()
+
+    start = time.perf_counter()
+    watcher = asyncio.create_task(stop_when_done())
+    await dp.start_polling(bot, handle_signals=False, polling_timeout=0)
+    await watcher
+    return time.perf_counter() - start
+
+
+async def run_webhook(dp, updates, concurrency: int):
+    bot = Bot(token="42:BENCHMARK-TOKEN", session=FakeSession(latency=API_LATENCY))
+    app = create_webhook_app(bot, dp, secret_token=SECRET, max_connections=concurrency)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host="127.0.0.1", port=0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    url = f"http://127.0.0.1:{port}/webhook"
+    try:
+        async with aiohttp.ClientSession() as http:
+            async with http.post(url, json={"update_id": 0}, headers={
+                "X-Telegram-Bot-Api-Secret-Token": "wrong"
+            }) as resp:
+                assert resp.status == 401, resp.status
+        return await post_updates(url, updates, SECRET, concurrency)
+    finally:
+        await runner.cleanup()
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=40)
+    parser.add_argument("--url", help="URL уже запущенного webhook-сервера (только генератор нагрузки)")
+    parser.add_argument("--secret", default=SECRET)
+    args = parser.parse_args()
+
+    if args.url:
+        elapsed, latencies, inline = await post_updates(
+            args.url, make_updates(args.updates, 1), args.secret, args.concurrency
+        )
+        print(f"{args.updates} updates in {elapsed:.2f}s ({args.updates / elapsed:,.0f}/s), "
+              f"p50={percentile(latencies, 50) * 1e3:.1f}ms p99={percentile(latencies, 99) * 1e3:.1f}ms, "
+              f"replies in webhook response: {inline}")
+        return
+
+    await reset_db()
+    async with async_session() as session:
+        company = await get_or_create_company(session, "bench")
+        await create_faq_entry(session, company.id, "Как оплатить?", "Картой")
+        await session.commit()
+    dp = create_dispatcher()
+
+    print(f"{args.updates} updates, Bot API latency {API_LATENCY * 1e3:.0f}ms")
+    elapsed = await run_polling(dp, make_updates(args.updates, 1))
+    print(f"{'polling':<28} {elapsed:6.2f}s  {args.updates / elapsed:8,.0f} updates/s")
+
+    elapsed, latencies, inline = await run_webhook(
+        dp, make_updates(args.updates, args.updates + 1), args.concurrency
+    )
+    print(f"{'webhook (c=' + str(args.concurrency) + ')':<28} {elapsed:6.2f}s  "
+          f"{args.updates / elapsed:8,.0f} updates/s  "
+          f"p50={percentile(latencies, 50) * 1e3:.1f}ms p99={percentile(latencies, 99) * 1e3:.1f}ms  "
+          f"replies in webhook response: {inline}/{args.updates}")
+    print("wrong secret token rejected with 401: ok")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
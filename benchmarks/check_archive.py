@@ -0,0 +1,104 @@
+# benchmarks/check_archive.py
+#
+# Проверка архивации (bot/archive.py) на временной SQLite-базе:
+#   1) архивировать всё, создать тикет, архивировать снова — id нового тикета и его
+#      сообщений не повторяют архивные, второй запуск не падает на UNIQUE;
+#   2) то же на базе, где tickets / ticket_messages созданы без AUTOINCREMENT (как до
+#      миграции 3): миграция пересоздаёт таблицы и продолжает счётчик после архивных id.
+# Код выхода 1, если что-то не так.
+#
+# Запуск: python -m benchmarks.check_archive
+
+import asyncio
+import sys
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.common import reset_db
+
+from sqlalchemy import func, select, text, update
+from sqlalchemy.schema import CreateTable
+
+from bot.archive import Archiver
+from bot.crud import add_ticket_messages, close_ticket, create_ticket, get_or_create_company
+from bot.database import async_session, engine
+from bot.migrations import run_migrations
+from bot.models import ArchivedTicket, ArchivedTicketMessage, Ticket, TicketMessage
+
+
+async def create_closed_tickets(n: int) -> list[int]:
+    """n закрытых тикетов с сообщением переписки, закрытых год назад."""
+    ids = []
+    async with async_session() as session:
+        company = await get_or_create_company(session, "check")
+        for i in range(n):
+            ticket = await create_ticket(session, company.id, user_id=str(1000 + i), question_text=f"q{i}")
+            await add_ticket_messages(session, [{
+                "ticket_id": ticket.id, "direction": "to_operator", "sender_id": str(1000 + i),
+                "text": "text", "created_at": datetime.now(timezone.utc),
+            }])
+            await close_ticket(session, ticket.id)
+            ids.append(ticket.id)
+        await session.execute(
+            update(Ticket).where(Ticket.id.in_(ids))
+            .values(updated_at=datetime.now(timezone.utc) - timedelta(days=365))
+        )
+        await session.commit()
+    return ids
+
+
+async def archive_twice() -> list[str]:
+    problems = []
+    archiver = Archiver(archive_after_days=30)
+    first = await create_closed_tickets(3)
+    await archiver.run_once()
+    second = await create_closed_tickets(1)
+    if second[0] <= max(first):
+        problems.append(f"ticket id reused: {second[0]} after archived {first}")
+    try:
+        archived = await archiver.run_once()
+    except Exception as e:
+        return problems + [f"second run failed: {e!r}"]
+    async with async_session() as session:
+        tickets = await session.scalar(select(func.count()).select_from(ArchivedTicket))
+        messages = await session.scalar(select(func.count(func.distinct(ArchivedTicketMessage.id))))
+    if archived != 1 or tickets != 4 or messages != 4:
+        problems.append(f"second run archived {archived}, archive has {tickets} tickets / {messages} messages")
+    return problems
+
+
+async def make_legacy_tables() -> None:
+    """tickets / ticket_messages без AUTOINCREMENT, как их создавали до миграции 3."""
+    async with engine.begin() as conn:
+        for table in (Ticket.__table__, TicketMessage.__table__):
+            ddl = str(CreateTable(table).compile(dialect=conn.dialect))
+            await conn.execute(text(f"DROP TABLE {table.name}"))
+            await conn.execute(text(ddl.replace("PRIMARY KEY AUTOINCREMENT", "PRIMARY KEY")))
+        await conn.execute(text("DELETE FROM schema_migrations WHERE version = 3"))
+        await conn.execute(text("DELETE FROM sqlite_sequence"))
+
+
+async def main() -> int:
+    problems = []
+
+    await reset_db()
+    problems += [f"fresh db: {p}" for p in await archive_twice()]
+
+    await reset_db()
+    await make_legacy_tables()
+    async with engine.begin() as conn:
+        await run_migrations(conn)
+        for table in ("tickets", "ticket_messages"):
+            ddl = await conn.scalar(text("SELECT sql FROM sqlite_master WHERE name = :n"), {"n": table})
+            if "AUTOINCREMENT" not in ddl.upper():
+                problems.append(f"migrated db: {table} still without AUTOINCREMENT")
+    problems += [f"migrated db: {p}" for p in await archive_twice()]
+
+    for problem in problems:
+        print(f"[FAIL] {problem}")
+    if not problems:
+        print("[ok] archive → new ticket → archive again: ids are not reused")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
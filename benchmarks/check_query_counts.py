@@ -0,0 +1,74 @@
+# benchmarks/check_query_counts.py
+#
+# Регрессионная проверка числа SQL-запросов на апдейт для CI. Прогоняет сценарий из
+# bench_queries_per_update через Dispatcher в режиме DB_PROFILE (bot/profiling.py)
+# и сравнивает число запросов каждого апдейта с бюджетом в query_budget.json.
+# Код выхода 1, если хоть один апдейт превысил бюджет; для таких апдейтов печатается
+# разбивка запросов по видам и местам вызова.
+#
+# Запуск: python -m benchmarks.check_query_counts            — проверка
+#         python -m benchmarks.check_query_counts --update   — записать текущие числа как бюджет
+
+import os
+
+os.environ["DB_PROFILE"] = "true"
+
+import argparse  # noqa: E402
+import asyncio  # noqa: E402
+import json  # noqa: E402
+import sys  # noqa: E402
+from pathlib import Path  # noqa: E402
+
+from benchmarks.bench_queries_per_update import SCENARIO, prepare  # noqa: E402
+from benchmarks.common import FakeSession  # noqa: E402
+
+from aiogram import Bot  # noqa: E402
+
+from bot.main import create_dispatcher  # noqa: E402
+from bot.profiling import query_profiler  # noqa: E402
+
+BUDGET_FILE = Path(__file__).with_name("query_budget.json")
+
+
+async def run_scenario() -> list:
+    await prepare()
+    bot = Bot(token="42:BENCHMARK-TOKEN", session=FakeSession())
+    dp = create_dispatcher()
+    results = []
+    for name, make_update in SCENARIO:
+        await dp.feed_update(bot, make_update())
+        results.append((name, query_profiler.updates[-1]))
+    return results
+
+
+async def main(update_budget: bool) -> int:
+    results = await run_scenario()
+
+    if update_budget:
+        budget = {name: stats.count for name, stats in results}
+        BUDGET_FILE.write_text(json.dumps(budget, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        print(f"Budget written to {BUDGET_FILE}")
+        return 0
+
+    budget = json.loads(BUDGET_FILE.read_text(encoding="utf-8"))
+    failed = []
+    print(f"{'update':<32}{'queries':>9}{'budget':>8}")
+    for name, stats in results:
+        limit = budget.get(name)
+        mark = ""
+        if limit is None:
+            mark = "  (no budget)"
+        elif stats.count > limit:
+            mark = "  OVER"
+            failed.append((name, stats))
+        print(f"{name:<32}{stats.count:>9}{limit if limit is not None else '-':>8}{mark}")
+
+    for name, stats in failed:
+        print(f"\n{name}: {stats.summary()}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Проверка числа SQL-запросов на апдейт")
+    parser.add_argument("--update", action="store_true", help="перезаписать query_budget.json")
+    sys.exit(asyncio.run(main(parser.parse_args().update)))
@@ -0,0 +1,87 @@
+# benchmarks/check_query_plans.py
+#
+# Проверяет через EXPLAIN QUERY PLAN, что горячие запросы из bot/crud.py идут по
+# индексам, а не полным сканом таблицы. Перехватывает реальный SQL, который
+# выполняют crud-функции, и прогоняет его план. Код выхода 1, если где-то SCAN.
+#
+# Запуск: python -m benchmarks.check_query_plans
+
+import asyncio
+import sys
+from datetime import datetime, timezone
+
+from benchmarks.common import reset_db
+
+from sqlalchemy import event
+
+from bot.crud import (
+    add_operator,
+    archive_closed_tickets,
+    create_ticket,
+    get_active_ticket_by_user,
+    get_open_tickets,
+    get_operators,
+    get_or_create_company,
+    get_tickets_by_operator
+)
+from bot.database import async_session, engine
+from bot.role_cache import RoleCache
+
+HOT_TABLES = ("tickets", "operators")
+
+
+async def main() -> int:
+    await reset_db()
+    async with async_session() as session:
+        company = await get_or_create_company(session, "plans")
+        await add_operator(session, company.id, telegram_id="500", full_name="op")
+        for i in range(20):
+            await create_ticket(session, company.id, user_id=str(1000 + i), question_text=f"q{i}")
+        await session.commit()
+
+    captured: list[tuple[str, str, tuple]] = []
+    current = {"name": ""}
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            captured.append((current["name"], statement, parameters))
+
+    hot_queries = {
+        "get_open_tickets": lambda s: get_open_tickets(s, company.id),
+        "get_open_tickets (next page)": lambda s: get_open_tickets(s, company.id, after_id=5),
+        "get_active_ticket_by_user": lambda s: get_active_ticket_by_user(s, "1003"),
+        "get_tickets_by_operator": lambda s: get_tickets_by_operator(s, "500", company.id),
+        "get_operators": lambda s: get_operators(s, company.id),
+        "archive_closed_tickets": lambda s: archive_closed_tickets(s, datetime.now(timezone.utc), 500),
+    }
+
+    event.listen(engine.sync_engine, "before_cursor_execute", capture)
+    try:
+        async with async_session() as session:
+            for name, query in hot_queries.items():
+                current["name"] = name
+                await query(session)
+        current["name"] = "RoleCache._load"
+        await RoleCache()._load(company.id)
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", capture)
+
+    failed = False
+    async with engine.connect() as conn:
+        raw = await conn.get_raw_connection()
+        for name, statement, parameters in captured:
+            cursor = await raw.driver_connection.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+            plan = [row[3] for row in await cursor.fetchall()]
+            scans = [
+                step for step in plan
+                if step.startswith("SCAN") and any(f"SCAN {t}" in step for t in HOT_TABLES)
+                and "INDEX" not in step
+            ]
+            status = "FAIL" if scans else "ok"
+            failed = failed or bool(scans)
+            print(f"[{status}] {name}: {' | '.join(plan)}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
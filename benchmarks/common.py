@@ -0,0 +1,133 @@
+# benchmarks/common.py
+#
+# Общие помощники для бенчмарков. Импортировать ДО любых модулей bot.*:
+# модуль подменяет DATABASE_URL на временную SQLite-базу, чтобы бенчмарки
+# никогда не трогали боевую support_bot.db из .env.
+
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime
+
+# Через окружение, чтобы дочерние процессы (bench_cluster) попали в ту же базу
+BENCH_DIR = os.environ.get("SUPPORT_BOT_BENCH_DIR") or tempfile.mkdtemp(prefix="support_bot_bench_")
+os.environ["SUPPORT_BOT_BENCH_DIR"] = BENCH_DIR
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{BENCH_DIR}/bench.db"
+os.environ.setdefault("BOT_TOKEN", "42:BENCHMARK-TOKEN")
+os.environ.setdefault("ADMIN_IDS", "1")
+
+from aiogram.client.session.base import BaseSession  # noqa: E402
+from aiogram.exceptions import TelegramForbiddenError  # noqa: E402
+from aiogram.types import CallbackQuery, Chat, Message, Update, User  # noqa: E402
+
+from sqlalchemy import text  # noqa: E402
+
+from bot.database import engine, init_models  # noqa: E402
+from bot.models import Base  # noqa: E402
+from bot.search import FTS_TABLE  # noqa: E402
+
+
+async def reset_db() -> None:
+    """Пересоздаёт все таблицы (и поисковый индекс) во временной базе."""
+    async with engine.begin() as conn:
+        await conn.execute(text(f"DROP TABLE IF EXISTS {FTS_TABLE}"))
+        await conn.run_sync(Base.metadata.drop_all)
+    await init_models()
+
+
+class FakeSession(BaseSession):
+    """
+    Сессия Bot, которая никуда не ходит: записывает вызовы API в self.calls,
+    имитирует сетевую задержку latency (сек) и отвечает 403 для forbidden_chats.
+    """
+
+    def __init__(self, latency: float = 0.0, forbidden_chats: frozenset = frozenset()):
+        super().__init__()
+        self.latency = latency
+        self.forbidden_chats = forbidden_chats
+        self.calls = []
+        self._message_id = 0
+
+    async def make_request(self, bot, method, timeout=None):
+        self.calls.append(method)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id in self.forbidden_chats:
+            raise TelegramForbiddenError(method=method, message="Forbidden: bot was blocked by the user")
+        if method.__returning__ is Message:
+            self._message_id += 1
+            return Message(
+                message_id=self._message_id,
+                date=datetime.now(),
+                chat=Chat(id=int(chat_id or 0), type="private"),
+                text=getattr(method, "text", None),
+            )
+        return True
+
+    async def close(self):
+        pass
+
+    async def stream_content(self, *args, **kwargs):
+        yield b""
+
+
+def message_update(update_id: int, user_id: int, text: str) -> Update:
+    user = User(id=user_id, is_bot=False, first_name=f"user{user_id}")
+    return Update(
+        update_id=update_id,
+        message=Message(
+            message_id=update_id,
+            date=datetime.now(),
+            chat=Chat(id=user_id, type="private"),
+            from_user=user,
+            text=text,
+        ),
+    )
+
+
+def callback_update(update_id: int, user_id: int, data: str) -> Update:
+    user = User(id=user_id, is_bot=False, first_name=f"user{user_id}")
+    return Update(
+        update_id=update_id,
+        callback_query=CallbackQuery(
+            id=str(update_id),
+            from_user=user,
+            chat_instance=str(user_id),
+            data=data,
+            message=Message(
+                message_id=update_id,
+                date=datetime.now(),
+                chat=Chat(id=user_id, type="private"),
+                text="...",
+            ),
+        ),
+    )
+
+
+def percentile(samples: list[float], q: float) -> float:
+    ordered = sorted(samples)
+    idx = min(len(ordered) - 1, max(0, int(round(q / 100 * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+def report(name: str, samples: list[float]) -> None:
+    """Печатает p50/p99/mean для списка длительностей (в секундах)."""
+    print(
+        f"{name:<40} n={len(samples):<6} "
+        f"p50={percentile(samples, 50) * 1e6:9.1f}µs "
+        f"p99={percentile(samples, 99) * 1e6:9.1f}µs "
+        f"mean={statistics.mean(samples) * 1e6:9.1f}µs"
+    )
+
+
+async def timed(coro_factory, n: int) -> list[float]:
+    """Запускает coro_factory(i) n раз подряд и возвращает длительности."""
+    samples = []
+    for i in range(n):
+        start = time.perf_counter()
+        await coro_factory(i)
+        samples.append(time.perf_counter() - start)
+    return samples
@@ -0,0 +1,433 @@
+# benchmarks/fake_bot_api.py
+#
+# Локальная замена Telegram Bot API на aiohttp для нагрузочных тестов без Telegram.
+# Бот направляется сюда через TELEGRAM_API_URL (bot/config.py), например:
+#
+#   python -m benchmarks.fake_bot_api --customers 2000 --operators 50 --seed-db --latency-ms 30
+#   TELEGRAM_API_URL=http://127.0.0.1:8081 python -m bot.main
+#
+# Реализованы getMe, deleteWebhook, getUpdates (long polling), sendMessage,
+# editMessageText, editMessageReplyMarkup, answerCallbackQuery и copyMessage.
+# Сервер умеет:
+#   • задержку ответа latency ± jitter;
+#   • отвечать 429 Too Many Requests (retry_after) с вероятностью retry_after_rate;
+#   • отвечать 403 "bot was blocked by the user" на отправку в заблокировавшие бота чаты.
+# Simulation — синтетические клиенты и операторы, которые реагируют на сообщения бота:
+# клиент создаёт тикет и переписывается с оператором, оператор принимает тикеты
+# из рассылки или списка «📋 Открытые тикеты», отвечает и закрывает тикет.
+# Задержки пересылки меряются здесь же, по метке времени в тексте сообщения.
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import random
+import re
+import statistics
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Set
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+FIRST_CUSTOMER_ID = 1_000_000
+FIRST_OPERATOR_ID = 500_000
+BOT_USER = {"id": 42, "is_bot": True, "first_name": "Support Bot", "username": "support_bot"}
+
+# Поля запроса, которые aiogram передаёт JSON-строкой
+JSON_FIELDS = {"reply_markup", "entities", "allowed_updates", "link_preview_options"}
+SEND_METHODS = {"sendmessage", "editmessagetext", "editmessagereplymarkup", "copymessage"}
+
+
+def _ok(result) -> web.Response:
+    return web.json_response({"ok": True, "result": result})
+
+
+def _error(status: int, description: str, parameters: Optional[dict] = None) -> web.Response:
+    body = {"ok": False, "error_code": status, "description": description}
+    if parameters:
+        body["parameters"] = parameters
+    return web.json_response(body, status=status)
+
+
+class FakeBotAPI:
+    """
+    Состояние поддельного Bot API: очередь входящих апдейтов для getUpdates и
+    подписчики на исходящие сообщения бота (on_send(chat_id, method, payload)).
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        retry_after_rate: float = 0.0,
+        retry_after: int = 1,
+        seed: Optional[int] = None
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.retry_after_rate = retry_after_rate
+        self.retry_after = retry_after
+        self.blocked: Set[int] = set()
+        self.random = random.Random(seed)
+        self.calls: Counter = Counter()
+        self.errors: Counter = Counter()
+        self.on_send: List[Callable[[int, str, dict], None]] = []
+        self.pushed = 0
+        self._updates: List[dict] = []
+        self._new_updates = asyncio.Event()
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+
+    # --- входящие апдейты ---
+
+    def _user(self, user_id: int) -> dict:
+        return {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"}
+
+    def push_message(self, user_id: int, text: str) -> None:
+        self._push({
+            "message": {
+                "message_id": next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": user_id, "type": "private"},
+                "from": self._user(user_id),
+                "text": text,
+            }
+        })
+
+    def push_callback(self, user_id: int, data: str, message_id: int) -> None:
+        self._push({
+            "callback_query": {
+                "id": str(next(self._update_ids)),
+                "from": self._user(user_id),
+                "chat_instance": str(user_id),
+                "data": data,
+                "message": {
+                    "message_id": message_id,
+                    "date": int(time.time()),
+                    "chat": {"id": user_id, "type": "private"},
+                    "text": "...",
+                },
+            }
+        })
+
+    def _push(self, update: dict) -> None:
+        update["update_id"] = next(self._update_ids)
+        self._updates.append(update)
+        self.pushed += 1
+        self._new_updates.set()
+
+    @property
+    def pending_updates(self) -> int:
+        return len(self._updates)
+
+    # --- HTTP ---
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_route("*", "/bot{token}/{method}", self.handle)
+        return app
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"].lower()
+        self.calls[method] += 1
+        params = dict(await request.post()) if request.can_read_body else {}
+        params.update(request.query)
+        for field in JSON_FIELDS & params.keys():
+            params[field] = json.loads(params[field])
+
+        if method == "getupdates":
+            return _ok(await self._get_updates(params))
+
+        if self.latency or self.jitter:
+            await asyncio.sleep(max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter)))
+
+        if method in SEND_METHODS or method == "answercallbackquery":
+            if self.retry_after_rate and self.random.random() < self.retry_after_rate:
+                self.errors["429"] += 1
+                return _error(
+                    429, f"Too Many Requests: retry after {self.retry_after}",
+                    {"retry_after": self.retry_after}
+                )
+        chat_id = int(params["chat_id"]) if "chat_id" in params else None
+        if method in SEND_METHODS and chat_id in self.blocked:
+            self.errors["403"] += 1
+            for callback in self.on_send:
+                callback(chat_id, method, params)
+            return _error(403, "Forbidden: bot was blocked by the user")
+
+        if method == "getme":
+            return _ok(BOT_USER)
+        if method in ("deletewebhook", "answercallbackquery"):
+            return _ok(True)
+        if method == "copymessage":
+            return _ok({"message_id": next(self._message_ids)})
+        if method in ("sendmessage", "editmessagetext", "editmessagereplymarkup"):
+            message_id = int(params.get("message_id") or next(self._message_ids))
+            params["message_id"] = message_id
+            for callback in self.on_send:
+                callback(chat_id, method, params)
+            return _ok({
+                "message_id": message_id,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "from": BOT_USER,
+                "text": params.get("text", ""),
+            })
+        self.errors["404"] += 1
+        return _error(404, "Not Found: method not found")
+
+    async def _get_updates(self, params: dict) -> List[dict]:
+        offset = int(params.get("offset") or 0)
+        limit = int(params.get("limit") or 100)
+        timeout = float(params.get("timeout") or 0)
+        if offset:
+            # Подтверждённые апдейты (update_id < offset) больше не отдаём
+            self._updates = [u for u in self._updates if u["update_id"] >= offset]
+        if not self._updates and timeout:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self._updates[:limit]
+
+
+# === Синтетические пользователи ===
+
+_STAMP_RE = re.compile(r"@(\d+\.\d+)")
+_TICKET_RE = re.compile(r"#(\d+)")
+
+
+def _buttons(params: dict) -> List[str]:
+    markup = params.get("reply_markup") or {}
+    return [b.get("callback_data", "") for row in markup.get("inline_keyboard", []) for b in row]
+
+
+class Simulation:
+    """
+    Клиенты FIRST_CUSTOMER_ID.. и операторы FIRST_OPERATOR_ID.. поверх FakeBotAPI.
+    Каждый клиент создаёт один тикет и обменивается с оператором messages_per_ticket
+    сообщениями; оператор ведёт один тикет за раз и закрывает его после ответа на
+    последнее сообщение. Доля blocked_rate клиентов блокирует бота после своего
+    последнего сообщения — ответ оператора и уведомление о закрытии получат 403.
+    """
+
+    def __init__(
+        self,
+        api: FakeBotAPI,
+        customers: int,
+        operators: int,
+        messages_per_ticket: int = 3,
+        ramp_up: float = 5.0,
+        blocked_rate: float = 0.0
+    ):
+        self.api = api
+        self.customers = range(FIRST_CUSTOMER_ID, FIRST_CUSTOMER_ID + customers)
+        self.operators = range(FIRST_OPERATOR_ID, FIRST_OPERATOR_ID + operators)
+        self.messages_per_ticket = messages_per_ticket
+        self.ramp_up = ramp_up
+        self.blockers = set(api.random.sample(list(self.customers), int(customers * blocked_rate)))
+        # клиент → сколько сообщений отправил; время отправки текста тикета
+        self.sent: Dict[int, int] = {}
+        self.ticket_sent_at: Dict[int, float] = {}
+        self.done: Set[int] = set()
+        # оператор → ведомый тикет / ждёт ответа на «Принять» / сколько ответил
+        self.busy: Dict[int, int] = {}
+        self.claiming: Set[int] = set()
+        self.replies: Dict[int, int] = {}
+        self.latency: Dict[str, List[float]] = {"ticket wait": [], "customer -> operator": [], "operator -> customer": []}
+        self.notifications = 0
+        self.finished = asyncio.Event()
+        api.on_send.append(self.on_send)
+
+    async def run(self, timeout: float) -> bool:
+        """Запускает клиентов равномерно за ramp_up секунд; True — все тикеты закрыты."""
+        self.started_at = time.monotonic()
+        for op in self.operators:
+            self.api.push_message(op, "📋 Открытые тикеты")
+        delay = self.ramp_up / max(len(self.customers), 1)
+        for customer in self.customers:
+            self.api.push_message(customer, "👨‍💻 Связаться с оператором")
+            await asyncio.sleep(delay)
+        try:
+            await asyncio.wait_for(self.finished.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def _later(self, delay: float, fn: Callable[[], None]) -> None:
+        asyncio.get_running_loop().call_later(delay, fn)
+
+    def on_send(self, chat_id: int, method: str, params: dict) -> None:
+        if chat_id in self.operators:
+            self._operator(chat_id, params)
+        elif chat_id in self.customers:
+            self._customer(chat_id, params)
+
+    def _stamp(self) -> str:
+        return f"@{time.monotonic():.6f}"
+
+    def _measure(self, kind: str, text: str) -> None:
+        match = _STAMP_RE.search(text)
+        if match:
+            self.latency[kind].append(time.monotonic() - float(match.group(1)))
+
+    def _customer(self, customer: int, params: dict) -> None:
+        text = params.get("text", "")
+        if text.startswith("Опишите свою проблему"):
+            self.ticket_sent_at[customer] = time.monotonic()
+            self.api.push_message(customer, f"Не работает оплата, клиент {customer}")
+        elif text.startswith("Оператор взялся"):
+            started = self.ticket_sent_at.get(customer)
+            if started is not None:
+                self.latency["ticket wait"].append(time.monotonic() - started)
+            self._customer_says(customer)
+        elif text.startswith("💬 Оператор:"):
+            self._measure("operator -> customer", text)
+            if self.sent.get(customer, 0) < self.messages_per_ticket:
+                self._customer_says(customer)
+        elif "был закрыт" in text:
+            self.done.add(customer)
+            if len(self.done) == len(self.customers):
+                self.finished.set()
+
+    def _customer_says(self, customer: int) -> None:
+        n = self.sent.get(customer, 0) + 1
+        self.sent[customer] = n
+        self.api.push_message(customer, f"сообщение {n} {self._stamp()}")
+        if n == self.messages_per_ticket and customer in self.blockers:
+            self.api.blocked.add(customer)
+
+    def _operator(self, op: int, params: dict) -> None:
+        text = params.get("text", "")
+        buttons = _buttons(params)
+        if text.startswith("📥"):
+            self.notifications += 1
+
+        if op in self.busy:
+            ticket_id = self.busy[op]
+            if text.startswith(f"💬 Клиент #{ticket_id}:"):
+                self._measure("customer -> operator", text)
+                n = self.replies.get(op, 0) + 1
+                self.replies[op] = n
+                self.api.push_message(op, f"ответ {n} {self._stamp()}")
+                if n == self.messages_per_ticket:
+                    self.api.push_callback(op, f"ticket_action:close:{ticket_id}", params["message_id"])
+            elif text.startswith(f"✅ Тикет #{ticket_id} закрыт"):
+                del self.busy[op]
+                self.replies.pop(op, None)
+                self.api.push_message(op, "📋 Открытые тикеты")
+            return
+
+        if op in self.claiming:
+            if text.startswith("✅ Вы приняли тикет"):
+                self.claiming.discard(op)
+                self.busy[op] = int(_TICKET_RE.search(text).group(1))
+            elif text.startswith("Этот тикет уже взят"):
+                self.claiming.discard(op)
+                self.api.push_message(op, "📋 Открытые тикеты")
+            return
+
+        assign = [b for b in buttons if b.startswith("ticket_action:assign:")]
+        open_buttons = [b for b in buttons if b.startswith("open_ticket:")]
+        if assign:
+            self.claiming.add(op)
+            self.api.push_callback(op, assign[0], params["message_id"])
+        elif open_buttons:
+            self.api.push_callback(op, self.api.random.choice(open_buttons), params["message_id"])
+        elif text.startswith("Пока нет новых тикетов"):
+            self._later(0.5, lambda: self.api.push_message(op, "📋 Открытые тикеты"))
+
+    def report(self, elapsed: float) -> None:
+        print(f"customers done: {len(self.done)}/{len(self.customers)} in {elapsed:.1f}s, "
+              f"operators busy at the end: {len(self.busy)}, notifications: {self.notifications}")
+        for kind, samples in self.latency.items():
+            if samples:
+                ordered = sorted(samples)
+                p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+                print(f"{kind:<24} n={len(samples):<6} p50={statistics.median(samples) * 1e3:8.1f}ms "
+                      f"p99={p99 * 1e3:8.1f}ms")
+        print("API calls: " + ", ".join(f"{m}={n}" for m, n in sorted(self.api.calls.items())))
+        if self.api.errors:
+            print("injected errors: " + ", ".join(f"{code}={n}" for code, n in sorted(self.api.errors.items())))
+
+
+async def seed_operators(operators: int) -> None:
+    """
+    Регистрирует синтетических операторов в базе бота (DATABASE_URL из .env) в компании 1,
+    с которой работают хэндлеры. Импорты внутри: самому серверу настройки бота не нужны.
+    """
+    from bot.crud import add_operator, get_operators, get_or_create_company
+    from bot.database import async_session, init_models
+    from bot.models import Company
+
+    await init_models()
+    async with async_session() as session:
+        if await session.get(Company, 1) is None:
+            await get_or_create_company(session, "loadtest")
+        existing = {op.telegram_id for op in await get_operators(session, 1)}
+        for op in range(FIRST_OPERATOR_ID, FIRST_OPERATOR_ID + operators):
+            if str(op) not in existing:
+                await add_operator(session, 1, telegram_id=str(op), full_name=f"op{op}")
+        await session.commit()
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--customers", type=int, default=1000)
+    parser.add_argument("--operators", type=int, default=20)
+    parser.add_argument("--messages", type=int, default=3, help="сообщений клиента на тикет")
+    parser.add_argument("--ramp-up", type=float, default=5.0, help="за сколько секунд приходят все клиенты")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--retry-after-rate", type=float, default=0.0, help="доля запросов с ответом 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="retry_after в ответе 429, сек")
+    parser.add_argument("--blocked-rate", type=float, default=0.0, help="доля клиентов, блокирующих бота")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--seed", type=int, default=1)
+
+
+def build(args) -> tuple:
+    api = FakeBotAPI(
+        latency=args.latency_ms / 1e3,
+        jitter=args.jitter_ms / 1e3,
+        retry_after_rate=args.retry_after_rate,
+        retry_after=args.retry_after,
+        seed=args.seed,
+    )
+    simulation = Simulation(
+        api, args.customers, args.operators,
+        messages_per_ticket=args.messages, ramp_up=args.ramp_up, blocked_rate=args.blocked_rate
+    )
+    return api, simulation
+
+
+async def main(args) -> None:
+    if args.seed_db:
+        await seed_operators(args.operators)
+    api, simulation = build(args)
+    runner = web.AppRunner(api.create_app())
+    await runner.setup()
+    await web.TCPSite(runner, host=args.host, port=args.port).start()
+    print(f"Fake Bot API on http://{args.host}:{args.port} — запустите бота с TELEGRAM_API_URL")
+    try:
+        # Ждём, пока бот начнёт опрашивать getUpdates
+        while not api.calls["getupdates"]:
+            await asyncio.sleep(0.1)
+        start = time.monotonic()
+        await simulation.run(args.timeout)
+        simulation.report(time.monotonic() - start)
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Поддельный Telegram Bot API с синтетическими пользователями")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--seed-db", action="store_true", help="добавить операторов в базу бота из .env")
+    add_arguments(parser)
+    asyncio.run(main(parser.parse_args()))
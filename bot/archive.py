@@ -0,0 +1,125 @@
+# bot/archive.py
+#
+# Архивация закрытых тикетов. Работает фоновой задачей бота (dp.startup)
+# и вручную: python -m bot.archive [--max-batches N]
+
+import argparse
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from bot.config import config
+from bot.crud import archive_closed_tickets
+from bot.database import async_session
+
+logger = logging.getLogger(__name__)
+
+# Пауза между пачками: блокировку записи между ними получают апдейты
+ARCHIVE_BATCH_PAUSE = 0.05
+
+
+class Archiver:
+    """
+    Переносит тикеты, закрытые дольше archive_after назад, вместе с перепиской в
+    tickets_archive / ticket_messages_archive — чтобы горячие таблицы, по которым ищут
+    хэндлеры, не росли бесконечно. Простаивающие контексты клиентов (fsm_records)
+    удаляет само FSM-хранилище (SQLStorage.purge_expired), здесь их не трогаем.
+      • работа идёт пачками по batch_size строк, каждая — отдельная короткая транзакция,
+        между пачками пауза: блокировка записи держится миллисекунды, а не минуты;
+      • пачка атомарна, поэтому прерванный запуск ничего не портит, а следующий
+        продолжает с оставшихся строк — отдельная «закладка» не нужна;
+      • фоновая задача запускает run_once() раз в interval секунд.
+    В кластере архивирует только один воркер (enabled=False у остальных).
+    """
+
+    def __init__(
+        self,
+        archive_after_days: int = config.archive_after_days,
+        batch_size: int = config.archive_batch_size,
+        interval: float = config.archive_interval
+    ):
+        self.archive_after = timedelta(days=archive_after_days) if archive_after_days > 0 else None
+        self.batch_size = batch_size
+        self.interval = interval
+        self.enabled = True
+        self.archived = 0
+        # Самая долгая транзакция последнего запуска, сек
+        self.longest_batch = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _batches(self, cutoff: datetime, max_batches: Optional[int]) -> int:
+        total = batches = 0
+        while max_batches is None or batches < max_batches:
+            start = time.perf_counter()
+            async with async_session() as session:
+                done = await archive_closed_tickets(session, cutoff, self.batch_size)
+                await session.commit()
+            self.longest_batch = max(self.longest_batch, time.perf_counter() - start)
+            total += done
+            batches += 1
+            if done < self.batch_size:
+                break
+            await asyncio.sleep(ARCHIVE_BATCH_PAUSE)
+        return total
+
+    async def run_once(self, max_batches: Optional[int] = None) -> int:
+        """
+        Один проход: число перенесённых тикетов.
+        max_batches ограничивает число пачек (None — до конца).
+        """
+        self.longest_batch = 0.0
+        if self.archive_after is None:
+            return 0
+        archived = await self._batches(datetime.now(timezone.utc) - self.archive_after, max_batches)
+        self.archived += archived
+        if archived:
+            logger.info(
+                "Archive: перенесено тикетов %s, самая долгая транзакция %.1f мс",
+                archived, self.longest_batch * 1e3
+            )
+        return archived
+
+    async def start(self) -> None:
+        """Запускает фоновую задачу (dp.startup)."""
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Останавливает фоновую задачу (dp.shutdown); текущая пачка откатится."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Archive: run failed")
+            await asyncio.sleep(self.interval)
+
+
+archiver = Archiver()
+
+
+async def main(max_batches: Optional[int] = None) -> None:
+    from bot.database import init_models
+
+    await init_models()
+    archived = await archiver.run_once(max_batches)
+    print(f"Перенесено тикетов: {archived}, самая долгая транзакция: {archiver.longest_batch * 1e3:.1f} мс")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Архивация закрытых тикетов")
+    parser.add_argument("--max-batches", type=int, default=None, help="не больше N пачек")
+    asyncio.run(main(parser.parse_args().max_batches))
@@ -0,0 +1,120 @@
+# bot/assignment.py
+
+import heapq
+import itertools
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+from bot.config import config
+from bot.presence import presence
+from bot.role_cache import role_cache
+from bot.routing import Route, routing_table
+
+
+class AssignmentEngine:
+    """
+    Автоназначение тикетов (AUTO_ASSIGN): новый тикет получает наименее загруженный
+    оператор на связи (bot/presence.py), у которого меньше capacity тикетов in_progress.
+      • загрузка — множества тикетов операторов; ведётся по событиям routing_table
+        (принятие и закрытие тикета, в том числе в других воркерах кластера), при
+        старте строится из тикетов in_progress, которые routing_table читает из БД;
+      • выбор — min-куча (загрузка, порядок, оператор) с ленивым удалением: при каждом
+        изменении загрузки в кучу кладётся новая запись, а устаревшие (загрузка уже
+        другая или оператор удалён) выбрасываются при выборе — O(log n);
+      • при равной загрузке первым идёт тот, кто дольше на ней находится.
+    """
+
+    def __init__(self, capacity: int = config.operator_capacity):
+        self.capacity = capacity
+        # оператор → его тикеты in_progress (и зарезервированные pick_and_reserve)
+        self.tickets: Dict[int, Set[int]] = {}
+        self._owner: Dict[int, int] = {}
+        self._heap: List[Tuple[int, int, int]] = []
+        self._order = itertools.count()
+        self._operators: FrozenSet[int] = frozenset()
+        self._operators_source = None
+        self._presence_version = -1
+
+    def load(self, operator_id: int) -> int:
+        tickets = self.tickets.get(operator_id)
+        return len(tickets) if tickets else 0
+
+    def _push(self, operator_id: int) -> None:
+        if operator_id in self._operators:
+            heapq.heappush(self._heap, (self.load(operator_id), next(self._order), operator_id))
+        # Куча копит устаревшие записи — иногда пересобираем
+        if len(self._heap) > 4 * len(self._operators) + 64:
+            self._rebuild()
+
+    def _rebuild(self) -> None:
+        self._heap = [(self.load(op), next(self._order), op) for op in self._operators]
+        heapq.heapify(self._heap)
+
+    def set_operators(self, operator_ids: FrozenSet[int]) -> None:
+        """Кандидаты на назначение; у новых загрузка берётся из уже известных тикетов."""
+        if operator_ids == self._operators:
+            return
+        self._operators = frozenset(operator_ids)
+        self._rebuild()
+
+    def add_ticket(self, operator_id: int, ticket_id: int) -> None:
+        previous = self._owner.get(ticket_id)
+        if previous == operator_id:
+            return
+        if previous is not None:
+            self.remove_ticket(ticket_id)
+        self._owner[ticket_id] = operator_id
+        self.tickets.setdefault(operator_id, set()).add(ticket_id)
+        self._push(operator_id)
+
+    def remove_ticket(self, ticket_id: int) -> None:
+        operator_id = self._owner.pop(ticket_id, None)
+        if operator_id is None:
+            return
+        tickets = self.tickets[operator_id]
+        tickets.discard(ticket_id)
+        if not tickets:
+            del self.tickets[operator_id]
+        self._push(operator_id)
+
+    def on_route(self, kind: str, route: Optional[Route]) -> None:
+        """Слушатель routing_table."""
+        if kind == "assign":
+            self.add_ticket(route.operator_id, route.ticket_id)
+        elif kind == "close":
+            self.remove_ticket(route.ticket_id)
+        elif kind == "reset":
+            self.tickets.clear()
+            self._owner.clear()
+            self._rebuild()
+
+    def pick(self) -> Optional[int]:
+        """Наименее загруженный оператор со свободным местом или None, если все заняты."""
+        while self._heap:
+            load, _, operator_id = self._heap[0]
+            if operator_id not in self._operators or load != self.load(operator_id):
+                heapq.heappop(self._heap)
+                continue
+            return operator_id if load < self.capacity else None
+        return None
+
+    async def pick_and_reserve(self, company_id: int, ticket_id: int) -> Optional[int]:
+        """
+        Выбирает оператора и сразу засчитывает ему тикет — до первого await в хэндлере,
+        чтобы одновременные тикеты не достались одному оператору сверх capacity.
+        Если тикет потом не удалось закрепить в БД — вызвать remove_ticket(ticket_id).
+        """
+        # role_cache отдаёт один и тот же словарь, пока не перечитает операторов, а
+        # presence.version меняется только со статусом кого-то из операторов
+        operators = await role_cache.operators(company_id)
+        if operators is not self._operators_source or presence.version != self._presence_version:
+            self._operators_source = operators
+            self._presence_version = presence.version
+            self.set_operators(frozenset(presence.available(operators)))
+        operator_id = self.pick()
+        if operator_id is not None:
+            self.add_ticket(operator_id, ticket_id)
+        return operator_id
+
+
+assignment = AssignmentEngine()
+routing_table.listeners.append(assignment.on_route)
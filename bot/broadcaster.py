@@ -0,0 +1,165 @@
+# bot/broadcaster.py
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Iterable, Optional, Set
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+
+logger = logging.getLogger(__name__)
+
+# Лимиты Telegram Bot API: ~30 сообщений в секунду суммарно и ~1 в секунду в один чат
+GLOBAL_RATE = 30.0
+PER_CHAT_RATE = 1.0
+# Сколько send_message может быть «в полёте» одновременно
+BROADCAST_CONCURRENCY = 10
+# Сколько раз повторять отправку после TelegramRetryAfter
+MAX_RETRIES = 3
+# Сколько секунд не слать в чат, заблокировавший бота (потом пробуем снова)
+BLOCKED_TTL = 3600.0
+
+
+class TokenBucket:
+    """
+    Классический token bucket: rate токенов в секунду, не больше capacity про запас.
+    acquire() ждёт, пока появится токен.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class Broadcaster:
+    """
+    Рассылка одного сообщения многим чатам:
+      • не больше concurrency одновременных запросов;
+      • общий token bucket (global_rate/с) и пауза между сообщениями в один чат (per_chat_rate/с);
+      • на TelegramRetryAfter ждём retry_after и повторяем (до MAX_RETRIES раз);
+      • чаты, ответившие TelegramForbiddenError (бот заблокирован), пропускаются
+        blocked_ttl секунд или пока из чата не придёт апдейт (unblock() из
+        PresenceMiddleware) — разблокировавший бота оператор снова получает рассылки.
+    schedule() запускает рассылку фоновой задачей — хэндлер не ждёт её окончания.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = BROADCAST_CONCURRENCY,
+        global_rate: float = GLOBAL_RATE,
+        per_chat_rate: float = PER_CHAT_RATE,
+        max_retries: int = MAX_RETRIES,
+        blocked_ttl: float = BLOCKED_TTL
+    ):
+        self.concurrency = concurrency
+        self.per_chat_interval = 1.0 / per_chat_rate
+        self.max_retries = max_retries
+        self.blocked_ttl = blocked_ttl
+        # chat_id → когда (time.monotonic()) чат ответил TelegramForbiddenError
+        self.blocked: Dict[int, float] = {}
+        self._global = TokenBucket(global_rate)
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        # chat_id → время, раньше которого в этот чат слать нельзя
+        self._chat_next_send: Dict[int, float] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Создаём лениво — внутри работающего event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._semaphore
+
+    async def _wait_chat_slot(self, chat_id: int) -> None:
+        now = time.monotonic()
+        slot = max(now, self._chat_next_send.get(chat_id, 0.0))
+        self._chat_next_send[chat_id] = slot + self.per_chat_interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+        # Не даём словарю расти бесконечно: выкидываем давно «остывшие» чаты
+        if len(self._chat_next_send) > 10_000:
+            self._chat_next_send = {
+                cid: t for cid, t in self._chat_next_send.items() if t > now
+            }
+
+    def is_blocked(self, chat_id: int) -> bool:
+        blocked_at = self.blocked.get(chat_id)
+        if blocked_at is None:
+            return False
+        if time.monotonic() - blocked_at >= self.blocked_ttl:
+            del self.blocked[chat_id]
+            return False
+        return True
+
+    def unblock(self, chat_id: int) -> None:
+        """Из чата пришёл апдейт — значит, бот больше не заблокирован."""
+        self.blocked.pop(chat_id, None)
+
+    async def send(self, bot: Bot, chat_id: int, text: str, **kwargs: Any) -> bool:
+        """Отправляет одно сообщение с учётом лимитов. True — доставлено."""
+        if self.is_blocked(chat_id):
+            return False
+
+        async with self._get_semaphore():
+            await self._wait_chat_slot(chat_id)
+            for attempt in range(self.max_retries + 1):
+                await self._global.acquire()
+                try:
+                    await bot.send_message(chat_id=chat_id, text=text, **kwargs)
+                    return True
+                except TelegramRetryAfter as e:
+                    if attempt == self.max_retries:
+                        logger.warning("Broadcast to %s: retry limit reached", chat_id)
+                        return False
+                    logger.info("Broadcast to %s: retry after %ss", chat_id, e.retry_after)
+                    await asyncio.sleep(e.retry_after)
+                except TelegramForbiddenError:
+                    logger.info("Broadcast to %s: bot is blocked, skipping recipient for %ss",
+                                chat_id, self.blocked_ttl)
+                    self.blocked[chat_id] = time.monotonic()
+                    return False
+                except Exception as e:
+                    logger.warning("Broadcast to %s failed: %s", chat_id, e)
+                    return False
+        return False
+
+    async def broadcast(self, bot: Bot, chat_ids: Iterable[int], text: str, **kwargs: Any) -> int:
+        """Рассылает сообщение всем chat_ids и возвращает число успешных отправок."""
+        results = await asyncio.gather(
+            *(self.send(bot, chat_id, text, **kwargs) for chat_id in chat_ids)
+        )
+        return sum(results)
+
+    @property
+    def pending(self) -> int:
+        """Сколько фоновых рассылок ещё идёт."""
+        return len(self._tasks)
+
+    def schedule(self, bot: Bot, chat_ids: Iterable[int], text: str, **kwargs: Any) -> asyncio.Task:
+        """Запускает broadcast() в фоне и сразу возвращает управление."""
+        task = asyncio.create_task(self.broadcast(bot, list(chat_ids), text, **kwargs))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def drain(self) -> None:
+        """Дожидается всех фоновых рассылок (вызывается при остановке бота)."""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+broadcaster = Broadcaster()
@@ -0,0 +1,392 @@
+# bot/cluster.py
+#
+# Многопроцессный режим: python -m bot.cluster --workers N [--mode polling|webhook]
+#   • супервизор (этот процесс) получает апдейты — getUpdates или webhook — и раздаёт
+#     их N воркерам по abs(chat_id) % N через локальный TCP (по строке JSON на сообщение);
+#   • все апдейты одного чата попадают в один воркер и обрабатываются там строго по
+#     порядку, разные чаты — параллельно и в разных процессах (на разных ядрах);
+#   • воркеры публикуют через cache_bus (bot/pubsub.py) сброс кэшей ролей и FAQ и
+#     пробуждение outbox, супервизор пересылает эти события остальным воркерам.
+# Несколько процессов пишут в одну БД, поэтому для N > 1 лучше PostgreSQL.
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import secrets
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+from aiogram import Bot
+from aiogram.methods import TelegramMethod
+from aiohttp import web
+
+from bot.archive import archiver
+from bot.config import config
+from bot.database import init_models
+from bot.main import create_bot, create_dispatcher
+from bot.outbox import outbox
+from bot.pubsub import cache_bus
+from bot.webhook import register_webhook, serve_app, webhook_secret_token
+
+logger = logging.getLogger(__name__)
+
+CLUSTER_HOST = "127.0.0.1"
+# Сколько ждать, пока все воркеры запустятся и подключатся
+WORKER_START_TIMEOUT = 60.0
+WORKER_STOP_TIMEOUT = 30.0
+# Как часто проверять, живы ли процессы воркеров
+WORKER_CHECK_INTERVAL = 1.0
+# Сколько апдейтов копить для шарда, пока его воркер перезапускается
+WORKER_PENDING_LIMIT = 10_000
+POLLING_TIMEOUT = 30
+
+# Поля апдейта, в которых сообщение лежит целиком (с chat)
+_MESSAGE_FIELDS = ("message", "edited_message", "channel_post", "edited_channel_post", "business_message")
+
+
+def update_chat_id(update: Dict[str, Any]) -> int:
+    """chat_id, по которому апдейт шардируется (для апдейтов без чата — id отправителя)."""
+    for field in _MESSAGE_FIELDS:
+        if update.get(field):
+            return update[field]["chat"]["id"]
+    callback = update.get("callback_query")
+    if callback:
+        if callback.get("message"):
+            return callback["message"]["chat"]["id"]
+        return callback["from"]["id"]
+    for value in update.values():
+        if isinstance(value, dict) and "from" in value:
+            return value["from"]["id"]
+    return 0
+
+
+def _encode(message: Dict[str, Any]) -> bytes:
+    # json.dumps экранирует переводы строк, так что одно сообщение — ровно одна строка
+    return json.dumps(message).encode() + b"\n"
+
+
+class ChatSequencer:
+    """Выполняет задачи параллельно, но задачи одного чата — строго друг за другом."""
+
+    def __init__(self):
+        self._tails: Dict[int, asyncio.Task] = {}
+
+    def submit(self, chat_id: int, job: Callable[[], Awaitable[None]]) -> None:
+        previous = self._tails.get(chat_id)
+        task = asyncio.create_task(self._run_after(previous, job))
+        self._tails[chat_id] = task
+
+        def forget(_task: asyncio.Task) -> None:
+            if self._tails.get(chat_id) is task:
+                del self._tails[chat_id]
+
+        task.add_done_callback(forget)
+
+    @staticmethod
+    async def _run_after(previous: Optional[asyncio.Task], job: Callable[[], Awaitable[None]]) -> None:
+        if previous is not None:
+            await asyncio.wait([previous])
+        await job()
+
+    async def join(self) -> None:
+        while self._tails:
+            await asyncio.wait(list(self._tails.values()))
+
+
+# === Воркер ===
+
+def run_worker(
+    index: int,
+    total: int,
+    port: int,
+    bot_factory: Callable[[], Bot] = create_bot,
+    log_level: int = logging.INFO
+) -> None:
+    """Точка входа процесса-воркера (multiprocessing, spawn)."""
+    logging.basicConfig(
+        level=log_level,
+        format=f"%(asctime)s [worker {index}] %(levelname)s %(name)s: %(message)s"
+    )
+    asyncio.run(_worker_loop(index, total, port, bot_factory))
+
+
+async def _worker_loop(index: int, total: int, port: int, bot_factory: Callable[[], Bot]) -> None:
+    bot = bot_factory()
+    dp = create_dispatcher()
+    # Outbox этого воркера доставляет только сообщения «своих» чатов
+    outbox.shard = (index, total)
+    # Архивацию достаточно вести одному воркеру
+    archiver.enabled = index == 0
+
+    reader, writer = await asyncio.open_connection(CLUSTER_HOST, port)
+    writer.write(_encode({"type": "hello", "worker": index}))
+    cache_bus.attach(lambda channel, payload: writer.write(
+        _encode({"type": "publish", "channel": channel, "payload": payload})
+    ))
+
+    async def process(update: Dict[str, Any]) -> None:
+        try:
+            result = await dp.feed_raw_update(bot, update)
+            if isinstance(result, TelegramMethod):
+                await dp.silent_call_request(bot, result)
+        except Exception:
+            logger.exception("Update %s failed", update.get("update_id"))
+
+    sequencer = ChatSequencer()
+    await dp.emit_startup(bot=bot, dispatcher=dp)
+    try:
+        async for line in reader:
+            message = json.loads(line)
+            kind = message["type"]
+            if kind == "update":
+                update = message["update"]
+                sequencer.submit(update_chat_id(update), lambda update=update: process(update))
+            elif kind == "publish":
+                cache_bus.deliver(message["channel"], message.get("payload"))
+            elif kind == "drain":
+                await sequencer.join()
+                writer.write(_encode({"type": "drained", "worker": index}))
+            elif kind == "stop":
+                break
+    finally:
+        await sequencer.join()
+        cache_bus.attach(None)
+        await dp.emit_shutdown(bot=bot, dispatcher=dp)
+        await bot.session.close()
+        writer.close()
+
+
+# === Супервизор ===
+
+class Supervisor:
+    """
+    Запускает workers процессов и раздаёт им апдейты по abs(chat_id) % workers.
+    Как получать апдейты, решает вызывающий: run_polling(), create_front_app()
+    или просто dispatch() (бенчмарки).
+    Упавший воркер перезапускается (_watch). Пока его нет, апдейты его чатов копятся
+    в очереди шарда (не больше WORKER_PENDING_LIMIT) и уходят новому процессу сразу
+    после подключения, до любых новых. Апдейты, которые упавший воркер уже получил,
+    но не успел обработать, теряются.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        bot_factory: Callable[[], Bot] = create_bot,
+        log_level: int = logging.INFO
+    ):
+        self.workers = workers
+        self.bot_factory = bot_factory
+        self.log_level = log_level
+        self.dispatched = 0
+        self.restarts = 0
+        self._port: Optional[int] = None
+        self._processes: List[multiprocessing.Process] = []
+        self._links: Dict[int, asyncio.StreamWriter] = {}
+        self._pending: Dict[int, Deque[bytes]] = {}
+        self._all_connected: Optional[asyncio.Event] = None
+        self._drains: Dict[int, asyncio.Future] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._watcher: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    async def start(self) -> None:
+        self._all_connected = asyncio.Event()
+        self._server = await asyncio.start_server(self._on_worker, CLUSTER_HOST, 0)
+        self._port = self._server.sockets[0].getsockname()[1]
+        self._processes = [self._spawn(index) for index in range(self.workers)]
+        # Следим за процессами уже с запуска: упавший до подключения тоже перезапустится
+        self._watcher = asyncio.create_task(self._watch())
+        await asyncio.wait_for(self._all_connected.wait(), timeout=WORKER_START_TIMEOUT)
+        logger.info("Кластер: запущено воркеров — %s", self.workers)
+
+    def _spawn(self, index: int) -> multiprocessing.Process:
+        process = multiprocessing.get_context("spawn").Process(
+            target=run_worker,
+            args=(index, self.workers, self._port, self.bot_factory, self.log_level),
+            name=f"bot-worker-{index}",
+            daemon=True,
+        )
+        process.start()
+        return process
+
+    async def _watch(self) -> None:
+        """Перезапускает воркеры, процесс которых завершился."""
+        while not self._stopping:
+            await asyncio.sleep(WORKER_CHECK_INTERVAL)
+            for index, process in enumerate(self._processes):
+                if process.is_alive() or self._stopping:
+                    continue
+                logger.error(
+                    "Кластер: %s завершился (код %s), перезапускаем; в очереди шарда %s апдейтов",
+                    process.name, process.exitcode, len(self._pending.get(index, ()))
+                )
+                process.close()
+                self._processes[index] = self._spawn(index)
+                self.restarts += 1
+
+    async def _on_worker(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        hello = json.loads(await reader.readline())
+        index = hello["worker"]
+        # Сначала то, что накопилось, пока воркера не было, — порядок чата сохраняется
+        for data in self._pending.pop(index, ()):
+            writer.write(data)
+        self._links[index] = writer
+        if len(self._links) == self.workers:
+            self._all_connected.set()
+
+        try:
+            async for line in reader:
+                message = json.loads(line)
+                if message["type"] == "publish":
+                    # Событие кэша — всем, кроме автора
+                    for other, link in self._links.items():
+                        if other != index:
+                            link.write(line)
+                elif message["type"] == "drained":
+                    self._resolve_drain(index, True)
+        except ConnectionError:
+            pass
+        finally:
+            if self._links.get(index) is writer:
+                del self._links[index]
+            # drain() не должен ждать ответа от процесса, которого больше нет
+            self._resolve_drain(index, False)
+            writer.close()
+
+    def _resolve_drain(self, index: int, drained: bool) -> None:
+        future = self._drains.pop(index, None)
+        if future is not None and not future.done():
+            future.set_result(drained)
+
+    def _buffer(self, shard: int, data: bytes) -> None:
+        pending = self._pending.setdefault(shard, deque(maxlen=WORKER_PENDING_LIMIT))
+        if len(pending) == WORKER_PENDING_LIMIT:
+            logger.warning("Кластер: очередь шарда %s переполнена, старейший апдейт отброшен", shard)
+        pending.append(data)
+
+    async def dispatch(self, update: Dict[str, Any]) -> None:
+        """Отправляет апдейт (словарь JSON Bot API) воркеру его чата."""
+        shard = abs(update_chat_id(update)) % self.workers
+        data = _encode({"type": "update", "update": update})
+        self.dispatched += 1
+        link = self._links.get(shard)
+        if link is None or link.is_closing():
+            # Воркер перезапускается — апдейт дождётся его в очереди шарда
+            self._buffer(shard, data)
+            return
+        link.write(data)
+        # Обратное давление: если воркер не успевает читать, ждём
+        try:
+            await link.drain()
+        except ConnectionError:
+            logger.warning("Кластер: воркер %s отключился во время отправки", shard)
+
+    async def drain(self) -> None:
+        """
+        Дожидается, пока воркеры обработают всё, что им уже отправлено, включая
+        очереди шардов, чьи воркеры сейчас перезапускаются.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            futures = []
+            for index, link in list(self._links.items()):
+                future = self._drains[index] = loop.create_future()
+                futures.append(future)
+                link.write(_encode({"type": "drain"}))
+            results = await asyncio.gather(*futures)
+            if len(results) == self.workers and all(results) and not any(self._pending.values()):
+                return
+            await asyncio.sleep(WORKER_CHECK_INTERVAL)
+
+    async def stop(self) -> None:
+        self._stopping = True
+        if self._watcher is not None:
+            self._watcher.cancel()
+            try:
+                await self._watcher
+            except asyncio.CancelledError:
+                pass
+            self._watcher = None
+        for link in list(self._links.values()):
+            link.write(_encode({"type": "stop"}))
+        loop = asyncio.get_running_loop()
+        for process in self._processes:
+            await loop.run_in_executor(None, process.join, WORKER_STOP_TIMEOUT)
+            if process.is_alive():
+                logger.warning("Кластер: %s не остановился, завершаем принудительно", process.name)
+                process.terminate()
+        self._processes.clear()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    # --- Приём апдейтов ---
+
+    async def run_polling(self, bot: Bot, allowed_updates: List[str]) -> None:
+        """Один цикл getUpdates на весь кластер; обработка — в воркерах."""
+        await bot.delete_webhook()
+        offset = None
+        while True:
+            try:
+                updates = await bot.get_updates(
+                    offset=offset,
+                    timeout=POLLING_TIMEOUT,
+                    allowed_updates=allowed_updates,
+                    request_timeout=POLLING_TIMEOUT + 10,
+                )
+            except Exception:
+                logger.exception("Кластер: getUpdates failed")
+                await asyncio.sleep(1)
+                continue
+            for update in updates:
+                await self.dispatch(update.model_dump(mode="json", exclude_none=True))
+                offset = update.update_id + 1
+
+    def create_front_app(self, secret_token: Optional[str], path: str = config.webhook_path) -> web.Application:
+        """
+        Webhook-приёмник кластера: проверяет секрет, передаёт апдейт воркеру и сразу
+        отвечает 200. Ответ хэндлера уходит отдельным запросом из воркера, а не в теле
+        ответа на webhook, как в однопроцессном режиме.
+        """
+        async def handle(request: web.Request) -> web.Response:
+            token = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+            if secret_token and not secrets.compare_digest(token, secret_token):
+                return web.Response(body="Unauthorized", status=401)
+            await self.dispatch(await request.json())
+            return web.json_response({})
+
+        app = web.Application()
+        app.router.add_post(path, handle)
+        return app
+
+
+async def main(workers: int, mode: str) -> None:
+    logging.basicConfig(level=logging.INFO)
+    # Таблицы и миграции — один раз, до запуска воркеров
+    await init_models()
+
+    supervisor = Supervisor(workers)
+    await supervisor.start()
+    bot = create_bot()
+    allowed_updates = create_dispatcher().resolve_used_update_types()
+    try:
+        if mode == "webhook":
+            secret_token = webhook_secret_token()
+            await register_webhook(bot, secret_token, allowed_updates)
+            await serve_app(supervisor.create_front_app(secret_token))
+        else:
+            await supervisor.run_polling(bot, allowed_updates)
+    finally:
+        await supervisor.stop()
+        await bot.session.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бот техподдержки: несколько процессов-воркеров")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--mode", choices=("polling", "webhook"), default="polling")
+    args = parser.parse_args()
+    asyncio.run(main(args.workers, args.mode))
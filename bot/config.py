@@ -1,5 +1,7 @@
 # bot/config.py
 
+from typing import Optional
+
 from pydantic_settings import BaseSettings
 
 
@@ -7,6 +9,66 @@ class BotConfig(BaseSettings):
     bot_token: str
     database_url: str
     admin_ids: str  # ID админов через запятую, например: "123456789,987654321"
+    # Адрес Bot API; пусто — https://api.telegram.org. Для локального Bot API сервера
+    # или нагрузочных тестов (benchmarks/fake_bot_api.py): "http://127.0.0.1:8081"
+    telegram_api_url: Optional[str] = None
+
+    # --- Режим webhook (python -m bot.main --mode webhook) ---
+    webhook_url: Optional[str] = None     # публичный https-адрес, например "https://bot.example.com"
+    webhook_path: str = "/webhook"
+    webhook_secret: Optional[str] = None  # X-Telegram-Bot-Api-Secret-Token; пусто — генерируется при старте
+    webapp_host: str = "0.0.0.0"
+    webapp_port: int = 8080
+    # Сколько апдейтов обрабатывать одновременно (и max_connections для setWebhook)
+    webhook_max_connections: int = 40
+
+    # --- Автоназначение тикетов (bot/assignment.py) ---
+    # true — новый тикет сразу получает наименее загруженный оператор и уведомляется
+    # только он; рассылка всем — лишь если все операторы заняты
+    auto_assign: bool = False
+    operator_capacity: int = 3  # сколько тикетов in_progress одновременно у оператора
+
+    # --- Присутствие операторов (bot/presence.py) ---
+    # Уведомления о новых тикетах и автоназначение — только операторам «на связи».
+    # Без активности дольше presence_away_after секунд оператор считается отошедшим,
+    # дольше presence_offline_after — не в сети
+    presence_away_after: int = 300
+    presence_offline_after: int = 1800
+    presence_flush_interval: float = 30.0   # как часто писать last_seen в БД, сек
+
+    # --- Архивация закрытых тикетов (bot/archive.py) ---
+    archive_after_days: int = 30        # тикеты, закрытые раньше, уходят в tickets_archive; 0 — не переносить
+    archive_batch_size: int = 500       # строк за транзакцию — столько держится блокировка записи
+    archive_interval: float = 3600.0    # как часто запускать, сек
+
+    # --- Метрики Prometheus (bot/metrics.py) ---
+    # В режиме webhook /metrics отдаёт тот же aiohttp-сервер; в режиме polling —
+    # отдельный сервер на METRICS_PORT (пусто — не запускать)
+    metrics_path: str = "/metrics"
+    metrics_host: str = "0.0.0.0"
+    metrics_port: Optional[int] = None
+
+    # --- Профилирование SQL (bot/profiling.py), по умолчанию выключено ---
+    db_profile: bool = False
+    db_slow_query_ms: float = 100.0          # запросы дольше — в лог с параметрами и местом вызова
+    db_max_queries_per_update: int = 15      # больше запросов на апдейт — предупреждение о N+1
+
+    # --- Пул соединений с БД (bot/database.py) ---
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = 1800  # сек; -1 — не пересоздавать соединения
+    # Проверка соединения при выдаче из пула; пусто — да для серверных БД, нет для SQLite
+    db_pool_pre_ping: Optional[bool] = None
+    # Сколько соединений открыть при старте, чтобы первые апдейты не ждали connect
+    db_pool_warmup: int = 5
+
+    # --- PRAGMA для SQLite, выполняются на каждом новом соединении ---
+    sqlite_journal_mode: str = "WAL"     # WAL — читатели не блокируют писателя
+    sqlite_synchronous: str = "NORMAL"   # в режиме WAL fsync только на checkpoint
+    sqlite_busy_timeout: int = 5000      # мс ожидания блокировки вместо "database is locked"
+    sqlite_cache_size: int = -65536      # отрицательное — в КиБ (64 МиБ)
+    sqlite_mmap_size: int = 268435456    # 256 МиБ
 
     class Config:
         env_file = ".env"
@@ -1,15 +1,71 @@
 # bot/crud.py
 
 import json
-from typing import List, Optional
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, List, NamedTuple, Optional, Tuple
 
 from sqlalchemy.future import select
-from sqlalchemy import update, delete, or_
+from sqlalchemy import update, delete, func, insert, text
 from sqlalchemy.ext.asyncio import AsyncSession      # ← добавили этот импорт
 
-from bot.database import async_session
-from bot.models import Company, FAQEntry, Operator, Ticket, UserSession
+from bot.database import after_commit
+from bot.models import (
+    ArchivedTicket, ArchivedTicketMessage, Company, FAQEntry, OutboxMessage, Operator,
+    OperatorPresence, Ticket, TicketMessage
+)
 from bot.models import Ticket
+from bot.pubsub import cache_bus
+from bot.role_cache import role_cache
+from bot.search import FAQ_SEARCH_LIMIT, index_faq_entry, reindex_faq_entries, search_faq, unindex_faq_entry
+
+logger = logging.getLogger(__name__)
+
+# Размер страницы в списках тикетов и длина превью вопроса в кнопке
+TICKETS_PAGE_SIZE = 10
+PREVIEW_LENGTH = 30
+
+
+class Page(NamedTuple):
+    """
+    Одна страница keyset-пагинации: items — [(id, preview), ...] по возрастанию id,
+    has_prev / has_next — есть ли записи до первой и после последней.
+    """
+    items: List[tuple[int, str]]
+    has_prev: bool
+    has_next: bool
+
+
+async def _keyset_page(
+    session: AsyncSession,
+    query,
+    id_column,
+    after_id: Optional[int],
+    before_id: Optional[int],
+    limit: int
+) -> Page:
+    """
+    Keyset-пагинация по первичному ключу: «id > after_id LIMIT n» для следующей страницы,
+    «id < before_id ORDER BY id DESC LIMIT n» для предыдущей. Берём на одну строку больше,
+    чтобы узнать, есть ли ещё страница в этом направлении.
+    """
+    if before_id is not None:
+        result = await session.execute(
+            query.where(id_column < before_id).order_by(id_column.desc()).limit(limit + 1)
+        )
+        rows = [tuple(r) for r in result.all()]
+        items = list(reversed(rows[:limit]))
+        page = Page(items, has_prev=len(rows) > limit, has_next=True)
+    else:
+        page_query = query if after_id is None else query.where(id_column > after_id)
+        result = await session.execute(page_query.order_by(id_column).limit(limit + 1))
+        rows = [tuple(r) for r in result.all()]
+        page = Page(rows[:limit], has_prev=after_id is not None, has_next=len(rows) > limit)
+
+    # Страница опустела (тикеты разобрали) — показываем первую
+    if not page.items and (after_id is not None or before_id is not None):
+        return await _keyset_page(session, query, id_column, None, None, limit)
+    return page
 
 async def get_active_ticket_by_user(session, user_id: str) -> Optional[Ticket]:
     """
@@ -24,21 +80,20 @@ async def get_active_ticket_by_user(session, user_id: str) -> Optional[Ticket]:
     )
     return result.scalars().first()
 # +++ НОВАЯ ФУНКЦИЯ: get_active_operator_ids +++
-async def get_active_operator_ids(company_id: int) -> List[int]:
+async def get_active_operator_ids(session: AsyncSession, company_id: int) -> List[int]:
     """
     Возвращает список telegram_id (int) всех операторов с is_active=True для данной компании.
     """
-    print(f"[DEBUG get_active_operator_ids] Запрашиваю операторов для company_id={company_id}")
-    async with async_session() as session:
-        result = await session.execute(
-            select(Operator.telegram_id).where(
-                Operator.company_id == company_id,
-                Operator.is_active == True
-            )
+    logger.debug("get_active_operator_ids: company_id=%s", company_id)
+    result = await session.execute(
+        select(Operator.telegram_id).where(
+            Operator.company_id == company_id,
+            Operator.is_active == True
         )
-        rows = result.all()
+    )
+    rows = result.all()
     ids = [int(r[0]) for r in rows]
-    print(f"[DEBUG get_active_operator_ids] Найдено telegram_id операторов: {ids}")
+    logger.debug("get_active_operator_ids: найдено операторов: %s", ids)
     return ids
 
 # === COMPANY ===
@@ -52,17 +107,29 @@ async def get_or_create_company(session: AsyncSession, name: str) -> Company:
     if not company:
         company = Company(name=name)
         session.add(company)
-        await session.commit()
-        await session.refresh(company)
+        await session.flush()
     return company
 
 
 # === FAQ ===
 
-async def get_faq_entries(session: AsyncSession, company_id: int) -> List[FAQEntry]:
-    result = await session.execute(
-        select(FAQEntry).where(FAQEntry.company_id == company_id)
-    )
+async def get_faq_entries(
+    session: AsyncSession,
+    company_id: int,
+    after_id: Optional[int] = None,
+    limit: Optional[int] = None
+) -> List[FAQEntry]:
+    """
+    Пункты FAQ компании по возрастанию id. С after_id / limit — keyset-страница
+    («id > after_id LIMIT limit»), без них — весь список.
+    """
+    query = select(FAQEntry).where(FAQEntry.company_id == company_id)
+    if after_id is not None:
+        query = query.where(FAQEntry.id > after_id)
+    query = query.order_by(FAQEntry.id)
+    if limit is not None:
+        query = query.limit(limit)
+    result = await session.execute(query)
     return result.scalars().all()
 
 
@@ -73,30 +140,31 @@ async def get_faq_by_id(session: AsyncSession, entry_id: int) -> Optional[FAQEnt
     return result.scalars().first()
 
 
-async def get_faq_by_keyword(session: AsyncSession, company_id: int, keyword: str) -> List[FAQEntry]:
-    result = await session.execute(
-        select(FAQEntry).where(
-            FAQEntry.company_id == company_id,
-            or_(
-                FAQEntry.question.ilike(f"%{keyword}%"),
-                FAQEntry.answer.ilike(f"%{keyword}%")
-            )
-        )
-    )
-    return result.scalars().all()
+async def get_faq_by_keyword(
+    session: AsyncSession,
+    company_id: int,
+    keyword: str,
+    limit: int = FAQ_SEARCH_LIMIT
+) -> List[FAQEntry]:
+    """
+    Полнотекстовый поиск по FAQ (см. bot/search.py): результаты ранжированы
+    по релевантности, не больше limit штук.
+    """
+    return await search_faq(session, company_id, keyword, limit=limit)
 
 
 async def create_faq_entry(session: AsyncSession, company_id: int, question: str, answer: str) -> FAQEntry:
     new_entry = FAQEntry(company_id=company_id, question=question, answer=answer)
     session.add(new_entry)
-    await session.commit()
-    await session.refresh(new_entry)
+    await session.flush()
+    await index_faq_entry(session, new_entry)
     return new_entry
 
 
 async def delete_faq_entry(session: AsyncSession, entry_id: int) -> None:
+    await unindex_faq_entry(session, entry_id)
     await session.execute(delete(FAQEntry).where(FAQEntry.id == entry_id))
-    await session.commit()
+    await session.flush()
 
 
 async def update_faq_entry(session: AsyncSession, entry_id: int, question: str, answer: str) -> None:
@@ -105,7 +173,89 @@ async def update_faq_entry(session: AsyncSession, entry_id: int, question: str,
         .where(FAQEntry.id == entry_id)
         .values(question=question, answer=answer)
     )
-    await session.commit()
+    entry = await get_faq_by_id(session, entry_id)
+    if entry:
+        await index_faq_entry(session, entry)
+    await session.flush()
+
+
+async def insert_faq_entries(session: AsyncSession, rows: List[dict]) -> List[int]:
+    """
+    Массовая вставка {"company_id", "question", "answer"} одним executemany
+    (без ORM-объектов и refresh); поисковый индекс — одной пачкой. Возвращает id.
+    """
+    if not rows:
+        return []
+    result = await session.execute(insert(FAQEntry).returning(FAQEntry.id), rows)
+    ids = result.scalars().all()
+    await reindex_faq_entries(session, ids)
+    return ids
+
+
+async def upsert_faq_entries(session: AsyncSession, rows: List[dict]) -> List[int]:
+    """
+    Пачка {"id", "company_id", "question", "answer"} одной компании: пункт с таким id
+    этой же компании обновляется, отсутствующий — вставляется с этим id, пункт другой
+    компании не трогается. Возвращает id действительно обновлённых и вставленных пунктов.
+    SQLite / PostgreSQL — один INSERT ... ON CONFLICT; в остальных БД — delete + insert.
+    """
+    if not rows:
+        return []
+    ids = [r["id"] for r in rows]
+    company_id = rows[0]["company_id"]
+    dialect = session.bind.dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as upsert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as upsert
+        stmt = upsert(FAQEntry)
+        await session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[FAQEntry.id],
+                set_={"question": stmt.excluded.question, "answer": stmt.excluded.answer},
+                where=FAQEntry.company_id == stmt.excluded.company_id
+            ),
+            rows
+        )
+        if dialect == "postgresql":
+            # Явные id не двигают последовательность — иначе следующий /add_faq получит занятый id
+            await session.execute(text(
+                "SELECT setval(pg_get_serial_sequence('faq_entries', 'id'), "
+                "(SELECT max(id) FROM faq_entries))"
+            ))
+    else:
+        await session.execute(
+            delete(FAQEntry).where(FAQEntry.id.in_(ids), FAQEntry.company_id == company_id)
+        )
+        taken = await session.execute(select(FAQEntry.id).where(FAQEntry.id.in_(ids)))
+        taken = set(taken.scalars().all())
+        fresh = [r for r in rows if r["id"] not in taken]
+        if fresh:
+            await session.execute(insert(FAQEntry), fresh)
+    # Строки с id пункта другой компании пропущены — после записи все id этой компании затронуты
+    affected = await session.execute(
+        select(FAQEntry.id).where(FAQEntry.id.in_(ids), FAQEntry.company_id == company_id)
+    )
+    affected = affected.scalars().all()
+    await reindex_faq_entries(session, affected)
+    return affected
+
+
+async def stream_faq_entries(
+    session: AsyncSession,
+    company_id: int,
+    batch_size: int = 1000
+) -> AsyncIterator[Tuple[int, str, str]]:
+    """(id, question, answer) всех пунктов компании по возрастанию id, по batch_size строк из курсора."""
+    result = await session.stream(
+        select(FAQEntry.id, FAQEntry.question, FAQEntry.answer)
+        .where(FAQEntry.company_id == company_id)
+        .order_by(FAQEntry.id)
+        .execution_options(yield_per=batch_size)
+    )
+    async for row in result:
+        yield row.id, row.question, row.answer
 
 
 # === OPERATOR ===
@@ -133,8 +283,8 @@ async def add_operator(
         existing.is_active = True
         existing.full_name = full_name  # обновляем имя, если оно могло измениться
         # company_id, скорее всего, не меняется, но если нужна логика “несколько компаний” – можно добавить.
-        await session.commit()
-        await session.refresh(existing)
+        await session.flush()
+        _invalidate_roles(session, existing.company_id)
         return existing
 
     # 2) Если оператора нет, создаём нового
@@ -145,8 +295,8 @@ async def add_operator(
         is_active=True
     )
     session.add(new_op)
-    await session.commit()
-    await session.refresh(new_op)
+    await session.flush()
+    _invalidate_roles(session, company_id)
     return new_op
 
 async def get_operators(session: AsyncSession, company_id: int) -> List[Operator]:
@@ -164,7 +314,52 @@ async def deactivate_operator(session: AsyncSession, operator_id: int) -> None:
     await session.execute(
         update(Operator).where(Operator.id == operator_id).values(is_active=False)
     )
-    await session.commit()
+    # company_id здесь неизвестен — сбрасываем кэш ролей целиком, это дёшево
+    _invalidate_roles(session, None)
+
+
+def _invalidate_roles(session: AsyncSession, company_id: Optional[int]) -> None:
+    """После commit сбрасывает кэш ролей — в этом процессе и в остальных воркерах кластера."""
+    def invalidate():
+        role_cache.invalidate(company_id)
+        cache_bus.publish("roles", company_id)
+    after_commit(session, invalidate)
+
+
+# === OPERATOR PRESENCE ===
+
+async def get_operator_presence(session: AsyncSession) -> List[OperatorPresence]:
+    result = await session.execute(select(OperatorPresence))
+    return result.scalars().all()
+
+
+async def save_operator_presence(session: AsyncSession, rows: List[dict]) -> None:
+    """
+    Записывает пачку {"telegram_id", "mode", "last_seen_at"} одним upsert
+    (SQLite / PostgreSQL); в остальных БД — delete + insert.
+    """
+    if not rows:
+        return
+    dialect = session.bind.dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as upsert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as upsert
+        stmt = upsert(OperatorPresence)
+        await session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[OperatorPresence.telegram_id],
+                set_={"mode": stmt.excluded.mode, "last_seen_at": stmt.excluded.last_seen_at}
+            ),
+            rows
+        )
+    else:
+        await session.execute(
+            delete(OperatorPresence).where(OperatorPresence.telegram_id.in_([r["telegram_id"] for r in rows]))
+        )
+        await session.execute(OperatorPresence.__table__.insert(), rows)
+    await session.flush()
 
 
 # === TICKETS ===
@@ -177,16 +372,28 @@ async def create_ticket(
 ) -> Ticket:
     new_ticket = Ticket(company_id=company_id, user_id=user_id, question_text=question_text, status="open")
     session.add(new_ticket)
-    await session.commit()
-    await session.refresh(new_ticket)
+    await session.flush()
     return new_ticket
 
 
-async def get_open_tickets(session: AsyncSession, company_id: int) -> List[Ticket]:
-    result = await session.execute(
-        select(Ticket).where(Ticket.company_id == company_id, Ticket.status == "open")
+def _ticket_preview_query():
+    return select(Ticket.id, func.substr(Ticket.question_text, 1, PREVIEW_LENGTH))
+
+
+async def get_open_tickets(
+    session: AsyncSession,
+    company_id: int,
+    after_id: Optional[int] = None,
+    before_id: Optional[int] = None,
+    limit: int = TICKETS_PAGE_SIZE
+) -> Page:
+    """
+    Страница открытых тикетов: только id и превью вопроса, без загрузки ORM-объектов.
+    """
+    query = _ticket_preview_query().where(
+        Ticket.company_id == company_id, Ticket.status == "open"
     )
-    return result.scalars().all()
+    return await _keyset_page(session, query, Ticket.id, after_id, before_id, limit)
 
 
 async def get_ticket_by_id(session: AsyncSession, ticket_id: int) -> Optional[Ticket]:
@@ -202,55 +409,192 @@ async def assign_ticket(session: AsyncSession, ticket_id: int, operator_id: str)
         .where(Ticket.id == ticket_id)
         .values(operator_id=operator_id, status="in_progress")
     )
-    await session.commit()
+    await session.flush()
 
 
-async def get_tickets_by_operator(session: AsyncSession, operator_id: str, company_id: int) -> List[Ticket]:
+async def claim_ticket(
+    session: AsyncSession,
+    ticket_id: int,
+    company_id: int,
+    operator_id: str
+) -> Optional[tuple[str, str]]:
+    """
+    Атомарно закрепляет открытый тикет за оператором одной командой
+    UPDATE ... WHERE id=? AND company_id=? AND status='open' RETURNING user_id, question_text.
+    Из одновременных попыток выигрывает ровно одна: остальные получают None
+    (тикет уже взят, закрыт или не найден).
+    """
     result = await session.execute(
-        select(Ticket).where(Ticket.operator_id == operator_id, Ticket.company_id == company_id, Ticket.status == "in_progress")
+        update(Ticket)
+        .where(
+            Ticket.id == ticket_id,
+            Ticket.company_id == company_id,
+            Ticket.status == "open"
+        )
+        .values(operator_id=operator_id, status="in_progress")
+        .returning(Ticket.user_id, Ticket.question_text)
+        .execution_options(synchronize_session=False)
     )
-    return result.scalars().all()
+    row = result.first()
+    return (row[0], row[1]) if row else None
+
+
+async def get_tickets_by_operator(
+    session: AsyncSession,
+    operator_id: str,
+    company_id: int,
+    after_id: Optional[int] = None,
+    before_id: Optional[int] = None,
+    limit: int = TICKETS_PAGE_SIZE
+) -> Page:
+    """
+    Страница тикетов оператора в статусе in_progress (id + превью).
+    """
+    query = _ticket_preview_query().where(
+        Ticket.operator_id == operator_id,
+        Ticket.company_id == company_id,
+        Ticket.status == "in_progress"
+    )
+    return await _keyset_page(session, query, Ticket.id, after_id, before_id, limit)
 
 
 async def close_ticket(session: AsyncSession, ticket_id: int) -> None:
     await session.execute(
         update(Ticket).where(Ticket.id == ticket_id).values(status="closed")
     )
-    await session.commit()
+    await session.flush()
+
+
+async def count_tickets_by_status(session: AsyncSession) -> dict[str, int]:
+    """{status: число тикетов} по всем компаниям (для метрик)."""
+    result = await session.execute(
+        select(Ticket.status, func.count()).group_by(Ticket.status)
+    )
+    return {status: count for status, count in result.all()}
+
+
+# === TRANSCRIPT ===
 
+async def add_ticket_messages(session: AsyncSession, rows: List[dict]) -> None:
+    """Вставляет пачку сообщений переписки одним INSERT ... VALUES (...), (...)."""
+    if rows:
+        await session.execute(insert(TicketMessage).values(rows))
+        await session.flush()
+
+
+async def get_ticket_messages(session: AsyncSession, ticket_id: int, limit: int) -> List[TicketMessage]:
+    """Последние limit сообщений тикета — в хронологическом порядке."""
+    result = await session.execute(
+        select(TicketMessage)
+        .where(TicketMessage.ticket_id == ticket_id)
+        .order_by(TicketMessage.id.desc())
+        .limit(limit)
+    )
+    return list(reversed(result.scalars().all()))
 
-# === USER SESSION ===
 
-async def create_or_update_user_session(
+# === OUTBOX ===
+
+async def enqueue_outbox_message(
     session: AsyncSession,
-    user_id: str,
-    company_id: int,
-    state: str
-) -> UserSession:
+    chat_id: int,
+    text: str,
+    reply_markup: Optional[str] = None
+) -> OutboxMessage:
+    msg = OutboxMessage(
+        chat_id=chat_id,
+        text=text,
+        reply_markup=reply_markup,
+        attempts=0,
+        next_attempt_at=datetime.now(timezone.utc)
+    )
+    session.add(msg)
+    await session.flush()
+    return msg
+
+
+async def get_due_outbox_messages(
+    session: AsyncSession,
+    limit: int,
+    shard: Optional[Tuple[int, int]] = None
+) -> List[OutboxMessage]:
     """
-    Если сессия уже есть, обновляем state. Если нет — создаём.
+    Сообщения, которые пора отправлять, в порядке постановки в очередь.
+    Чаты, у которых есть хоть одно отложенное (ещё не созревшее для повтора) сообщение,
+    пропускаются целиком — иначе более поздние сообщения обогнали бы его.
+    shard=(index, total) — только чаты с abs(chat_id) % total == index (воркер кластера).
     """
-    result = await session.execute(
-        select(UserSession).where(UserSession.user_id == user_id, UserSession.company_id == company_id)
+    now = datetime.now(timezone.utc)
+    delayed_chats = select(OutboxMessage.chat_id).where(OutboxMessage.next_attempt_at > now)
+    query = select(OutboxMessage).where(
+        OutboxMessage.next_attempt_at <= now,
+        OutboxMessage.chat_id.not_in(delayed_chats)
     )
-    us = result.scalars().first()
-    if not us:
-        us = UserSession(user_id=user_id, company_id=company_id, state=state)
-        session.add(us)
-    else:
-        us.state = state
-    await session.commit()
-    await session.refresh(us)
-    return us
+    if shard is not None:
+        index, total = shard
+        query = query.where(func.abs(OutboxMessage.chat_id) % total == index)
+    result = await session.execute(query.order_by(OutboxMessage.id).limit(limit))
+    return result.scalars().all()
 
 
-async def get_user_session(session: AsyncSession, user_id: str) -> Optional[UserSession]:
-    result = await session.execute(
-        select(UserSession).where(UserSession.user_id == user_id)
+async def delete_outbox_messages(session: AsyncSession, ids: List[int]) -> None:
+    if ids:
+        await session.execute(delete(OutboxMessage).where(OutboxMessage.id.in_(ids)))
+    await session.flush()
+
+
+async def reschedule_outbox_message(session: AsyncSession, message_id: int, delay: float) -> None:
+    await session.execute(
+        update(OutboxMessage)
+        .where(OutboxMessage.id == message_id)
+        .values(
+            attempts=OutboxMessage.attempts + 1,
+            next_attempt_at=datetime.now(timezone.utc) + timedelta(seconds=delay)
+        )
     )
-    return result.scalars().first()
+    await session.flush()
 
 
-async def delete_user_session(session: AsyncSession, user_id: str) -> None:
-    await session.execute(delete(UserSession).where(UserSession.user_id == user_id))
-    await session.commit()
+async def count_outbox_messages(session: AsyncSession) -> int:
+    result = await session.execute(select(func.count(OutboxMessage.id)))
+    return result.scalar_one()
+
+
+# === ARCHIVE ===
+
+_TICKET_COLUMNS = ("id", "company_id", "user_id", "operator_id", "question_text", "status", "created_at", "updated_at")
+_MESSAGE_COLUMNS = ("id", "ticket_id", "direction", "sender_id", "text", "chat_id", "message_id", "created_at")
+
+
+async def archive_closed_tickets(session: AsyncSession, closed_before: datetime, limit: int) -> int:
+    """
+    Переносит до limit тикетов, закрытых раньше closed_before (самые давние первыми),
+    вместе с их перепиской в tickets_archive / ticket_messages_archive:
+    INSERT ... SELECT и DELETE по списку id, строки через Python не проходят.
+    Возвращает число перенесённых тикетов; commit — за вызывающим.
+    """
+    result = await session.execute(
+        select(Ticket.id)
+        .where(Ticket.status == "closed", Ticket.updated_at < closed_before)
+        .order_by(Ticket.updated_at)
+        .limit(limit)
+    )
+    ids = result.scalars().all()
+    if not ids:
+        return 0
+    await session.execute(
+        insert(ArchivedTicket).from_select(
+            _TICKET_COLUMNS,
+            select(*(getattr(Ticket, c) for c in _TICKET_COLUMNS)).where(Ticket.id.in_(ids))
+        )
+    )
+    await session.execute(
+        insert(ArchivedTicketMessage).from_select(
+            _MESSAGE_COLUMNS,
+            select(*(getattr(TicketMessage, c) for c in _MESSAGE_COLUMNS)).where(TicketMessage.ticket_id.in_(ids))
+        )
+    )
+    await session.execute(delete(TicketMessage).where(TicketMessage.ticket_id.in_(ids)))
+    await session.execute(delete(Ticket).where(Ticket.id.in_(ids)))
+    await session.flush()
+    return len(ids)
@@ -1,15 +1,77 @@
 # bot/database.py
 import asyncio
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+import logging
+from contextlib import AsyncExitStack
+from typing import Callable
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
-from bot.config import config
+from bot.config import BotConfig, config
+
+logger = logging.getLogger(__name__)
+
+
+def sqlite_pragmas(cfg: BotConfig) -> dict:
+    """PRAGMA, которые build_engine() выполняет на каждом новом соединении SQLite."""
+    return {
+        "journal_mode": cfg.sqlite_journal_mode,
+        "synchronous": cfg.sqlite_synchronous,
+        "busy_timeout": cfg.sqlite_busy_timeout,
+        "cache_size": cfg.sqlite_cache_size,
+        "mmap_size": cfg.sqlite_mmap_size,
+    }
+
+
+def build_engine(database_url: str, cfg: BotConfig = config) -> AsyncEngine:
+    """
+    Движок с профилем из настроек:
+      • размер пула, overflow, timeout и recycle — DB_POOL_* в .env;
+      • pre-ping по умолчанию включён для серверных БД (соединение могло оборваться
+        на стороне сервера) и выключен для SQLite (локальный файл, лишний SELECT 1);
+      • для SQLite на каждом соединении выполняются sqlite_pragmas(): WAL и
+        synchronous=NORMAL вместо rollback-журнала с fsync на каждый commit,
+        busy_timeout вместо мгновенного "database is locked", кэш страниц и mmap.
+    """
+    url = make_url(database_url)
+    is_sqlite = url.get_backend_name() == "sqlite"
+    pre_ping = cfg.db_pool_pre_ping if cfg.db_pool_pre_ping is not None else not is_sqlite
+
+    options = {"pool_pre_ping": pre_ping}
+    # In-memory SQLite живёт в одном соединении (StaticPool) — параметры пула к нему не применимы
+    if not (is_sqlite and url.database in (None, "", ":memory:")):
+        options.update(
+            pool_size=cfg.db_pool_size,
+            max_overflow=cfg.db_max_overflow,
+            pool_timeout=cfg.db_pool_timeout,
+            pool_recycle=cfg.db_pool_recycle,
+        )
+
+    new_engine = create_async_engine(
+        database_url,
+        echo=False,  # можно включить для отладки SQL-запросов
+        future=True,
+        **options,
+    )
+
+    if is_sqlite:
+        pragmas = sqlite_pragmas(cfg)
+
+        @event.listens_for(new_engine.sync_engine, "connect")
+        def _set_sqlite_pragmas(dbapi_connection, _record):
+            cursor = dbapi_connection.cursor()
+            try:
+                for name, value in pragmas.items():
+                    cursor.execute(f"PRAGMA {name}={value}")
+            finally:
+                cursor.close()
+
+    return new_engine
+
 
 # Создаём движок
-engine = create_async_engine(
-    config.database_url,
-    echo=False,  # можно включить для отладки SQL-запросов
-    future=True,
-)
+engine = build_engine(config.database_url)
 
 # Фабрика асинхронных сессий
 async_session = sessionmaker(
@@ -18,6 +80,69 @@ async_session = sessionmaker(
     expire_on_commit=False,
 )
 Base = declarative_base()
+
+
+def after_commit(session: AsyncSession, callback: Callable[[], None]) -> None:
+    """
+    Вызывает callback() один раз — после того, как транзакция этой сессии будет
+    успешно закоммичена. crud-функции только делают flush, а коммит выполняет
+    DbSessionMiddleware в конце апдейта, поэтому всё, что должно увидеть уже
+    записанные данные (сброс кэшей, пробуждение воркеров, рассылки), вешается сюда.
+    """
+    event.listen(session.sync_session, "after_commit", lambda _session: callback(), once=True)
+
+
+def after_rollback(session: AsyncSession, callback: Callable[[], None]) -> None:
+    """
+    Вызывает callback() один раз, если текущая транзакция этой сессии закончится
+    без commit: откат, ошибка commit или закрытие сессии после упавшего хэндлера.
+    Пара к after_commit — для того, что уже сделано в памяти до коммита и должно
+    быть отменено, если транзакция не состоялась.
+    """
+    sync_session = session.sync_session
+    transaction = sync_session.get_transaction() or sync_session.begin()
+    committed = False
+
+    def on_commit(_session):
+        nonlocal committed
+        committed = True
+
+    def on_end(_session, ended):
+        if ended is transaction and not committed:
+            callback()
+
+    event.listen(sync_session, "after_commit", on_commit, once=True)
+    event.listen(sync_session, "after_transaction_end", on_end)
+
+
 async def init_models():
+    # Импорты внутри функции: модели и поиск сами импортируют Base отсюда
+    import bot.models  # noqa: F401 — регистрирует таблицы в Base.metadata
+    from bot.migrations import run_migrations
+    from bot.search import init_faq_search
+
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        # Изменения существующих таблиц (индексы и т.п.) — версионными миграциями
+        await run_migrations(conn)
+        await init_faq_search(conn)
+
+
+async def warm_up_pool(connections: int = config.db_pool_warmup) -> None:
+    """
+    Открывает connections соединений сразу (регистрируется в dp.startup): connect и
+    PRAGMA выполняются до первого апдейта, а не на пике нагрузки.
+    """
+    # Больше pool_size держать нечем — лишние соединения закроются при возврате
+    if hasattr(engine.pool, "size"):
+        connections = min(connections, engine.pool.size())
+    connections = max(connections, 1)
+
+    async with AsyncExitStack() as stack:
+        # Все соединения держим одновременно — иначе пул каждый раз вернёт одно и то же
+        conns = await asyncio.gather(*(
+            stack.enter_async_context(engine.connect()) for _ in range(connections)
+        ))
+        for conn in conns:
+            await conn.execute(text("SELECT 1"))
+    logger.info("DB pool warmed up: %s connections", connections)
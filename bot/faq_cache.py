@@ -0,0 +1,119 @@
+# bot/faq_cache.py
+
+import asyncio
+from bisect import bisect_left, bisect_right
+from types import MappingProxyType
+from typing import Dict, Mapping, NamedTuple, Optional
+
+from aiogram.types import InlineKeyboardMarkup
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.crud import get_faq_entries
+from bot.database import async_session
+from bot.keyboards import faq_list_keyboard
+from bot.pubsub import cache_bus
+
+# Сколько вопросов показывать на одной странице inline-клавиатуры FAQ
+FAQ_PAGE_SIZE = 10
+
+
+class FAQSnapshot(NamedTuple):
+    """
+    Неизменяемый снимок FAQ одной компании:
+      • entries  — {id: (question, answer)} (read-only mapping);
+      • items    — [(id, question), ...] по возрастанию id;
+      • ids      — те же id отдельным отсортированным кортежем для bisect.
+    Клавиатура страницы строится только по запросу: keyset «id > last_id LIMIT n»
+    по ids — O(log n) на листание, сколько бы пунктов ни было в FAQ.
+    """
+    entries: Mapping[int, tuple[str, str]]
+    items: tuple[tuple[int, str], ...]
+    ids: tuple[int, ...]
+
+    def _page(self, start: int) -> Optional[InlineKeyboardMarkup]:
+        if not self.items:
+            return None
+        if start >= len(self.items):
+            # Пункты после last_id удалили — показываем последнюю страницу
+            start = len(self.items) - FAQ_PAGE_SIZE
+        start = max(start, 0)
+        end = start + FAQ_PAGE_SIZE
+        return faq_list_keyboard(
+            list(self.items[start:end]),
+            has_prev=start > 0,
+            has_next=end < len(self.items)
+        )
+
+    @property
+    def keyboard(self) -> Optional[InlineKeyboardMarkup]:
+        """Первая страница или None, если FAQ пуст."""
+        return self._page(0)
+
+    def page_after(self, last_id: int) -> Optional[InlineKeyboardMarkup]:
+        """Страница из пунктов с id > last_id (кнопка ➡️)."""
+        return self._page(bisect_right(self.ids, last_id))
+
+    def page_before(self, first_id: int) -> Optional[InlineKeyboardMarkup]:
+        """Страница из пунктов, идущих перед first_id (кнопка ⬅️)."""
+        return self._page(bisect_left(self.ids, first_id) - FAQ_PAGE_SIZE)
+
+
+class FAQCache:
+    """
+    Держит в памяти по снимку FAQ на компанию. Снимок строится целиком и
+    подменяется одной операцией присваивания, поэтому читатели всегда видят
+    либо старую, либо новую версию, но не смесь.
+    Админские хэндлеры (/add_faq, /edit_faq, /del_faq, /import_faq) сначала коммитят
+    изменения, потом вызывают rebuild(company_id): снимок перечитывается из базы
+    отдельной сессией, а остальные воркеры кластера получают событие "faq"
+    и сбрасывают свой снимок.
+    """
+
+    def __init__(self):
+        self._snapshots: Dict[int, FAQSnapshot] = {}
+        self._locks: Dict[int, asyncio.Lock] = {}
+
+    async def get(self, company_id: int) -> FAQSnapshot:
+        snapshot = self._snapshots.get(company_id)
+        if snapshot is None:
+            snapshot = await self._load(company_id, force=False)
+        return snapshot
+
+    async def rebuild(self, company_id: int) -> FAQSnapshot:
+        """Перечитывает уже закоммиченный FAQ компании и оповещает остальные процессы."""
+        snapshot = await self._load(company_id, force=True)
+        cache_bus.publish("faq", company_id)
+        return snapshot
+
+    async def _load(self, company_id: int, force: bool) -> FAQSnapshot:
+        lock = self._locks.setdefault(company_id, asyncio.Lock())
+        async with lock:
+            # Пока ждали блокировку, снимок мог построить другой апдейт — не строим его заново
+            if not force and company_id in self._snapshots:
+                return self._snapshots[company_id]
+            async with async_session() as own_session:
+                snapshot = await self._build(own_session, company_id)
+            self._snapshots[company_id] = snapshot
+            return snapshot
+
+    async def _build(self, session: AsyncSession, company_id: int) -> FAQSnapshot:
+        faqs = await get_faq_entries(session, company_id)
+        rows = [(f.id, f.question, f.answer) for f in faqs]
+
+        return FAQSnapshot(
+            entries=MappingProxyType(
+                {entry_id: (question, answer) for entry_id, question, answer in rows}
+            ),
+            items=tuple((entry_id, question) for entry_id, question, _ in rows),
+            ids=tuple(entry_id for entry_id, _, _ in rows),
+        )
+
+    def invalidate(self, company_id: Optional[int] = None) -> None:
+        if company_id is None:
+            self._snapshots.clear()
+        else:
+            self._snapshots.pop(company_id, None)
+
+
+faq_cache = FAQCache()
+cache_bus.subscribe("faq", faq_cache.invalidate)
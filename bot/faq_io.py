@@ -0,0 +1,222 @@
+# bot/faq_io.py
+#
+# Массовый импорт и экспорт FAQ в CSV / JSONL: админские /import_faq и /export_faq
+# (bot/handlers/admin_handlers.py) и командная строка:
+#   python -m bot.faq_io import faq.csv [--company 1]
+#   python -m bot.faq_io export faq.jsonl [--company 1]
+# Формат — по расширению файла (.csv, .jsonl / .ndjson) или --format.
+#   CSV   — заголовок question,answer и необязательная колонка id;
+#   JSONL — по объекту {"question": ..., "answer": ..., "id": ...} на строку.
+# Строка с id обновляет пункт с этим id (или создаёт его), без id — добавляет новый,
+# поэтому экспортированный файл можно поправить и загрузить обратно.
+
+import argparse
+import asyncio
+import csv
+import json
+from itertools import islice
+from pathlib import Path
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+from bot.crud import insert_faq_entries, stream_faq_entries, upsert_faq_entries
+from bot.database import async_session
+from bot.models import FAQEntry
+
+# Строк на транзакцию при импорте и на выборку из курсора при экспорте
+FAQ_IO_CHUNK = 1000
+# Сколько ошибок в строках показывать в отчёте об импорте
+FAQ_IMPORT_MAX_ERRORS = 10
+
+FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+QUESTION_MAX_LENGTH = FAQEntry.question.type.length
+
+
+class ImportResult(NamedTuple):
+    imported: int
+    skipped: int
+    errors: List[str]  # первые FAQ_IMPORT_MAX_ERRORS ошибок: "строка N: причина"
+    # "строка N: причина", если файл дальше не читается (не UTF-8, битый CSV)
+    aborted: Optional[str] = None
+
+
+class FAQFileError(Exception):
+    """Файл не читается дальше строки line_no: не UTF-8 или сломанный CSV."""
+
+    def __init__(self, line_no: int, reason: str):
+        super().__init__(f"строка {line_no}: {reason}")
+        self.line_no = line_no
+        self.reason = reason
+
+
+def detect_format(filename: Optional[str]) -> Optional[str]:
+    """"csv" / "jsonl" по расширению или None, если формат не поддерживается."""
+    return FORMATS.get(Path(filename or "").suffix.lower())
+
+
+def _read_rows(path: Path, fmt: str) -> Iterator[Tuple[int, dict]]:
+    """
+    (номер строки, запись) по одной — файл целиком в память не читается.
+    Байты декодируются построчно, чтобы ошибка кодировки всплывала на своей строке,
+    а не на целом прочитанном блоке. utf-8-sig: Excel сохраняет CSV с BOM.
+    Если CSV дальше не читается — FAQFileError с номером строки.
+    """
+    with open(path, "rb") as f:
+        if fmt == "csv":
+            reader = csv.DictReader(_decode_lines(f))
+            try:
+                for record in reader:
+                    yield reader.line_num, record
+            except csv.Error as e:
+                raise FAQFileError(reader.line_num, f"ошибка CSV: {e}")
+        else:
+            for line_no, raw in enumerate(f, start=1):
+                try:
+                    line = raw.decode("utf-8-sig")
+                    if line.strip():
+                        yield line_no, json.loads(line)
+                except ValueError:
+                    # UnicodeDecodeError — тоже ValueError: строка пропускается, как и битый JSON
+                    yield line_no, None
+
+
+def _decode_lines(f) -> Iterator[str]:
+    for line_no, raw in enumerate(f, start=1):
+        try:
+            yield raw.decode("utf-8-sig")
+        except UnicodeDecodeError:
+            raise FAQFileError(line_no, "файл не в кодировке UTF-8 (в Excel сохраните его как «CSV UTF-8»)")
+
+
+def _parse(record: Optional[dict], company_id: int) -> dict:
+    """Запись файла → строка для crud; ValueError с причиной, если строка негодна."""
+    if not isinstance(record, dict):
+        raise ValueError("не удалось разобрать строку")
+    question = str(record.get("question") or "").strip()
+    answer = str(record.get("answer") or "").strip()
+    if not question or not answer:
+        raise ValueError("нужны и вопрос, и ответ")
+    if len(question) > QUESTION_MAX_LENGTH:
+        raise ValueError(f"вопрос длиннее {QUESTION_MAX_LENGTH} символов")
+    row = {"company_id": company_id, "question": question, "answer": answer}
+    entry_id = record.get("id")
+    if entry_id not in (None, ""):
+        try:
+            row["id"] = int(entry_id)
+        except (TypeError, ValueError):
+            raise ValueError(f"id должен быть числом: {entry_id!r}")
+    return row
+
+
+async def import_faq(
+    path: Path,
+    company_id: int,
+    fmt: Optional[str] = None,
+    chunk_size: int = FAQ_IO_CHUNK
+) -> ImportResult:
+    """
+    Загружает FAQ из файла пачками по chunk_size строк: каждая пачка — одна транзакция
+    с executemany-вставкой (и upsert для строк с id). Память не зависит от размера файла.
+    Негодные строки пропускаются. Если файл дальше не читается, строки до этого места
+    загружаются, а причина возвращается в aborted. Кэш FAQ сбрасывает вызывающий.
+    """
+    path = Path(path)
+    fmt = fmt or detect_format(path.name)
+    if fmt not in FORMATS.values():
+        raise ValueError(f"Неподдерживаемый формат файла: {path.name}")
+
+    imported = skipped = 0
+    errors: List[str] = []
+    aborted: Optional[str] = None
+
+    def error(line_no: int, reason: str) -> None:
+        if len(errors) < FAQ_IMPORT_MAX_ERRORS:
+            errors.append(f"строка {line_no}: {reason}")
+
+    rows = _read_rows(path, fmt)
+    while aborted is None:
+        chunk = []
+        try:
+            chunk.extend(islice(rows, chunk_size))
+        except FAQFileError as e:
+            # Генератор после исключения закрыт: загружаем прочитанное и останавливаемся
+            aborted = str(e)
+        if not chunk:
+            break
+        new, existing, lines = [], [], {}
+        for line_no, record in chunk:
+            try:
+                row = _parse(record, company_id)
+            except ValueError as e:
+                skipped += 1
+                error(line_no, str(e))
+                continue
+            if "id" in row:
+                existing.append(row)
+                lines[row["id"]] = line_no
+            else:
+                new.append(row)
+        async with async_session() as session:
+            updated = set(await upsert_faq_entries(session, existing))
+            await insert_faq_entries(session, new)
+            await session.commit()
+        imported += len(new) + len(updated)
+        for entry_id, line_no in lines.items():
+            if entry_id not in updated:
+                skipped += 1
+                error(line_no, f"пункт #{entry_id} принадлежит другой компании")
+    return ImportResult(imported, skipped, errors, aborted)
+
+
+async def export_faq(
+    path: Path,
+    company_id: int,
+    fmt: Optional[str] = None,
+    chunk_size: int = FAQ_IO_CHUNK
+) -> int:
+    """Выгружает FAQ компании в файл, читая курсор пачками по chunk_size; возвращает число пунктов."""
+    path = Path(path)
+    fmt = fmt or detect_format(path.name)
+    if fmt not in FORMATS.values():
+        raise ValueError(f"Неподдерживаемый формат файла: {path.name}")
+
+    count = 0
+    async with async_session() as session:
+        if fmt == "csv":
+            with open(path, "w", newline="", encoding="utf-8-sig") as f:
+                writer = csv.writer(f)
+                writer.writerow(("id", "question", "answer"))
+                async for row in stream_faq_entries(session, company_id, chunk_size):
+                    writer.writerow(row)
+                    count += 1
+        else:
+            with open(path, "w", encoding="utf-8") as f:
+                async for entry_id, question, answer in stream_faq_entries(session, company_id, chunk_size):
+                    f.write(json.dumps({"id": entry_id, "question": question, "answer": answer},
+                                       ensure_ascii=False) + "\n")
+                    count += 1
+    return count
+
+
+async def main(args: argparse.Namespace) -> None:
+    from bot.database import init_models
+
+    await init_models()
+    if args.action == "import":
+        result = await import_faq(args.file, args.company, args.format)
+        print(f"Загружено: {result.imported}, пропущено: {result.skipped}")
+        for error in result.errors:
+            print(f"  {error}")
+        if result.aborted:
+            print(f"Чтение файла остановлено, {result.aborted}")
+    else:
+        count = await export_faq(args.file, args.company, args.format)
+        print(f"Выгружено: {count} -> {args.file}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Импорт и экспорт FAQ в CSV / JSONL")
+    parser.add_argument("action", choices=("import", "export"))
+    parser.add_argument("file", type=Path)
+    parser.add_argument("--company", type=int, default=1, help="id компании (по умолчанию 1)")
+    parser.add_argument("--format", choices=sorted(set(FORMATS.values())), help="по умолчанию — по расширению")
+    asyncio.run(main(parser.parse_args()))
@@ -1,54 +1,59 @@
 # bot/filters.py
 
-from typing import Union
+from typing import Optional, Union
 from aiogram.filters import BaseFilter
 from aiogram.types import Message, CallbackQuery
 
-from bot.config import config
-from bot.database import async_session
-from bot.crud import get_operators
+from bot.role_cache import OperatorInfo, role_cache
+
+# Роль отправителя заранее вычисляет RoleMiddleware (bot/middlewares.py) и кладёт
+# в данные хэндлера is_admin / operator. Если middleware не подключён (is_admin=None),
+# фильтры сами спрашивают role_cache — так они работают и без него.
 
 
 # --- 1) Фильтр IsAdmin ---
 class IsAdmin(BaseFilter):
-    async def __call__(self, message: Union[Message, CallbackQuery]) -> bool:
-        if isinstance(message, CallbackQuery):
-            user_id = message.from_user.id
-        else:
-            user_id = message.from_user.id
-
-        return user_id in config.get_admin_list
+    async def __call__(
+        self,
+        message: Union[Message, CallbackQuery],
+        is_admin: Optional[bool] = None
+    ) -> bool:
+        if is_admin is not None:
+            return is_admin
+        return role_cache.is_admin(message.from_user.id)
 
 
 # --- 2) Фильтр IsOperator ---
 class IsOperator(BaseFilter):
-    async def __call__(self, message: Union[Message, CallbackQuery]) -> bool:
-        if isinstance(message, CallbackQuery):
-            user_id = message.from_user.id
-        else:
-            user_id = message.from_user.id
-
-        async with async_session() as session:
-            ops = await get_operators(session, company_id=1)
-        return any(int(op.telegram_id) == user_id for op in ops)
+    async def __call__(
+        self,
+        message: Union[Message, CallbackQuery],
+        is_admin: Optional[bool] = None,
+        operator: Optional[OperatorInfo] = None
+    ) -> bool:
+        if is_admin is not None:
+            return operator is not None
+        return await role_cache.is_operator(message.from_user.id, company_id=1)
 
 
 # --- 3) Фильтр IsUser (ни админ, ни оператор) ---
 class IsUser(BaseFilter):
-    async def __call__(self, message: Union[Message, CallbackQuery]) -> bool:
-        if isinstance(message, CallbackQuery):
-            user_id = message.from_user.id
-        else:
-            user_id = message.from_user.id
-
+    async def __call__(
+        self,
+        message: Union[Message, CallbackQuery],
+        is_admin: Optional[bool] = None,
+        operator: Optional[OperatorInfo] = None
+    ) -> bool:
+        if is_admin is not None:
+            return not is_admin and operator is None
+
+        user_id = message.from_user.id
         # Если админ — не пользователь
-        if user_id in config.get_admin_list:
+        if role_cache.is_admin(user_id):
             return False
 
         # Если оператор — не пользователь
-        async with async_session() as session:
-            ops = await get_operators(session, company_id=1)
-        if any(int(op.telegram_id) == user_id for op in ops):
+        if await role_cache.is_operator(user_id, company_id=1):
             return False
 
         return True
@@ -0,0 +1,261 @@
+# bot/fsm_storage.py
+
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+from sqlalchemy import delete
+from sqlalchemy.future import select
+
+from bot.database import async_session
+from bot.models import FSMRecord
+
+logger = logging.getLogger(__name__)
+
+# Сколько контекстов держать в памяти (LRU)
+FSM_CACHE_SIZE = 10_000
+# Контекст, к которому не обращались дольше TTL, удаляется из памяти и из БД
+FSM_TTL = timedelta(days=7)
+# Как часто сбрасывать изменения в БД и сколько изменений ждать не дольше этого
+FSM_FLUSH_INTERVAL = 1.0
+FSM_FLUSH_BATCH = 500
+# Как часто чистить просроченные строки fsm_records
+FSM_PURGE_INTERVAL = 600.0
+# Контекст, который только читают (оператор переписывается с клиентом), тоже нужно
+# продлевать в БД: не реже этого его updated_at перезаписывается временем обращения
+FSM_TOUCH_INTERVAL = timedelta(hours=1)
+
+
+class _Entry:
+    """
+    Состояние и данные одного контекста плюс время последнего обращения (touched)
+    и то, что записано в fsm_records.updated_at (saved).
+    """
+    __slots__ = ("state", "data", "touched", "saved")
+
+    def __init__(self, state: Optional[str] = None, data: Optional[Dict[str, Any]] = None,
+                 touched: Optional[float] = None, saved: Optional[float] = None):
+        self.state = state
+        self.data = data if data is not None else {}
+        self.touched = touched if touched is not None else time.time()
+        self.saved = saved if saved is not None else self.touched
+
+
+class SQLStorage(BaseStorage):
+    """
+    FSM-хранилище aiogram поверх таблицы fsm_records (вместо MemoryStorage):
+      • чтение — через LRU в памяти на cache_size контекстов; промах — один SELECT,
+        отсутствующие в БД контексты тоже кэшируются (пустыми);
+      • запись — write-behind: set_state/set_data меняют только память и помечают
+        контекст «грязным», фоновая задача раз в flush_interval (или при накоплении
+        FSM_FLUSH_BATCH изменений) пишет их одной транзакцией, пустые — удаляет;
+      • контексты, простаивающие дольше ttl, вытесняются из памяти и удаляются из БД;
+        чтобы не удалить контекст, который только читают, его updated_at продлевается
+        не реже раза в touch_interval — поэтому строка в БД считается просроченной
+        только через ttl + touch_interval.
+    close() (его вызывает dp.shutdown) сбрасывает несохранённое. При аварийном
+    падении процесса теряются изменения последних flush_interval секунд.
+    Кэш локален для процесса, поэтому при нескольких процессах один чат должен
+    всегда обрабатываться одним и тем же процессом.
+    """
+
+    def __init__(
+        self,
+        session_factory=async_session,
+        cache_size: int = FSM_CACHE_SIZE,
+        ttl: timedelta = FSM_TTL,
+        flush_interval: float = FSM_FLUSH_INTERVAL,
+        touch_interval: timedelta = FSM_TOUCH_INTERVAL,
+        key_builder: Optional[KeyBuilder] = None
+    ):
+        self.session_factory = session_factory
+        self.cache_size = cache_size
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self.touch_interval = touch_interval
+        self.key_builder = key_builder or DefaultKeyBuilder(with_destiny=True)
+        self.writes = 0
+        self._cache: "OrderedDict[str, _Entry]" = OrderedDict()
+        # Изменённые, но ещё не записанные контексты: читаются отсюда в первую очередь,
+        # поэтому вытеснение из LRU их не теряет
+        self._dirty: Dict[str, _Entry] = {}
+        self._flush_now: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._last_purge = time.monotonic()
+
+    # === BaseStorage ===
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        k = self.key_builder.build(key)
+        entry = await self._entry(k)
+        entry.state = state.state if isinstance(state, State) else state
+        self._mark_dirty(k, entry)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return (await self._entry(self.key_builder.build(key))).state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        k = self.key_builder.build(key)
+        entry = await self._entry(k)
+        entry.data = data.copy()
+        self._mark_dirty(k, entry)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return (await self._entry(self.key_builder.build(key))).data.copy()
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    # === Кэш ===
+
+    async def _entry(self, k: str) -> _Entry:
+        entry = self._dirty.get(k) or self._cache.get(k)
+        if entry is None:
+            loaded = await self._load(k)
+            # Пока шёл SELECT, контекст мог уже появиться (параллельный апдейт) — он новее
+            entry = self._dirty.get(k) or self._cache.get(k) or loaded
+        entry.touched = time.time()
+        if (
+            entry.touched - entry.saved >= self.touch_interval.total_seconds()
+            and (entry.state is not None or entry.data)
+        ):
+            # Давно не записывали — продлеваем строку в БД, даже если контекст не менялся
+            self._mark_dirty(k, entry)
+        self._cache[k] = entry
+        self._cache.move_to_end(k)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return entry
+
+    async def _load(self, k: str) -> _Entry:
+        async with self.session_factory() as session:
+            row = (await session.execute(
+                select(FSMRecord.state, FSMRecord.data, FSMRecord.updated_at)
+                .where(FSMRecord.key == k)
+            )).first()
+        if row is None:
+            return _Entry()
+        updated_at = row.updated_at
+        if updated_at.tzinfo is None:
+            updated_at = updated_at.replace(tzinfo=timezone.utc)
+        if datetime.now(timezone.utc) - updated_at > self.ttl + self.touch_interval:
+            return _Entry()
+        return _Entry(row.state, json.loads(row.data) if row.data else {}, saved=updated_at.timestamp())
+
+    def _mark_dirty(self, k: str, entry: _Entry) -> None:
+        self._dirty[k] = entry
+        if self._task is None:
+            self._flush_now = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+        if len(self._dirty) >= FSM_FLUSH_BATCH:
+            self._flush_now.set()
+
+    # === Запись в БД ===
+
+    async def flush(self) -> int:
+        """Пишет все изменённые контексты одной транзакцией; возвращает их число."""
+        if not self._dirty:
+            return 0
+        batch, self._dirty = self._dirty, {}
+
+        upserts = []
+        empty_keys = []
+        # touched может измениться, пока идёт запись, — запоминаем, что именно пишем
+        stamps = {k: entry.touched for k, entry in batch.items()}
+        for k, entry in batch.items():
+            if entry.state is None and not entry.data:
+                empty_keys.append(k)
+            else:
+                upserts.append({
+                    "key": k,
+                    "state": entry.state,
+                    "data": json.dumps(entry.data, ensure_ascii=False) if entry.data else None,
+                    "updated_at": datetime.fromtimestamp(stamps[k], timezone.utc),
+                })
+
+        try:
+            async with self.session_factory() as session:
+                if empty_keys:
+                    await session.execute(delete(FSMRecord).where(FSMRecord.key.in_(empty_keys)))
+                if upserts:
+                    await self._upsert(session, upserts)
+                await session.commit()
+        except BaseException:
+            # Возвращаем в очередь то, что не успели перезаписать заново (в т.ч. при отмене)
+            for k, entry in batch.items():
+                self._dirty.setdefault(k, entry)
+            raise
+        for k, entry in batch.items():
+            entry.saved = stamps[k]
+        self.writes += len(batch)
+        return len(batch)
+
+    @staticmethod
+    async def _upsert(session, rows) -> None:
+        dialect = session.bind.dialect.name
+        if dialect in ("sqlite", "postgresql"):
+            if dialect == "sqlite":
+                from sqlalchemy.dialects.sqlite import insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert
+            stmt = insert(FSMRecord)
+            await session.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=[FSMRecord.key],
+                    set_={
+                        "state": stmt.excluded.state,
+                        "data": stmt.excluded.data,
+                        "updated_at": stmt.excluded.updated_at,
+                    }
+                ),
+                rows
+            )
+            return
+        await session.execute(delete(FSMRecord).where(FSMRecord.key.in_([r["key"] for r in rows])))
+        await session.execute(FSMRecord.__table__.insert(), rows)
+
+    async def purge_expired(self) -> int:
+        """Удаляет контексты, простаивающие дольше ttl; возвращает число строк в БД."""
+        cutoff = time.time() - self.ttl.total_seconds()
+        for k in [k for k, e in self._cache.items() if e.touched < cutoff and k not in self._dirty]:
+            del self._cache[k]
+        # updated_at отстаёт от последнего обращения не больше чем на touch_interval
+        db_cutoff = cutoff - self.touch_interval.total_seconds()
+        async with self.session_factory() as session:
+            result = await session.execute(
+                delete(FSMRecord).where(
+                    FSMRecord.updated_at < datetime.fromtimestamp(db_cutoff, timezone.utc)
+                )
+            )
+            await session.commit()
+        return result.rowcount or 0
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_now.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_now.clear()
+            try:
+                await self.flush()
+                if time.monotonic() - self._last_purge >= FSM_PURGE_INTERVAL:
+                    self._last_purge = time.monotonic()
+                    await self.purge_expired()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("FSM storage: flush failed")
@@ -1,11 +1,18 @@
 # bot/handlers/admin_handlers.py
 
-from aiogram import Router
-from aiogram.filters import Command
-from aiogram.types import Message
+import logging
+import tempfile
+from functools import wraps
+from pathlib import Path
 
-from bot.config import config
-from bot.database import async_session
+from aiogram import Bot, Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import FSInputFile, Message
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.role_cache import role_cache
+from bot.faq_cache import faq_cache
+from bot.faq_io import FORMATS, detect_format, export_faq, import_faq
 from bot.crud import (
     create_faq_entry,
     delete_faq_entry,
@@ -17,21 +24,27 @@ from bot.crud import (
 )
 
 router = Router()
+logger = logging.getLogger(__name__)
+
+# Сколько пунктов FAQ выводить в одном сообщении /list_faq
+LIST_FAQ_PAGE_SIZE = 50
 
 
 def admin_only(handler):
+    # wraps() сохраняет сигнатуру хэндлера — aiogram по ней передаёт session и др.
+    @wraps(handler)
     async def wrapper(message: Message, *args, **kwargs):
         user_id = message.from_user.id
-        if user_id not in config.get_admin_list:
+        if not role_cache.is_admin(user_id):
             await message.answer("⛔ У вас нет прав для выполнения этой команды.")
             return
-        return await handler(message)
+        return await handler(message, *args, **kwargs)
     return wrapper
 
 
 @router.message(Command("add_operator"))
 @admin_only
-async def cmd_add_operator(message: Message):
+async def cmd_add_operator(message: Message, session: AsyncSession):
     text = message.text or ""
     parts = text.split(maxsplit=2)
     if len(parts) < 3:
@@ -48,14 +61,13 @@ async def cmd_add_operator(message: Message):
         return
 
     company_id = 1
-    async with async_session() as session:
-        await add_operator(session, company_id, telegram_id=tg_id, full_name=full_name)
+    await add_operator(session, company_id, telegram_id=tg_id, full_name=full_name)
     await message.answer(f"✅ Оператор {full_name} (ID={tg_id}) добавлен.")
 
 
 @router.message(Command("remove_operator"))
 @admin_only
-async def cmd_remove_operator(message: Message):
+async def cmd_remove_operator(message: Message, session: AsyncSession):
     text = message.text or ""
     parts = text.split(maxsplit=1)
     if len(parts) != 2 or not parts[1].isdigit():
@@ -64,19 +76,18 @@ async def cmd_remove_operator(message: Message):
 
     tg_id = parts[1]
     company_id = 1
-    async with async_session() as session:
-        operators = await get_operators(session, company_id)
-        op = next((o for o in operators if o.telegram_id == tg_id), None)
-        if not op:
-            await message.answer("Оператор с таким ID не найден.")
-            return
-        await deactivate_operator(session, op.id)
+    operators = await get_operators(session, company_id)
+    op = next((o for o in operators if o.telegram_id == tg_id), None)
+    if not op:
+        await message.answer("Оператор с таким ID не найден.")
+        return
+    await deactivate_operator(session, op.id)
     await message.answer(f"✅ Оператор {tg_id} отключён.")
 
 
 @router.message(Command("add_faq"))
 @admin_only
-async def cmd_add_faq(message: Message):
+async def cmd_add_faq(message: Message, session: AsyncSession):
     text = message.text or ""
     args = text[len("/add_faq"):].strip()
     if "|" not in args:
@@ -89,14 +100,17 @@ async def cmd_add_faq(message: Message):
         return
 
     company_id = 1
-    async with async_session() as session:
-        faq = await create_faq_entry(session, company_id, question, answer)
+    faq = await create_faq_entry(session, company_id, question, answer)
+    # Коммитим до ответа: блокировку записи не держим, пока идёт запрос к Telegram,
+    # а кэш перечитываем уже из закоммиченных данных
+    await session.commit()
+    await faq_cache.rebuild(company_id)
     await message.answer(f"✅ Добавлен новый пункт FAQ: #{faq.id}")
 
 
 @router.message(Command("del_faq"))
 @admin_only
-async def cmd_del_faq(message: Message):
+async def cmd_del_faq(message: Message, session: AsyncSession):
     text = message.text or ""
     parts = text.split(maxsplit=1)
     if len(parts) != 2 or not parts[1].isdigit():
@@ -104,14 +118,18 @@ async def cmd_del_faq(message: Message):
         return
 
     entry_id = int(parts[1])
-    async with async_session() as session:
-        await delete_faq_entry(session, entry_id)
+    company_id = 1
+    await delete_faq_entry(session, entry_id)
+    # Коммитим до ответа: блокировку записи не держим, пока идёт запрос к Telegram,
+    # а кэш перечитываем уже из закоммиченных данных
+    await session.commit()
+    await faq_cache.rebuild(company_id)
     await message.answer(f"✅ Удалён пункт FAQ #{entry_id}")
 
 
 @router.message(Command("edit_faq"))
 @admin_only
-async def cmd_edit_faq(message: Message):
+async def cmd_edit_faq(message: Message, session: AsyncSession):
     text = message.text or ""
     parts = text.split(maxsplit=1)
     if len(parts) < 2:
@@ -137,23 +155,104 @@ async def cmd_edit_faq(message: Message):
         await message.answer("И вопрос, и ответ должны быть непустыми.")
         return
 
-    async with async_session() as session:
-        await update_faq_entry(session, entry_id, question, answer)
+    company_id = 1
+    await update_faq_entry(session, entry_id, question, answer)
+    # Коммитим до ответа: блокировку записи не держим, пока идёт запрос к Telegram,
+    # а кэш перечитываем уже из закоммиченных данных
+    await session.commit()
+    await faq_cache.rebuild(company_id)
     await message.answer(f"✅ Обновлён пункт FAQ #{entry_id}")
 
 
 @router.message(Command("list_faq"))
 @admin_only
-async def cmd_list_faq(message: Message):
+async def cmd_list_faq(message: Message, session: AsyncSession):
+    """
+    /list_faq [after_id] — постранично, LIST_FAQ_PAGE_SIZE пунктов за раз
+    (keyset: показываем пункты с id > after_id).
+    """
+    text = message.text or ""
+    parts = text.split(maxsplit=1)
+    after_id = int(parts[1]) if len(parts) == 2 and parts[1].strip().isdigit() else None
+
     company_id = 1
-    async with async_session() as session:
-        entries = await get_faq_entries(session, company_id)
+    entries = await get_faq_entries(
+        session, company_id, after_id=after_id, limit=LIST_FAQ_PAGE_SIZE + 1
+    )
 
     if not entries:
         await message.answer("Сейчас в FAQ нет ни одного пункта.")
         return
 
+    has_next = len(entries) > LIST_FAQ_PAGE_SIZE
+    entries = entries[:LIST_FAQ_PAGE_SIZE]
+
     text = "<b>Список текущих FAQ:</b>\n"
     for entry in entries:
         text += f"{entry.id}. {entry.question}\n"
+    if has_next:
+        text += f"\nДальше: /list_faq {entries[-1].id}"
+    await message.answer(text)
+
+
+@router.message(Command("import_faq"))
+@admin_only
+async def cmd_import_faq(message: Message, bot: Bot):
+    """
+    /import_faq — подписью к файлу .csv / .jsonl или ответом на сообщение с ним.
+    Файл скачивается во временный каталог и загружается пачками (bot/faq_io.py).
+    """
+    document = message.document
+    if document is None and message.reply_to_message is not None:
+        document = message.reply_to_message.document
+    if document is None:
+        await message.answer(
+            "Пришлите файл .csv или .jsonl с подписью /import_faq "
+            "(или ответьте этой командой на сообщение с файлом).\n\n"
+            "CSV: колонки question,answer и необязательная id.\n"
+            "JSONL: по строке {\"question\": ..., \"answer\": ...} на пункт.\n"
+            "Пункт с id обновляется, без id — добавляется."
+        )
+        return
+
+    fmt = detect_format(document.file_name)
+    if fmt is None:
+        await message.answer("Поддерживаются только файлы .csv и .jsonl.")
+        return
+
+    company_id = 1
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / f"import.{fmt}"
+            await bot.download(document, destination=path)
+            result = await import_faq(path, company_id, fmt)
+    finally:
+        # Пачки коммитятся по одной: даже если импорт упал, часть могла записаться
+        await faq_cache.rebuild(company_id)
+    logger.info("FAQ import by %s: %s imported, %s skipped", message.from_user.id, result.imported, result.skipped)
+
+    text = f"✅ Загружено пунктов FAQ: {result.imported}"
+    if result.skipped:
+        text += f"\nПропущено строк: {result.skipped}\n" + "\n".join(result.errors)
+    if result.aborted:
+        text += f"\n\n⚠️ Чтение файла остановлено, {result.aborted}. Строки до неё загружены."
     await message.answer(text)
+
+
+@router.message(Command("export_faq"))
+@admin_only
+async def cmd_export_faq(message: Message, command: CommandObject):
+    """/export_faq [csv|jsonl] — присылает весь FAQ файлом (по умолчанию CSV)."""
+    fmt = (command.args or "csv").strip().lower()
+    if fmt not in FORMATS.values():
+        await message.answer("Неверный формат. Используйте /export_faq csv или /export_faq jsonl")
+        return
+
+    company_id = 1
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / f"faq.{fmt}"
+        count = await export_faq(path, company_id, fmt)
+        if not count:
+            await message.answer("Сейчас в FAQ нет ни одного пункта.")
+            return
+        await message.answer_document(FSInputFile(path), caption=f"FAQ: {count} пунктов")
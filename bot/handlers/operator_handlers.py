@@ -1,16 +1,20 @@
 # bot/handlers/operator_handlers.py
 
+import html
+from typing import Optional
+
 from aiogram import Router, F
-from aiogram.filters import Command
+from aiogram.filters import Command, CommandObject
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from bot.database import async_session
 from bot.crud import (
     get_open_tickets,
     get_ticket_by_id,
-    assign_ticket,
+    claim_ticket,
     get_tickets_by_operator,
+    get_ticket_messages,
     close_ticket
 )
 from bot.keyboards import (
@@ -20,66 +24,98 @@ from bot.keyboards import (
     select_ticket_keyboard,
     operator_my_tickets_keyboard
 )
+from bot.outbox import outbox
+from bot.presence import AWAY, OFFLINE, ONLINE, presence
+from bot.routing import routing_table
+from bot.transcript import TO_CUSTOMER, TO_OPERATOR, message_text, transcript
 from bot.states import OperatorStates
 
 router = Router()
 
+# Сколько последних сообщений переписки показывать при переключении на тикет
+TRANSCRIPT_PREVIEW = 5
+
+PRESENCE_LABELS = {
+    ONLINE: "🟢 на связи",
+    AWAY: "🟡 отошёл",
+    OFFLINE: "⚪️ не в сети",
+}
+
+
+def _page_cursor(data: str) -> tuple[Optional[int], Optional[int]]:
+    """
+    Разбирает callback_data кнопок листания "<prefix>:next:<id>" / "<prefix>:prev:<id>"
+    в пару (after_id, before_id) для keyset-запросов из bot/crud.py.
+    """
+    _, direction, ref_id = data.split(":")
+    if direction == "prev":
+        return None, int(ref_id)
+    return int(ref_id), None
+
 # 0) /start_operator → показывает ReplyKeyboard меню оператора
 @router.message(Command("start_operator"))
 async def cmd_start_operator(message: Message):
+    status = PRESENCE_LABELS[presence.status_of(message.from_user.id)]
     await message.answer(
-        "Система техподдержки — меню оператора. Выберите действие:",
+        "Система техподдержки — меню оператора. Выберите действие:\n\n"
+        f"Ваш статус: {status}. Сменить: /online, /away, /offline",
         reply_markup=operator_main_menu()
     )
 
+# 0.1) /online, /away, /offline → статус присутствия (bot/presence.py).
+#      Уведомления о новых тикетах и автоназначение получают только операторы на связи
+@router.message(Command(ONLINE, AWAY, OFFLINE))
+async def cmd_set_presence(message: Message, command: CommandObject):
+    status = presence.set_mode(message.from_user.id, command.command.lower())
+    hint = ""
+    if status != ONLINE:
+        hint = ("\nО новых тикетах вы узнаете, только если на связи нет никого из операторов. "
+                "Вернуться: /online")
+    return message.answer(f"Ваш статус: {PRESENCE_LABELS[status]}.{hint}")
+
 @router.message(Command("tickets"))
-async def cmd_list_tickets_command(message: Message):
+async def cmd_list_tickets_command(message: Message, session: AsyncSession):
     """
     Позволяет оператору вызвать список открытых тикетов командой /tickets,
     если он не хочет нажимать кнопку “📋 Открытые тикеты”.
     """
-    await show_open_tickets(message)
+    await show_open_tickets(message, session)
 
 # 1) Reply “📋 Открытые тикеты” (эквивалент /tickets)
 @router.message(F.text == "📋 Открытые тикеты")
-async def show_open_tickets(message: Message):
-    operator_id = str(message.from_user.id)
+async def show_open_tickets(message: Message, session: AsyncSession):
     company_id = 1
-    async with async_session() as session:
-        open_tickets = await get_open_tickets(session, company_id)
-        simplified = [(t.id, t.question_text) for t in open_tickets]
+    page = await get_open_tickets(session, company_id)
 
-    if not simplified:
+    if not page.items:
         await message.answer("Пока нет новых тикетов.")
         return
 
     await message.answer(
         "Список открытых тикетов:",
-        reply_markup=operator_tickets_keyboard(simplified)
+        reply_markup=operator_tickets_keyboard(page.items, page.has_prev, page.has_next)
     )
 
 # 2) Reply “📂 Мои тикеты” (эквивалент /my_tickets)
 @router.message(F.text == "📂 Мои тикеты")
-async def show_my_tickets(message: Message):
+async def show_my_tickets(message: Message, session: AsyncSession):
     operator_id = str(message.from_user.id)
     company_id = 1
-    async with async_session() as session:
-        tickets = await get_tickets_by_operator(session, operator_id, company_id)
-        simplified = [(t.id, t.question_text) for t in tickets]
+    page = await get_tickets_by_operator(session, operator_id, company_id)
 
-    if not simplified:
+    if not page.items:
         await message.answer("У вас нет активных тикетов.")
         return
 
     await message.answer(
         "Ваши активные тикеты:",
-        reply_markup=operator_my_tickets_keyboard(simplified)
+        reply_markup=operator_my_tickets_keyboard(page.items, page.has_prev, page.has_next)
     )
 
 # 2.2) Хэндлер команды /my_tickets (если захотите вручную вводить /my_tickets)
 @router.message(Command("my_tickets"))
-async def cmd_list_my_tickets_command(message: Message):
-    await show_my_tickets(message)
+async def cmd_list_my_tickets_command(message: Message, session: AsyncSession):
+    await show_my_tickets(message, session)
 
 
 # ───────────────────────────────────────────────────────────────────────────────
@@ -118,25 +154,41 @@ async def handle_my_ticket(callback_query: CallbackQuery):
 
 # 3) Reply “🔄 Переключить тикет” (эквивалент /select_ticket)
 @router.message(F.text == "🔄 Переключить тикет")
-async def prompt_select_ticket(message: Message):
+async def prompt_select_ticket(message: Message, session: AsyncSession):
     operator_id = str(message.from_user.id)
     company_id = 1
-    async with async_session() as session:
-        tickets = await get_tickets_by_operator(session, operator_id, company_id)
-        simplified = [(t.id, t.question_text) for t in tickets]
+    page = await get_tickets_by_operator(session, operator_id, company_id)
 
-    if not simplified:
+    if not page.items:
         await message.answer("У вас нет активных тикетов для переключения.")
         return
 
     await message.answer(
         "Выберите тикет, в который хотите перейти:",
-        reply_markup=select_ticket_keyboard(simplified)
+        reply_markup=select_ticket_keyboard(page.items, page.has_prev, page.has_next)
     )
 
+# 3.1) Листание списка «Переключить тикет»: callback_data="select_page:next:<id>" / "select_page:prev:<id>"
+@router.callback_query(F.data.startswith("select_page:"))
+async def page_select_ticket(callback_query: CallbackQuery, session: AsyncSession):
+    operator_id = str(callback_query.from_user.id)
+    company_id = 1
+    after_id, before_id = _page_cursor(callback_query.data)
+    page = await get_tickets_by_operator(
+        session, operator_id, company_id, after_id=after_id, before_id=before_id
+    )
+
+    if not page.items:
+        await callback_query.message.edit_text("У вас нет активных тикетов для переключения.")
+    else:
+        await callback_query.message.edit_reply_markup(
+            reply_markup=select_ticket_keyboard(page.items, page.has_prev, page.has_next)
+        )
+    await callback_query.answer()
+
 # 4) Callback “select:<id>” – оператор выбрал «текущий» тикет
 @router.callback_query(F.data.startswith("select:"))
-async def handle_select_ticket(callback_query: CallbackQuery, state: FSMContext):
+async def handle_select_ticket(callback_query: CallbackQuery, state: FSMContext, session: AsyncSession):
     data = callback_query.data.split(":")
     action = data[1]  # либо "back", либо "<ticket_id>"
     operator_id = str(callback_query.from_user.id)
@@ -152,17 +204,24 @@ async def handle_select_ticket(callback_query: CallbackQuery, state: FSMContext)
         return
 
     ticket_id = int(action)
-    async with async_session() as session:
-        tickets = await get_tickets_by_operator(session, operator_id, company_id)
-        ids = [t.id for t in tickets]
-    if ticket_id not in ids:
+    # Активные тикеты (in_progress) и их операторы — в таблице маршрутов в памяти
+    route = routing_table.for_ticket(ticket_id)
+    if not route or route.operator_id != int(operator_id):
         await callback_query.message.edit_text("У вас нет такого активного тикета.")
         await callback_query.answer()
         return
 
     await state.update_data(current_ticket=ticket_id)
     await state.set_state(OperatorStates.chatting)
-    await callback_query.message.edit_text(f"✅ Переключились на тикет #{ticket_id}. Ваши сообщения пойдут клиенту.")
+
+    # Напоминаем оператору, на чём остановилась переписка (из журнала ticket_messages)
+    text = f"✅ Переключились на тикет #{ticket_id}. Ваши сообщения пойдут клиенту."
+    history = await get_ticket_messages(session, ticket_id, TRANSCRIPT_PREVIEW)
+    if history:
+        text += "\n\nПоследние сообщения:\n" + "\n".join(
+            f"{'👤' if m.direction == TO_OPERATOR else '👨‍💻'} {html.escape(m.text)}" for m in history
+        )
+    await callback_query.message.edit_text(text)
     await callback_query.answer()
 
 # 5) Callback “ticket:<id>” – показать кнопки «Принять/Закрыть/Назад»
@@ -176,88 +235,111 @@ async def show_ticket_actions(callback_query: CallbackQuery):
 
 # 6) Callback “ticket_action:assign:<id>” / “ticket_action:close:<id>”
 @router.callback_query(F.data.startswith("ticket_action:"))
-async def handle_ticket_action(callback_query: CallbackQuery, state: FSMContext):
+async def handle_ticket_action(callback_query: CallbackQuery, state: FSMContext, session: AsyncSession):
     parts = callback_query.data.split(":")
     action = parts[1]   # "assign" или "close"
     ticket_id = int(parts[2])
     operator_id = str(callback_query.from_user.id)
     company_id = 1
 
-    async with async_session() as session:
-        ticket = await get_ticket_by_id(session, ticket_id)
-        if not ticket or ticket.company_id != company_id:
-            await callback_query.message.answer("Тикет не найден или не к вашей компании.")
+    if action == "assign":
+        # 5.1) Принимаем тикет одной атомарной командой: из одновременных нажатий
+        #      «✅ Принять тикет» выигрывает ровно один оператор
+        claimed = await claim_ticket(session, ticket_id, company_id, operator_id)
+        # Коммитим сразу, не дожидаясь конца апдейта: блокировку строки (а в SQLite —
+        # всей базы на запись) нельзя держать, пока идут запросы к Telegram ниже
+        await session.commit()
+        if not claimed:
+            await callback_query.message.answer("Этот тикет уже взят или закрыт.")
             await callback_query.answer()
             return
 
-        if action == "assign":
-            if ticket.status != "open":
-                await callback_query.message.answer("Этот тикет уже взят или закрыт.")
-                await callback_query.answer()
-                return
-
-            # 5.1) Принимаем тикет, переводим в in_progress и сохраняем в FSMContext
-            await assign_ticket(session, ticket_id, operator_id)
-            await state.update_data(current_ticket=ticket_id)
-            await state.set_state(OperatorStates.chatting)
-
-            # 5.2) Отправляем оператору сообщение, что тикет принят
-            await callback_query.message.answer(
-                f"✅ Вы приняли тикет #{ticket_id}. Теперь ваши сообщения пойдут клиенту."
-            )
-            # 5.3) Сразу пересылаем оператору исходное сообщение клиента
-            await callback_query.message.answer(
-                f"✉️ Сообщение от клиента:\n\n{ticket.question_text}"
-            )
-            # 5.4) Уведомляем клиента в Telegram, что его тикет взят в работу
-            await callback_query.bot.send_message(
-                chat_id=int(ticket.user_id),
-                text=f"Оператор взялся за ваш тикет #{ticket_id}. Сейчас можете спрашивать."
-            )
+        user_id, question_text = claimed
+        # Тикет уже закоммичен — с этого момента сообщения клиента идут этому оператору
+        routing_table.publish_assign(ticket_id, int(user_id), int(operator_id))
+        await state.update_data(current_ticket=ticket_id)
+        await state.set_state(OperatorStates.chatting)
+
+        # 5.2) Отправляем оператору сообщение, что тикет принят
+        await callback_query.message.answer(
+            f"✅ Вы приняли тикет #{ticket_id}. Теперь ваши сообщения пойдут клиенту."
+        )
+        # 5.3) Сразу пересылаем оператору исходное сообщение клиента
+        await callback_query.message.answer(
+            f"✉️ Сообщение от клиента:\n\n{question_text}"
+        )
+        # 5.4) Уведомляем клиента в Telegram, что его тикет взят в работу
+        await callback_query.bot.send_message(
+            chat_id=int(user_id),
+            text=f"Оператор взялся за ваш тикет #{ticket_id}. Сейчас можете спрашивать."
+        )
+        await callback_query.answer()
+        return
+
+    elif action == "close":
+        ticket = await get_ticket_by_id(session, ticket_id)
+        if not ticket or ticket.company_id != company_id:
+            await callback_query.message.answer("Тикет не найден или не к вашей компании.")
             await callback_query.answer()
             return
 
-        elif action == "close":
-            # 5.5) Закрытие тикета
-            if ticket.operator_id != operator_id:
-                await callback_query.message.answer("Вы не закреплены за этим тикетом.")
-                await callback_query.answer()
-                return
-
-            await close_ticket(session, ticket_id)
-
-            data = await state.get_data()
-            current = data.get("current_ticket")
-            if current == ticket_id:
-                await state.clear()
-                await callback_query.message.answer(f"✅ Тикет #{ticket_id} закрыт. Вы не связаны ни с одним тикетом.")
-            else:
-                await callback_query.message.answer(f"✅ Тикет #{ticket_id} закрыт.")
-
-            await callback_query.bot.send_message(
-                chat_id=int(ticket.user_id),
-                text=f"Ваш тикет #{ticket_id} был закрыт оператором. Спасибо за обращение!"
-            )
+        # 5.5) Закрытие тикета
+        if ticket.operator_id != operator_id:
+            await callback_query.message.answer("Вы не закреплены за этим тикетом.")
             await callback_query.answer()
             return
 
+        await close_ticket(session, ticket_id)
+        # Как и при «Принять»: коммитим до запросов к Telegram — клиент узнаёт о закрытии,
+        # только когда оно записано, а блокировка записи не держится во время отправки
+        await session.commit()
+        routing_table.publish_close(ticket_id)
+
+        data = await state.get_data()
+        current = data.get("current_ticket")
+        if current == ticket_id:
+            await state.clear()
+            await callback_query.message.answer(f"✅ Тикет #{ticket_id} закрыт. Вы не связаны ни с одним тикетом.")
         else:
-            await callback_query.answer()
+            await callback_query.message.answer(f"✅ Тикет #{ticket_id} закрыт.")
+
+        await callback_query.bot.send_message(
+            chat_id=int(ticket.user_id),
+            text=f"Ваш тикет #{ticket_id} был закрыт оператором. Спасибо за обращение!"
+        )
+        await callback_query.answer()
+        return
+
+    else:
+        await callback_query.answer()
 
 # 7) Callback “tickets:refresh” – обновить список открытых тикетов
 @router.callback_query(F.data == "tickets:refresh")
-async def refresh_tickets_list(callback_query: CallbackQuery):
+async def refresh_tickets_list(callback_query: CallbackQuery, session: AsyncSession):
+    await _edit_open_tickets_page(callback_query, session)
+
+# 7.1) Callback “tickets:next:<id>” / “tickets:prev:<id>” – листание открытых тикетов
+@router.callback_query(F.data.startswith("tickets:next:") | F.data.startswith("tickets:prev:"))
+async def page_tickets_list(callback_query: CallbackQuery, session: AsyncSession):
+    after_id, before_id = _page_cursor(callback_query.data)
+    await _edit_open_tickets_page(callback_query, session, after_id=after_id, before_id=before_id)
+
+
+async def _edit_open_tickets_page(
+    callback_query: CallbackQuery,
+    session: AsyncSession,
+    after_id: Optional[int] = None,
+    before_id: Optional[int] = None
+):
     company_id = 1
-    async with async_session() as session:
-        open_tickets = await get_open_tickets(session, company_id)
-        simplified = [(t.id, t.question_text) for t in open_tickets]
+    page = await get_open_tickets(session, company_id, after_id=after_id, before_id=before_id)
 
-    if not simplified:
+    if not page.items:
         await callback_query.message.edit_text("Пока нет новых тикетов.")
     else:
         await callback_query.message.edit_text(
             "Список открытых тикетов:",
-            reply_markup=operator_tickets_keyboard(simplified)
+            reply_markup=operator_tickets_keyboard(page.items, page.has_prev, page.has_next)
         )
     await callback_query.answer()
 
@@ -270,54 +352,57 @@ async def go_back_from_tickets(callback_query: CallbackQuery):
 
 # 8) Обработчик «🔙 Назад» когда мы в actions-окне для Open Tickets:
 @router.callback_query(F.data == "back_to_open")
-async def back_to_open_list(callback_query: CallbackQuery):
+async def back_to_open_list(callback_query: CallbackQuery, session: AsyncSession):
     """
     Возвращаемся к списку Открытых тикетов (Open Tickets).
-    То есть заново показываем operator_tickets_keyboard.
+    То есть заново показываем operator_tickets_keyboard (первую страницу).
     """
-    company_id = 1
-    async with async_session() as session:
-        open_tickets = await get_open_tickets(session, company_id)
-        simplified = [(t.id, t.question_text) for t in open_tickets]
-
-    if not simplified:
-        await callback_query.message.edit_text("Пока нет новых тикетов.")
-    else:
-        await callback_query.message.edit_text(
-            "Список открытых тикетов:",
-            reply_markup=operator_tickets_keyboard(simplified)
-        )
-    await callback_query.answer()
+    await _edit_open_tickets_page(callback_query, session)
 
 
 # ───────────────────────────────────────────────────────────────────────────────
 # 9) Обработчик «🔙 Назад» когда мы в actions-окне для My Tickets:
 @router.callback_query(F.data == "back_to_my")
-async def back_to_my_list(callback_query: CallbackQuery):
+async def back_to_my_list(callback_query: CallbackQuery, session: AsyncSession):
     """
     Возвращаемся к списку «Моих тикетов» (in_progress).
-    То есть заново показываем operator_my_tickets_keyboard.
+    То есть заново показываем operator_my_tickets_keyboard (первую страницу).
     """
+    await _edit_my_tickets_page(callback_query, session)
+
+# 9.1) Callback “my_tickets:next:<id>” / “my_tickets:prev:<id>” – листание «Моих тикетов»
+@router.callback_query(F.data.startswith("my_tickets:"))
+async def page_my_tickets(callback_query: CallbackQuery, session: AsyncSession):
+    after_id, before_id = _page_cursor(callback_query.data)
+    await _edit_my_tickets_page(callback_query, session, after_id=after_id, before_id=before_id)
+
+
+async def _edit_my_tickets_page(
+    callback_query: CallbackQuery,
+    session: AsyncSession,
+    after_id: Optional[int] = None,
+    before_id: Optional[int] = None
+):
     operator_id = str(callback_query.from_user.id)
     company_id = 1
-    async with async_session() as session:
-        tickets = await get_tickets_by_operator(session, operator_id, company_id)
-        simplified = [(t.id, t.question_text) for t in tickets]
+    page = await get_tickets_by_operator(
+        session, operator_id, company_id, after_id=after_id, before_id=before_id
+    )
 
-    if not simplified:
+    if not page.items:
         # Если вдруг все тикеты закрыты, можно вывести сообщение
         await callback_query.message.edit_text("У вас нет активных тикетов.")
     else:
         await callback_query.message.edit_text(
             "Ваши активные тикеты:",
-            reply_markup=operator_my_tickets_keyboard(simplified)
+            reply_markup=operator_my_tickets_keyboard(page.items, page.has_prev, page.has_next)
         )
     await callback_query.answer()
 
 
 # 9) “Ловушка” для любых текстов оператора – пересылаем текущему клиенту
 @router.message(~F.text.startswith("/"))
-async def forward_messages_between(message: Message, state: FSMContext):
+async def forward_messages_between(message: Message, state: FSMContext, session: AsyncSession):
     data = await state.get_data()
     ticket_id = data.get("current_ticket")
 
@@ -328,15 +413,14 @@ async def forward_messages_between(message: Message, state: FSMContext):
         )
         return
 
-    async with async_session() as session:
-        ticket = await get_ticket_by_id(session, ticket_id)
+    # Клиента берём из таблицы маршрутов в памяти; закрытого тикета в ней уже нет
+    route = routing_table.for_ticket(ticket_id)
 
-    if not ticket:
+    if not route or route.operator_id != message.from_user.id:
         await state.clear()
         await message.answer("Текущий тикет не найден. Выберите новый.")
         return
 
-    await message.bot.send_message(
-        chat_id=int(ticket.user_id),
-        text=f"💬 Оператор: {message.text}"
-    )
+    # Доставку клиенту берёт на себя outbox (bot/outbox.py)
+    await outbox.enqueue(session, route.customer_id, f"💬 Оператор: {message_text(message)}")
+    transcript.record(session, route.ticket_id, TO_CUSTOMER, message)
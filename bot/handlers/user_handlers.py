@@ -1,25 +1,44 @@
 # bot/handlers/user_handlers.py
 
+import logging
+
 from aiogram import Router, F
 from aiogram.filters import Command
+from aiogram.fsm.context import FSMContext
 from aiogram.types import Message, CallbackQuery
-
-from bot.database import async_session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.assignment import assignment
+from bot.broadcaster import broadcaster
+from bot.config import config
+from bot.database import after_commit, after_rollback
+from bot.faq_cache import faq_cache
+from bot.outbox import outbox
+from bot.presence import presence
+from bot.routing import routing_table
+from bot.transcript import TO_OPERATOR, message_text, transcript
 from bot.crud import (
-    get_faq_entries,
-    get_faq_by_id,
     get_faq_by_keyword,
     create_ticket,
-    create_or_update_user_session,
-    get_user_session,
-    delete_user_session,
-    get_active_operator_ids,
-    get_active_ticket_by_user   # ← импорт нашей новой функции
+    claim_ticket,
+    get_active_operator_ids
 )
-from bot.keyboards import main_menu_keyboard, faq_list_keyboard, operator_tickets_keyboard, ticket_actions_keyboard
-from bot.states import OperatorStates
+from bot.keyboards import (
+    main_menu_keyboard,
+    faq_list_keyboard,
+    operator_tickets_keyboard,
+    ticket_actions_keyboard,
+    assigned_ticket_keyboard
+)
+from bot.models import Ticket
+from bot.states import CustomerStates
 
 router = Router()
+logger = logging.getLogger(__name__)
+
+# Последний ответ хэндлера возвращается (return message.answer(...)), а не ожидается:
+# в режиме webhook aiogram отдаёт такой метод прямо в ответе на запрос Telegram,
+# без отдельного HTTP-запроса к Bot API; при polling он отправляется как обычно.
 
 # === Обработка команды /start ===
 
@@ -31,87 +50,89 @@ async def cmd_start(message: Message):
         "Выберите действие ниже:"
     )
     # Отправляем пользователю главное меню (ReplyKeyboardMarkup)
-    await message.answer(text, reply_markup=main_menu_keyboard())
+    return message.answer(text, reply_markup=main_menu_keyboard())
 
 
 # === Кнопка “📚 FAQ” ===
 
 @router.message(F.text == "📚 FAQ")
-async def show_faq_list(message: Message):
+async def show_faq_list(message: Message, state: FSMContext):
     company_id = 1  # пока жёстко, потом можно брать из базы
 
-    # Получаем все записи FAQ для компании
-    async with async_session() as session:
-        faqs = await get_faq_entries(session, company_id)
-        simplified = [(f.id, f.question) for f in faqs]
+    # Берём FAQ компании из снимка в памяти (без похода в БД)
+    snapshot = await faq_cache.get(company_id)
 
-    if not simplified:
-        await message.answer("Извините, у нас пока нет доступных вопросов.")
-        return
+    if not snapshot.items:
+        return message.answer("Извините, у нас пока нет доступных вопросов.")
 
     # Сохраняем, что пользователь сейчас в состоянии “browsing_faq”
-    async with async_session() as session:
-        await create_or_update_user_session(
-            session,
-            user_id=str(message.from_user.id),
-            company_id=company_id,
-            state="browsing_faq"
-        )
+    # (FSM-хранилище держит его в памяти и пишет в БД в фоне)
+    await state.set_state(CustomerStates.browsing_faq)
+    await state.update_data(company_id=company_id)
 
     # Отправляем список вопросов в виде Inline-клавиатуры
-    await message.answer(
+    return message.answer(
         "Выберите вопрос из списка:",
-        reply_markup=faq_list_keyboard(simplified)
+        reply_markup=snapshot.keyboard
     )
 
 
 # === Обработка нажатий по FAQ (callback_data “faq:{id}” или “faq:back”) ===
 
 @router.callback_query(F.data.startswith("faq:"))
-async def handle_faq_selection(callback: CallbackQuery):
+async def handle_faq_selection(callback: CallbackQuery, state: FSMContext):
     data = callback.data.split(":")
     action = data[1]
-    user_id = str(callback.from_user.id)
     company_id = 1
 
     if action == "back":
-        async with async_session() as session:
-            await delete_user_session(session, user_id)
+        await state.clear()
         await callback.message.answer("Возвращаемся в главное меню.", reply_markup=main_menu_keyboard())
-        await callback.answer()
-        return
+        return callback.answer()
 
     entry_id = int(action)
-    async with async_session() as session:
-        entry = await get_faq_by_id(session, entry_id)
+    snapshot = await faq_cache.get(company_id)
+    entry = snapshot.entries.get(entry_id)
 
     if entry:
-        await callback.message.answer(entry.answer, reply_markup=main_menu_keyboard())
+        question, answer = entry
+        await callback.message.answer(answer, reply_markup=main_menu_keyboard())
     else:
         await callback.message.answer("К сожалению, ответ не найден.", reply_markup=main_menu_keyboard())
 
-    async with async_session() as session:
-        await delete_user_session(session, user_id)
+    await state.clear()
+
+    return callback.answer()
+
+
+# === Листание списка FAQ (callback_data “faq_page:next:{id}” / “faq_page:prev:{id}”) ===
+
+@router.callback_query(F.data.startswith("faq_page:"))
+async def handle_faq_page(callback: CallbackQuery):
+    _, direction, ref_id = callback.data.split(":")
+    company_id = 1
+
+    snapshot = await faq_cache.get(company_id)
+    if direction == "next":
+        keyboard = snapshot.page_after(int(ref_id))
+    else:
+        keyboard = snapshot.page_before(int(ref_id))
 
-    await callback.answer()
+    if keyboard:
+        await callback.message.edit_reply_markup(reply_markup=keyboard)
+    return callback.answer()
 
 
 # === Кнопка “👨‍💻 Связаться с оператором” ===
 
 @router.message(F.text == "👨‍💻 Связаться с оператором")
-async def start_ticket_flow(message: Message):
-    user_id = str(message.from_user.id)
+async def start_ticket_flow(message: Message, state: FSMContext):
     company_id = 1
 
-    async with async_session() as session:
-        await create_or_update_user_session(
-            session,
-            user_id=user_id,
-            company_id=company_id,
-            state="awaiting_ticket_text"
-        )
+    await state.set_state(CustomerStates.awaiting_ticket_text)
+    await state.update_data(company_id=company_id)
 
-    await message.answer(
+    return message.answer(
         "Опишите свою проблему (напишите текст сообщения). Один из операторов свяжется с вами в ближайшее время."
     )
 
@@ -130,68 +151,111 @@ async def show_info_about_company(message: Message):
         "Сайт: https://example.com\n\n"
         "_Если у вас остались вопросы, выберите действие из меню ниже:_"
     )
-    await message.answer(text, reply_markup=main_menu_keyboard())
+    return message.answer(text, reply_markup=main_menu_keyboard())
+
+
+# === Автоназначение тикета (AUTO_ASSIGN) ===
+
+async def auto_assign_ticket(session: AsyncSession, ticket: Ticket) -> bool:
+    """
+    Закрепляет только что созданный тикет за наименее загруженным оператором
+    (bot/assignment.py) и уведомляет только его и клиента — через outbox, после commit.
+    FSM оператора отсюда не трогаем: в кластере его чат обслуживает другой воркер
+    (bot/cluster.py). Текущим тикет становится, когда оператор нажмёт кнопку
+    в уведомлении — это обычный callback "select:<id>" из его собственного апдейта.
+    False — свободных операторов нет, тикет остаётся открытым.
+    """
+    operator_id = await assignment.pick_and_reserve(ticket.company_id, ticket.id)
+    if operator_id is None:
+        return False
+    # Резерв уже засчитан оператору в памяти: если транзакция апдейта не закоммитится
+    # (ошибка outbox, сбой commit в DbSessionMiddleware), снимаем его
+    after_rollback(session, lambda: assignment.remove_ticket(ticket.id))
+    if not await claim_ticket(session, ticket.id, ticket.company_id, str(operator_id)):
+        assignment.remove_ticket(ticket.id)
+        return False
+
+    customer_id = int(ticket.user_id)
+    after_commit(session, lambda: routing_table.publish_assign(ticket.id, customer_id, operator_id))
+
+    await outbox.enqueue(
+        session,
+        operator_id,
+        f"📥 Вам назначен тикет #{ticket.id}:\n\n{ticket.question_text}\n\n"
+        "Чтобы ответить, нажмите кнопку ниже или выберите его в «🔄 Переключить тикет».",
+        reply_markup=assigned_ticket_keyboard(ticket.id)
+    )
+    await outbox.enqueue(
+        session,
+        customer_id,
+        f"Оператор взялся за ваш тикет #{ticket.id}. Сейчас можете спрашивать."
+    )
+    return True
 
 
 # === “Ловушка” для всего остального текста (не начинающегося с “/”) ===
 
 @router.message(~F.text.startswith("/"))
-async def handle_text_during_states(message: Message):
+async def handle_text_during_states(message: Message, state: FSMContext, session: AsyncSession):
     user_id = str(message.from_user.id)
-    # Получаем текущее состояние клиента (если есть)
-    async with async_session() as session:
-        us = await get_user_session(session, user_id)
+    # Получаем текущее состояние клиента (если есть) — из FSM, обычно без похода в БД
+    current_state = await state.get_state()
+    company_id = (await state.get_data()).get("company_id", 1)
 
     # 1) Если клиент находится в режиме ввода текста для нового тикета
-    if us and us.state == "awaiting_ticket_text":
+    if current_state == CustomerStates.awaiting_ticket_text.state:
         question_text = message.text.strip()
 
         # 1.1) Создаём тикет
-        async with async_session() as session:
-            ticket = await create_ticket(
-                session,
-                company_id=us.company_id,
-                user_id=user_id,
-                question_text=question_text
+        ticket = await create_ticket(
+            session,
+            company_id=company_id,
+            user_id=user_id,
+            question_text=question_text
+        )
+
+        # 1.2) Автоназначение: тикет получает один наименее загруженный оператор
+        if config.auto_assign and await auto_assign_ticket(session, ticket):
+            await state.clear()
+            return message.answer(
+                "Ваш запрос зарегистрирован и передан оператору.",
+                reply_markup=main_menu_keyboard()
             )
 
-        # 1.2) Разсылаем оповещение всем активным операторам
-        operator_ids = await get_active_operator_ids(us.company_id)
-        print(f"[DEBUG user_handlers] operator_ids = {operator_ids}, ticket.id = {ticket.id}")
+        # 1.3) Иначе (или если все операторы заняты) — рассылаем оповещение активным операторам,
+        #      которые сейчас на связи (bot/presence.py)
+        operator_ids = presence.recipients(await get_active_operator_ids(session, company_id))
+        logger.debug("Тикет #%s: уведомляем операторов %s", ticket.id, operator_ids)
 
         notif_text = (
             f"📥 <b>Новый тикет #{ticket.id}</b>:\n\n"
             f"{ticket.question_text}\n\n"
             "Чтобы посмотреть список открытых тикетов, нажмите /tickets"
         )
-        for op_id in operator_ids:
-            try:
-                print(f"[DEBUG user_handlers] Шлю уведомление оператору с ID={op_id}")
-                await message.bot.send_message(
-                    chat_id=op_id,
-                    text=notif_text,
-                    reply_markup=ticket_actions_keyboard(ticket.id, origin="open")
-                )
-            except Exception as e:
-                print(f"[ERROR user_handlers] Не удалось отправить уведомление operator_id={op_id}: {e}")
-                continue
-
-        # 1.3) Удаляем состояние клиента (он завершил ввод проблемы)
-        async with async_session() as session:
-            await delete_user_session(session, user_id)
+        # Рассылка идёт в фоне через общий broadcaster (лимиты Telegram, RetryAfter,
+        # заблокировавшие бота операторы) — клиенту отвечаем, не дожидаясь её.
+        # Стартует после commit, чтобы оператор не нажал «Принять» раньше, чем тикет записан.
+        after_commit(session, lambda: broadcaster.schedule(
+            message.bot,
+            operator_ids,
+            notif_text,
+            reply_markup=ticket_actions_keyboard(ticket.id, origin="open")
+        ))
+
+        # 1.4) Удаляем состояние клиента (он завершил ввод проблемы)
+        await state.clear()
 
         # --- ШАГ 4: Отвечаем клиенту, что тикет зарегистрирован ---
-        await message.answer(
+        # (дальше не идём, т.к. уже создали тикет)
+        return message.answer(
             "Ваш запрос зарегистрирован. Операторы уведомлены и скоро свяжутся с вами.",
             reply_markup=main_menu_keyboard()
         )
-        return  # дальше не идём, т.к. уже создали тикет
 
     # 2) Если клиент находится в режиме «просмотра FAQ»
-    if us and us.state == "browsing_faq":
+    if current_state == CustomerStates.browsing_faq.state:
         keyword = message.text.strip()
-        async with async_session() as session:
-            results = await get_faq_by_keyword(session, us.company_id, keyword)
+        results = await get_faq_by_keyword(session, company_id, keyword)
 
         if results:
             text = "Найдены следующие вопросы:\n\n"
@@ -199,40 +263,40 @@ async def handle_text_during_states(message: Message):
             for entry in results:
                 text += f"• {entry.question}\n"
                 simplified.append((entry.id, entry.question))
-            await message.answer(text, reply_markup=faq_list_keyboard(simplified))
-        else:
-            await message.answer(
-                "Ничего не найдено по вашему запросу. "
-                "Попробуйте другое слово или нажмите \"🔙 Назад\" для возврата."
-            )
-        return
+            return message.answer(text, reply_markup=faq_list_keyboard(simplified))
+        return message.answer(
+            "Ничего не найдено по вашему запросу. "
+            "Попробуйте другое слово или нажмите \"🔙 Назад\" для возврата."
+        )
 
     # 3) НОВАЯ ЛОГИКА: если у клиента есть тикет со статусом in_progress —
     #    пересылаем любое его сообщение оператору, назначенному за тикетом.
-    async with async_session() as session:
-        active_ticket = await get_active_ticket_by_user(session, user_id)
-    if active_ticket:
-        # Пересылаем текст оператору
-        operator_chat_id = int(active_ticket.operator_id)
-        await message.bot.send_message(
-            chat_id=operator_chat_id,
-            text=f"💬 Клиент #{active_ticket.id}: {message.text}"
+    #    Тикет и оператора берём из таблицы маршрутов в памяти (bot/routing.py), не из БД.
+    route = routing_table.for_customer(message.from_user.id)
+    if route:
+        # Пересылаем текст оператору (через outbox — доставят фоновые воркеры)
+        await outbox.enqueue(
+            session,
+            route.operator_id,
+            f"💬 Клиент #{route.ticket_id}: {message_text(message)}"
         )
+        # В журнал переписки — буфером, без отдельного commit
+        transcript.record(session, route.ticket_id, TO_OPERATOR, message)
         return
 
     # 4) Иначе (если ни FAQ, ни awaiting_ticket_text, ни in_progress) —
     #    просто шлём главное меню клиенту
-    await message.answer(
+    return message.answer(
         "Извините, я не распознал запрос. Пожалуйста, выберите действие из меню.",
         reply_markup=main_menu_keyboard()
     )
 # Дальше — ваш отладочный «ловец» (необязательный)
 @router.message()
 async def catch_all(message: Message):
-    print(f"Необработанное сообщение: {repr(message.text)}")
+    logger.info("Необработанное сообщение: %r", message.text)
 
 @router.message(Command("test_kb"))
 async def test_kb(message: Message):
     kb = main_menu_keyboard()
-    print("Клавиатура:", kb)
+    logger.debug("Клавиатура: %s", kb)
     await message.answer("Тест клавиатуры", reply_markup=kb)
\ No newline at end of file
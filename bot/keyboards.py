@@ -8,6 +8,27 @@ from aiogram.types import (
 )
 
 
+# === Ряд кнопок листания для постраничных списков (keyset-пагинация) ===
+def pager_row(
+    prefix: str,
+    entries: list[tuple[int, str]],
+    has_prev: bool,
+    has_next: bool
+) -> list[InlineKeyboardButton]:
+    """
+    Кнопки «⬅️» / «➡️» для списка entries = [(id, text), ...]:
+      ⬅️ → callback_data="<prefix>:prev:<id первой записи>"
+      ➡️ → callback_data="<prefix>:next:<id последней записи>"
+    Возвращает пустой список, если листать некуда.
+    """
+    row: list[InlineKeyboardButton] = []
+    if entries and has_prev:
+        row.append(InlineKeyboardButton(text="⬅️", callback_data=f"{prefix}:prev:{entries[0][0]}"))
+    if entries and has_next:
+        row.append(InlineKeyboardButton(text="➡️", callback_data=f"{prefix}:next:{entries[-1][0]}"))
+    return row
+
+
 # === Главное меню (ReplyKeyboardMarkup) ===
 def main_menu_keyboard() -> ReplyKeyboardMarkup:
     kb = ReplyKeyboardMarkup(
@@ -22,7 +43,11 @@ def main_menu_keyboard() -> ReplyKeyboardMarkup:
 
 
 # === Inline-клавиатура для списка FAQ ===
-def faq_list_keyboard(faq_entries: list[tuple[int, str]]) -> InlineKeyboardMarkup:
+def faq_list_keyboard(
+    faq_entries: list[tuple[int, str]],
+    has_prev: bool = False,
+    has_next: bool = False
+) -> InlineKeyboardMarkup:
     """
     faq_entries = [(id1, "Вопрос1"), (id2, "Вопрос2"), ...]
     Построим inline_keyboard как список списков:
@@ -30,6 +55,7 @@ def faq_list_keyboard(faq_entries: list[tuple[int, str]]) -> InlineKeyboardMarku
       [InlineKeyboardButton(text="Вопрос1", callback_data="faq:1")],
       [InlineKeyboardButton(text="Вопрос2", callback_data="faq:2")],
       ...
+      [⬅️ faq_page:prev:<id>, ➡️ faq_page:next:<id>]  (если есть другие страницы)
       [InlineKeyboardButton(text="🔙 Назад", callback_data="faq:back")]
     ]
     """
@@ -42,6 +68,9 @@ def faq_list_keyboard(faq_entries: list[tuple[int, str]]) -> InlineKeyboardMarku
                 callback_data=f"faq:{entry_id}"
             )
         ])
+    pager = pager_row("faq_page", faq_entries, has_prev, has_next)
+    if pager:
+        rows.append(pager)
     # Добавляем в конце кнопку «Назад» (её тоже кладём в собственный ряд)
     rows.append([InlineKeyboardButton(text="🔙 Назад", callback_data="faq:back")])
 
@@ -49,11 +78,16 @@ def faq_list_keyboard(faq_entries: list[tuple[int, str]]) -> InlineKeyboardMarku
 
 
 # === Inline-клавиатура для списка открытых тикетов у оператора ===
-def operator_tickets_keyboard(tickets: list[tuple[int, str]]) -> InlineKeyboardMarkup:
+def operator_tickets_keyboard(
+    tickets: list[tuple[int, str]],
+    has_prev: bool = False,
+    has_next: bool = False
+) -> InlineKeyboardMarkup:
     """
-    tickets: список кортежей (ticket_id, ticket_preview)
+    tickets: список кортежей (ticket_id, ticket_preview) — одна страница
     Формирует InlineKeyboard для Open Tickets:
       • для каждого тикета — кнопка с callback_data="open_ticket:<ticket_id>"
+      • ⬅️ / ➡️ (callback_data="tickets:prev:<id>" / "tickets:next:<id>"), если есть другие страницы
       • внизу две кнопки: 🔄 Обновить (callback_data="tickets:refresh") и 🔙 Назад (callback_data="tickets:back")
     """
     rows: list[list[InlineKeyboardButton]] = []
@@ -64,6 +98,9 @@ def operator_tickets_keyboard(tickets: list[tuple[int, str]]) -> InlineKeyboardM
                 callback_data=f"open_ticket:{ticket_id}"
             )
         ])
+    pager = pager_row("tickets", tickets, has_prev, has_next)
+    if pager:
+        rows.append(pager)
     # Нижняя строка: «Обновить» + «Назад»
     rows.append([
         InlineKeyboardButton(text="🔄 Обновить", callback_data="tickets:refresh"),
@@ -72,11 +109,16 @@ def operator_tickets_keyboard(tickets: list[tuple[int, str]]) -> InlineKeyboardM
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
 # 3) inline-клавиатура для списка МОИХ тикетов (in_progress)
-def operator_my_tickets_keyboard(tickets: list[tuple[int, str]]) -> InlineKeyboardMarkup:
+def operator_my_tickets_keyboard(
+    tickets: list[tuple[int, str]],
+    has_prev: bool = False,
+    has_next: bool = False
+) -> InlineKeyboardMarkup:
     """
-    tickets: список кортежей (ticket_id, ticket_preview)
+    tickets: список кортежей (ticket_id, ticket_preview) — одна страница
     Формирует InlineKeyboard для My Tickets:
       • для каждого тикета — кнопка с callback_data="my_ticket:<ticket_id>"
+      • ⬅️ / ➡️ (callback_data="my_tickets:prev:<id>" / "my_tickets:next:<id>")
       • внизу — только кнопка 🔙 Назад (callback_data="tickets:back")
     """
     rows: list[list[InlineKeyboardButton]] = []
@@ -87,6 +129,9 @@ def operator_my_tickets_keyboard(tickets: list[tuple[int, str]]) -> InlineKeyboa
                 callback_data=f"my_ticket:{ticket_id}"
             )
         ])
+    pager = pager_row("my_tickets", tickets, has_prev, has_next)
+    if pager:
+        rows.append(pager)
     # Нижняя строка: только «Назад»
     rows.append([
         InlineKeyboardButton(text="🔙 Назад", callback_data="tickets:back")
@@ -132,6 +177,17 @@ def ticket_actions_keyboard(ticket_id: int, origin: str) -> InlineKeyboardMarkup
 
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
+
+# === Кнопка в уведомлении о назначенном тикете (AUTO_ASSIGN) ===
+def assigned_ticket_keyboard(ticket_id: int) -> InlineKeyboardMarkup:
+    """
+    Одна кнопка «💬 Перейти к тикету #<id>» с callback_data="select:<id>" — тот же
+    выбор текущего тикета, что и в «Переключить тикет», но из апдейта самого оператора.
+    """
+    return InlineKeyboardMarkup(inline_keyboard=[[
+        InlineKeyboardButton(text=f"💬 Перейти к тикету #{ticket_id}", callback_data=f"select:{ticket_id}")
+    ]])
+
 # +++ НОВОЕ: 5) ReplyKeyboardMarkup для операторов +++
 def operator_main_menu() -> ReplyKeyboardMarkup:
     """
@@ -151,12 +207,17 @@ def operator_main_menu() -> ReplyKeyboardMarkup:
 
 
 # +++ НОВОЕ: 6) Inline-клавиатура для «Переключить тикет» +++
-def select_ticket_keyboard(tickets: list[tuple[int, str]]) -> InlineKeyboardMarkup:
+def select_ticket_keyboard(
+    tickets: list[tuple[int, str]],
+    has_prev: bool = False,
+    has_next: bool = False
+) -> InlineKeyboardMarkup:
     """
     tickets = [(id1, preview1), (id2, preview2), ...], но это именно их in_progress-список.
     Формируем InlineKeyboard, где каждая кнопка — «Выбрать тикет #<id>»:
       [InlineKeyboardButton(text="Выбрать #5: <preview>...", callback_data="select:5")]
       [InlineKeyboardButton(text="Выбрать #7: <preview>...", callback_data="select:7")]
+      [⬅️ select_page:prev:<id>, ➡️ select_page:next:<id>]  (если есть другие страницы)
       [InlineKeyboardButton(text="🔙 Назад", callback_data="select:back")]
     """
     rows: list[list[InlineKeyboardButton]] = []
@@ -167,6 +228,9 @@ def select_ticket_keyboard(tickets: list[tuple[int, str]]) -> InlineKeyboardMark
                 callback_data=f"select:{ticket_id}"
             )
         ])
+    pager = pager_row("select_page", tickets, has_prev, has_next)
+    if pager:
+        rows.append(pager)
     # Кнопка «Назад» для отмены
     rows.append([InlineKeyboardButton(text="🔙 Назад", callback_data="select:back")])
     return InlineKeyboardMarkup(inline_keyboard=rows)
\ No newline at end of file
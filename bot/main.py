@@ -1,30 +1,64 @@
 # bot/main.py
 
+import argparse
 import asyncio
 import logging
 
 from aiogram import Bot, Dispatcher
 from aiogram.client.bot import DefaultBotProperties
-from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 
+from bot.archive import archiver
+from bot.broadcaster import broadcaster
 from bot.config import config
-from bot.database import init_models
+from bot.database import engine, init_models, warm_up_pool
+from bot.fsm_storage import SQLStorage
+from bot.outbox import outbox
+from bot.presence import presence
+from bot.routing import routing_table
+from bot.transcript import transcript
 from bot.handlers.admin_handlers import router as admin_router
 from bot.handlers.operator_handlers import router as operator_router
 from bot.handlers.user_handlers import router as user_router
 from bot.filters import IsAdmin, IsOperator, IsUser
+from bot.metrics import TelegramMetricsMiddleware, instrument_engine, start_metrics_server
+from bot.middlewares import (
+    DbSessionMiddleware,
+    HandlerMetricsMiddleware,
+    MetricsMiddleware,
+    PresenceMiddleware,
+    QueryProfileMiddleware,
+    RoleMiddleware
+)
+from bot.profiling import query_profiler
+from bot.webhook import run_webhook
 
 
-async def main():
-    logging.basicConfig(level=logging.INFO)
-    logger = logging.getLogger(__name__)
-    logger.info(f"Admin IDs loaded: {config.get_admin_list}")
+def create_dispatcher() -> Dispatcher:
+    """
+    Собирает Dispatcher со всеми роутерами, фильтрами ролей и middleware.
+    Роутеры — модульные объекты, поэтому вызывать функцию можно один раз на процесс.
+    """
+    # Состояния FSM (текущий тикет оператора и т.п.) хранятся в БД и переживают перезапуск
+    dp = Dispatcher(storage=SQLStorage())
 
-    bot = Bot(
-        token=config.bot_token,
-        default=DefaultBotProperties(parse_mode="HTML")
-    )
-    dp = Dispatcher(storage=MemoryStorage())
+    # --- Метрики (/metrics): апдейты — снаружи всех middleware, хэндлеры — изнутри,
+    #     SQL-запросы — событиями движка
+    dp.update.outer_middleware(MetricsMiddleware())
+    dp.message.middleware(HandlerMetricsMiddleware())
+    dp.callback_query.middleware(HandlerMetricsMiddleware())
+    instrument_engine(engine)
+
+    # --- Профилирование SQL (DB_PROFILE): медленные запросы и число запросов на апдейт
+    if config.db_profile:
+        query_profiler.attach(engine)
+        dp.update.outer_middleware(QueryProfileMiddleware(query_profiler))
+
+    # --- 0) Одна сессия БД на апдейт (один commit в конце) и роль отправителя,
+    #        вычисленная один раз, до всех роутеров
+    dp.update.outer_middleware(DbSessionMiddleware())
+    dp.update.outer_middleware(RoleMiddleware())
 
     # --- 1) Подключаем фильтр IsAdmin к admin_router
     admin_router.message.filter(IsAdmin())
@@ -33,6 +67,9 @@ async def main():
     # --- 2) Подключаем фильтр IsOperator к operator_router
     operator_router.message.filter(IsOperator())
     operator_router.callback_query.filter(IsOperator())
+    # Активность оператора — для уведомлений и автоназначения только тем, кто на связи
+    operator_router.message.outer_middleware(PresenceMiddleware(presence))
+    operator_router.callback_query.outer_middleware(PresenceMiddleware(presence))
 
     # --- 3) Подключаем фильтр IsUser к user_router
     user_router.message.filter(IsUser())
@@ -43,12 +80,78 @@ async def main():
     dp.include_router(operator_router)
     dp.include_router(user_router)
 
+    # Соединения с БД открываем до первого апдейта
+    dp.startup.register(warm_up_pool)
+    # Фоновая доставка пересылаемых сообщений из outbox
+    dp.startup.register(outbox.start)
+    # Таблица маршрутов пересылки — из активных тикетов в БД
+    dp.startup.register(routing_table.load)
+    # Присутствие операторов — из БД; фоновая запись last_seen
+    dp.startup.register(presence.start)
+    # Перенос давно закрытых тикетов в архив
+    dp.startup.register(archiver.start)
+    dp.shutdown.register(outbox.stop)
+    dp.shutdown.register(archiver.stop)
+    # Дописываем буфер журнала переписки
+    dp.shutdown.register(transcript.stop)
+    dp.shutdown.register(presence.stop)
+    # При остановке дожидаемся фоновых рассылок, чтобы уведомления не потерялись
+    dp.shutdown.register(broadcaster.drain)
+    return dp
+
+
+def create_bot() -> Bot:
+    session = None
+    if config.telegram_api_url:
+        session = AiohttpSession(api=TelegramAPIServer.from_base(config.telegram_api_url.rstrip("/")))
+    bot = Bot(
+        token=config.bot_token,
+        session=session,
+        default=DefaultBotProperties(parse_mode="HTML")
+    )
+    # Время, ошибки и RetryAfter каждого вызова Bot API
+    bot.session.middleware(TelegramMetricsMiddleware())
+    return bot
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Бот техподдержки")
+    parser.add_argument(
+        "--mode",
+        choices=("polling", "webhook"),
+        default="polling",
+        help="polling — getUpdates (по умолчанию); webhook — aiohttp-сервер, настройки WEBHOOK_* в .env"
+    )
+    return parser.parse_args(argv)
+
+
+async def main(mode: str = "polling"):
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger(__name__)
+    logger.info(f"Admin IDs loaded: {config.get_admin_list}")
+
+    bot = create_bot()
+    dp = create_dispatcher()
+
     # Создаём таблицы в БД при первом запуске
     await init_models()
 
-    logger.info("Запуск бота...")
-    await dp.start_polling(bot)
+    logger.info("Запуск бота в режиме %s...", mode)
+    if mode == "webhook":
+        await run_webhook(bot, dp)
+    else:
+        # /metrics в режиме polling — отдельным сервером, если задан METRICS_PORT
+        metrics_runner = None
+        if config.metrics_port:
+            metrics_runner = await start_metrics_server(config.metrics_host, config.metrics_port)
+        try:
+            # Webhook и getUpdates взаимоисключающи — снимаем webhook, если он остался
+            await bot.delete_webhook()
+            await dp.start_polling(bot)
+        finally:
+            if metrics_runner is not None:
+                await metrics_runner.cleanup()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    asyncio.run(main(parse_args().mode))
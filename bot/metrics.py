@@ -0,0 +1,320 @@
+# bot/metrics.py
+#
+# Метрики бота в текстовом формате Prometheus (exposition format 0.0.4) на /metrics.
+# Счётчики и гистограммы — простые словари в памяти процесса, без prometheus_client:
+#   • обработка апдейтов — MetricsMiddleware / HandlerMetricsMiddleware (bot/middlewares.py);
+#   • SQL-запросы — instrument_engine() (события SQLAlchemy);
+#   • вызовы Bot API — TelegramMetricsMiddleware на bot.session;
+#   • тикеты и очереди — gauge, считаются в момент запроса /metrics.
+
+import logging
+import re
+import time
+from typing import Awaitable, Callable, Dict, List, Sequence, Tuple
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramAPIError, TelegramRetryAfter
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiohttp import web
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from bot.broadcaster import broadcaster
+from bot.config import config
+from bot.crud import count_outbox_messages, count_tickets_by_status
+from bot.database import async_session
+from bot.presence import MODES, presence
+from bot.role_cache import role_cache
+
+logger = logging.getLogger(__name__)
+
+# Границы гистограмм задержек, сек
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """Монотонный счётчик; значения по кортежу меток."""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in sorted(self._values.items())
+        ]
+
+
+class Gauge(Counter):
+    """Текущее значение (может уменьшаться)."""
+    kind = "gauge"
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[labels] = float(value)
+
+
+class Histogram(Metric):
+    """Гистограмма с фиксированными границами: _bucket (накопительно), _sum и _count."""
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets) + (float("inf"),)
+        # метки → [счётчики по корзинам (не накопительно)..., sum, count]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0.0] * (len(self.buckets) + 2)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+                break
+        series[-2] += value
+        series[-1] += 1
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return int(series[-1]) if series else 0
+
+    def samples(self) -> List[str]:
+        lines = []
+        for labels, series in sorted(self._series.items()):
+            cumulative = 0.0
+            for bound, hits in zip(self.buckets, series):
+                cumulative += hits
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {_format_value(cumulative)}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {series[-2]!r}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {_format_value(series[-1])}")
+        return lines
+
+
+class Registry:
+    """Все метрики процесса плюс коллекторы — корутины, обновляющие gauge перед выдачей."""
+
+    def __init__(self):
+        self.metrics: List[Metric] = []
+        self.collectors: List[Callable[[], Awaitable[None]]] = []
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._add(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Histogram:
+        return self._add(Histogram(name, documentation, labelnames))
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], Awaitable[None]]) -> None:
+        self.collectors.append(collector)
+
+    async def render(self) -> str:
+        for collector in self.collectors:
+            try:
+                await collector()
+            except Exception:
+                # Упавший коллектор не должен ломать выдачу остальных метрик
+                logger.exception("Metrics: collector %r failed", collector)
+        return "\n".join(metric.render() for metric in self.metrics) + "\n"
+
+
+registry = Registry()
+
+# === Апдейты и хэндлеры ===
+UPDATES = registry.counter("bot_updates_total", "Updates received, by update type.", ("type",))
+UPDATE_ERRORS = registry.counter(
+    "bot_update_errors_total", "Updates whose processing raised an exception.", ("type",)
+)
+UPDATE_DURATION = registry.histogram(
+    "bot_update_duration_seconds", "Full update processing time, middlewares included.", ("type",)
+)
+HANDLER_DURATION = registry.histogram(
+    "bot_handler_duration_seconds", "Handler execution time.", ("handler",)
+)
+
+# === База данных ===
+DB_QUERY_DURATION = registry.histogram(
+    "bot_db_query_duration_seconds", "SQL statement execution time, by statement kind and table.", ("statement",)
+)
+
+# === Telegram Bot API ===
+API_DURATION = registry.histogram(
+    "bot_telegram_api_duration_seconds", "Bot API request time, by method.", ("method",)
+)
+API_ERRORS = registry.counter(
+    "bot_telegram_api_errors_total", "Bot API requests that failed, by method and error.", ("method", "error")
+)
+API_RETRY_AFTER = registry.counter(
+    "bot_telegram_api_retry_after_total", "Bot API flood-control responses (RetryAfter), by method.", ("method",)
+)
+
+# === Тикеты и очереди (считаются при запросе /metrics) ===
+TICKETS = registry.gauge("bot_tickets", "Tickets by status.", ("status",))
+OUTBOX_PENDING = registry.gauge("bot_outbox_pending", "Messages waiting in the outbox table.")
+OPERATORS = registry.gauge("bot_operators", "Active operators by presence status.", ("status",))
+BROADCASTS_PENDING = registry.gauge("bot_broadcasts_pending", "Background broadcasts still running.")
+
+
+# === SQL ===
+
+_VERB_RE = re.compile(r"^\s*(\w+)")
+_TABLE_RE = re.compile(r"\b(?:FROM|INTO|UPDATE|TABLE)\s+[\"`]?(\w+)", re.IGNORECASE)
+
+
+def statement_label(statement: str) -> str:
+    """'SELECT tickets', 'INSERT outbox_messages', ... — метка без параметров и литералов."""
+    verb = _VERB_RE.match(statement)
+    if verb is None:
+        return "?"
+    table = _TABLE_RE.search(statement)
+    return f"{verb.group(1).upper()} {table.group(1)}" if table else verb.group(1).upper()
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """Вешает на движок замер времени каждого SQL-запроса (один раз на движок)."""
+    sync_engine = engine.sync_engine
+    if event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_metrics_started", None)
+    if started is not None:
+        DB_QUERY_DURATION.observe(time.perf_counter() - started, statement_label(statement))
+
+
+# === Bot API ===
+
+class TelegramMetricsMiddleware(BaseRequestMiddleware):
+    """Middleware сессии Bot: время каждого вызова API, ошибки и RetryAfter."""
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        name = type(method).__name__
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except TelegramRetryAfter:
+            API_RETRY_AFTER.inc(name)
+            API_ERRORS.inc(name, "TelegramRetryAfter")
+            raise
+        except TelegramAPIError as e:
+            API_ERRORS.inc(name, type(e).__name__)
+            raise
+        except Exception as e:
+            # Сетевые ошибки и таймауты
+            API_ERRORS.inc(name, type(e).__name__)
+            raise
+        finally:
+            API_DURATION.observe(time.perf_counter() - started, name)
+
+
+# === Gauge тикетов и очередей ===
+
+async def collect_queue_gauges() -> None:
+    async with async_session() as session:
+        by_status = await count_tickets_by_status(session)
+        outbox_pending = await count_outbox_messages(session)
+    for status in ("open", "in_progress", "closed"):
+        TICKETS.set(by_status.get(status, 0), status)
+    OUTBOX_PENDING.set(outbox_pending)
+    BROADCASTS_PENDING.set(broadcaster.pending)
+    # Как и хэндлеры, пока только компания 1
+    by_presence = dict.fromkeys(MODES, 0)
+    for operator_id in await role_cache.operators(1):
+        by_presence[presence.status_of(operator_id)] += 1
+    for status, count in by_presence.items():
+        OPERATORS.set(count, status)
+
+
+registry.add_collector(collect_queue_gauges)
+
+
+# === HTTP ===
+
+async def metrics_handler(request: web.Request) -> web.Response:
+    body = await registry.render()
+    return web.Response(body=body.encode("utf-8"), headers={"Content-Type": CONTENT_TYPE})
+
+
+def setup_metrics_route(app: web.Application, path: str = config.metrics_path) -> None:
+    app.router.add_get(path, metrics_handler)
+
+
+async def start_metrics_server(host: str, port: int, path: str = config.metrics_path) -> web.AppRunner:
+    """Отдельный aiohttp-сервер только с /metrics (режим polling); вернёт runner для cleanup()."""
+    app = web.Application()
+    setup_metrics_route(app, path)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host=host, port=port).start()
+    logger.info("Метрики: http://%s:%s%s", host, port, path)
+    return runner
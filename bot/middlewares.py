@@ -0,0 +1,169 @@
+# bot/middlewares.py
+
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+from bot.broadcaster import broadcaster
+from bot.database import async_session
+from bot.metrics import HANDLER_DURATION, UPDATE_DURATION, UPDATE_ERRORS, UPDATES
+from bot.presence import Presence
+from bot.profiling import QueryProfiler
+from bot.role_cache import role_cache
+
+# Пока бот обслуживает одну компанию (как и во всех хэндлерах: company_id = 1)
+DEFAULT_COMPANY_ID = 1
+
+
+class DbSessionMiddleware(BaseMiddleware):
+    """
+    Unit of work на апдейт: открывает одну AsyncSession, передаёт её хэндлеру
+    как data["session"] и коммитит один раз после успешной обработки.
+    Если хэндлер упал — транзакция откатывается при закрытии сессии.
+    crud-функции внутри апдейта только делают flush.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        async with async_session() as session:
+            data["session"] = session
+            result = await handler(event, data)
+            await session.commit()
+            return result
+
+
+class RoleMiddleware(BaseMiddleware):
+    """
+    Outer-middleware на dp.update: один раз на апдейт определяет, кто прислал событие,
+    и кладёт результат в данные хэндлера:
+      • role        — "admin" / "operator" / "user" (или None, если отправителя нет);
+      • is_admin    — bool;
+      • operator    — OperatorInfo или None;
+      • company_id  — компания, к которой относится апдейт.
+    Фильтры IsAdmin / IsOperator / IsUser после этого только читают эти значения.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user = data.get("event_from_user")
+        company_id = DEFAULT_COMPANY_ID
+        is_admin = False
+        operator = None
+        role = None
+
+        if user is not None:
+            is_admin = role_cache.is_admin(user.id)
+            operator = await role_cache.get_operator(user.id, company_id)
+            if is_admin:
+                role = "admin"
+            elif operator is not None:
+                role = "operator"
+            else:
+                role = "user"
+
+        data["role"] = role
+        data["is_admin"] = is_admin
+        data["operator"] = operator
+        data["company_id"] = company_id
+        return await handler(event, data)
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """
+    Самый внешний middleware на dp.update: считает апдейты и ошибки по типу
+    (message, callback_query, ...) и полное время обработки, включая остальные middleware.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any],
+    ) -> Any:
+        update_type = event.event_type
+        UPDATES.inc(update_type)
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            UPDATE_ERRORS.inc(update_type)
+            raise
+        finally:
+            UPDATE_DURATION.observe(time.perf_counter() - started, update_type)
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """
+    Inner-middleware (dp.message, dp.callback_query): время выполнения самого хэндлера,
+    метка — "модуль.функция", например "user_handlers.handle_text_during_states".
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        callback = data["handler"].callback
+        name = f"{callback.__module__.rsplit('.', 1)[-1]}.{callback.__name__}"
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            HANDLER_DURATION.observe(time.perf_counter() - started, name)
+
+
+class QueryProfileMiddleware(BaseMiddleware):
+    """
+    Outer-middleware на dp.update (только при DB_PROFILE): привязывает все SQL-запросы
+    апдейта, включая commit в DbSessionMiddleware, к его update_id и считает их.
+    """
+
+    def __init__(self, profiler: QueryProfiler):
+        self.profiler = profiler
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any],
+    ) -> Any:
+        token = self.profiler.begin_update(event.update_id, event.event_type)
+        try:
+            return await handler(event, data)
+        finally:
+            self.profiler.end_update(token)
+
+
+class PresenceMiddleware(BaseMiddleware):
+    """
+    Outer-middleware на сообщения и колбэки operator_router: отмечает активность
+    оператора в Presence (только в памяти, в БД её пишет фоновая задача) и снимает
+    с его чата отметку «бот заблокирован» в broadcaster — раз пишет, то разблокировал.
+    Outer-middleware роутера срабатывает до его фильтров, поэтому роль проверяем сами.
+    """
+
+    def __init__(self, presence: Presence):
+        self.presence = presence
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        operator = data.get("operator")
+        if operator is not None:
+            self.presence.touch(operator.telegram_id)
+            broadcaster.unblock(operator.telegram_id)
+        return await handler(event, data)
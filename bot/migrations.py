@@ -0,0 +1,156 @@
+# bot/migrations.py
+#
+# Маленький версионный раннер миграций. create_all() создаёт только недостающие
+# таблицы и не трогает уже существующие (например, боевую support_bot.db), поэтому
+# всё, что меняет существующие таблицы, описывается здесь как пронумерованная миграция.
+# Применённые версии записываются в schema_migrations; run_migrations() вызывается
+# из init_models() при каждом старте и применяет только новые.
+
+import logging
+from typing import Awaitable, Callable, List, Tuple, Union
+
+from sqlalchemy import Table, inspect, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncConnection
+from sqlalchemy.schema import CreateTable
+
+logger = logging.getLogger(__name__)
+
+Step = Union[str, Callable[[AsyncConnection], Awaitable[None]]]
+
+
+def _rebuild_with_autoincrement(conn: Connection, table: Table, archive: Table) -> None:
+    """
+    Пересоздаёт таблицу SQLite с INTEGER PRIMARY KEY AUTOINCREMENT (если её создали
+    без него) и ставит счётчик id после наибольшего id в ней и в её архиве.
+    """
+    name = table.name
+    ddl = conn.exec_driver_sql(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ).scalar()
+    if "AUTOINCREMENT" not in ddl.upper():
+        if conn.exec_driver_sql("PRAGMA foreign_keys").scalar():
+            # DROP TABLE при включённых внешних ключах каскадно удалил бы связанные строки
+            raise RuntimeError(f"Cannot rebuild {name} with PRAGMA foreign_keys=ON")
+        rebuilt = f"{name}_rebuild"
+        create = str(CreateTable(table).compile(dialect=conn.dialect)).strip()
+        conn.exec_driver_sql(create.replace(f"CREATE TABLE {name} ", f"CREATE TABLE {rebuilt} ", 1))
+        existing = {row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({name})")}
+        columns = ", ".join(c.name for c in table.columns if c.name in existing)
+        conn.exec_driver_sql(f"INSERT INTO {rebuilt} ({columns}) SELECT {columns} FROM {name}")
+        conn.exec_driver_sql(f"DROP TABLE {name}")
+        conn.exec_driver_sql(f"ALTER TABLE {rebuilt} RENAME TO {name}")
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+    top = max(
+        conn.exec_driver_sql(f"SELECT COALESCE(MAX(id), 0) FROM {name}").scalar(),
+        conn.exec_driver_sql(f"SELECT COALESCE(MAX(id), 0) FROM {archive.name}").scalar(),
+    )
+    conn.exec_driver_sql("DELETE FROM sqlite_sequence WHERE name = ?", (name,))
+    conn.exec_driver_sql("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)", (name, top))
+
+
+async def _monotonic_ticket_ids(conn: AsyncConnection) -> None:
+    """
+    В SQLite без AUTOINCREMENT новая строка получает max(id) + 1: когда архивация
+    переносила тикеты с наибольшими id, номера тикетов и сообщений начинали повторяться
+    и совпадать с архивными. В PostgreSQL последовательности и так не повторяются.
+    """
+    if conn.dialect.name != "sqlite":
+        return
+    from bot.models import ArchivedTicket, ArchivedTicketMessage, Ticket, TicketMessage
+
+    for table, archive in (
+        (Ticket.__table__, ArchivedTicket.__table__),
+        (TicketMessage.__table__, ArchivedTicketMessage.__table__),
+    ):
+        await conn.run_sync(_rebuild_with_autoincrement, table, archive)
+
+
+async def _outbox_reply_markup(conn: AsyncConnection) -> None:
+    """Колонка outbox_messages.reply_markup; на новой базе её уже создал create_all()."""
+    columns = await conn.run_sync(
+        lambda sync_conn: {c["name"] for c in inspect(sync_conn).get_columns("outbox_messages")}
+    )
+    if "reply_markup" not in columns:
+        await conn.execute(text("ALTER TABLE outbox_messages ADD COLUMN reply_markup TEXT"))
+
+
+# (версия, описание, шаги). Шаг — SQL-команда, которая должна работать и в SQLite,
+# и в PostgreSQL, или async-функция от соединения, если без разбора по диалектам не обойтись.
+# Новые миграции — только в конец списка, уже выпущенные не менять.
+MIGRATIONS: List[Tuple[int, str, List[Step]]] = [
+    (
+        1,
+        "composite indexes for hot ticket/operator/outbox queries",
+        [
+            "CREATE INDEX IF NOT EXISTS ix_tickets_company_status "
+            "ON tickets (company_id, status)",
+            "CREATE INDEX IF NOT EXISTS ix_tickets_user_status "
+            "ON tickets (user_id, status)",
+            "CREATE INDEX IF NOT EXISTS ix_tickets_operator_company_status "
+            "ON tickets (operator_id, company_id, status)",
+            "CREATE INDEX IF NOT EXISTS ix_operators_company_active "
+            "ON operators (company_id, is_active)",
+            "CREATE INDEX IF NOT EXISTS ix_outbox_messages_next_attempt_at "
+            "ON outbox_messages (next_attempt_at)",
+        ],
+    ),
+    (
+        2,
+        "indexes for closed-ticket archival and user_sessions pruning",
+        [
+            "CREATE INDEX IF NOT EXISTS ix_tickets_status_updated_at "
+            "ON tickets (status, updated_at)",
+            "CREATE INDEX IF NOT EXISTS ix_user_sessions_updated_at "
+            "ON user_sessions (updated_at)",
+        ],
+    ),
+    (
+        3,
+        "monotonic ticket and ticket message ids (SQLite AUTOINCREMENT)",
+        [_monotonic_ticket_ids],
+    ),
+    (
+        4,
+        "inline keyboards in outbox messages",
+        [_outbox_reply_markup],
+    ),
+    (
+        5,
+        "drop the user_sessions pruning index (the table is no longer written)",
+        ["DROP INDEX IF EXISTS ix_user_sessions_updated_at"],
+    ),
+]
+
+
+async def run_migrations(conn: AsyncConnection) -> List[int]:
+    """
+    Применяет ещё не применённые миграции в порядке версий, каждую — вместе
+    с записью в schema_migrations. Возвращает список применённых версий.
+    """
+    await conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "version INTEGER PRIMARY KEY, "
+        "description VARCHAR(255) NOT NULL, "
+        "applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+    ))
+    result = await conn.execute(text("SELECT version FROM schema_migrations"))
+    applied = {row[0] for row in result.all()}
+
+    newly_applied = []
+    for version, description, statements in sorted(MIGRATIONS):
+        if version in applied:
+            continue
+        logger.info("Applying migration %s: %s", version, description)
+        for statement in statements:
+            if callable(statement):
+                await statement(conn)
+            else:
+                await conn.execute(text(statement))
+        await conn.execute(
+            text("INSERT INTO schema_migrations (version, description) VALUES (:v, :d)"),
+            {"v": version, "d": description}
+        )
+        newly_applied.append(version)
+    return newly_applied
@@ -1,13 +1,13 @@
 # bot/models.py
 
 from sqlalchemy import (
-    Column, Integer, String, Text, Boolean, ForeignKey, DateTime
+    Column, Integer, BigInteger, String, Text, Boolean, ForeignKey, DateTime, Index
 )
 from sqlalchemy.orm import relationship
-from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
 
-Base = declarative_base()
+# Общий Base из bot.database — иначе init_models() создаёт таблицы по пустым метаданным
+from bot.database import Base
 
 class Company(Base):
     __tablename__ = "companies"
@@ -45,6 +45,22 @@ class Operator(Base):
 
     company = relationship("Company", back_populates="operators")
 
+    __table_args__ = (
+        # get_operators / кэш ролей: WHERE company_id = ? AND is_active
+        Index("ix_operators_company_active", "company_id", "is_active"),
+    )
+
+class OperatorPresence(Base):
+    """
+    Присутствие оператора (bot/presence.py): выбранный режим и время последней активности.
+    Пишется пачками раз в PRESENCE_FLUSH_INTERVAL, а не на каждый апдейт оператора.
+    """
+    __tablename__ = "operator_presence"
+
+    telegram_id = Column(String(32), primary_key=True)
+    mode = Column(String(16), nullable=False, default="online")   # "online" / "away" / "offline"
+    last_seen_at = Column(DateTime(timezone=True), nullable=True)
+
 class Ticket(Base):
     __tablename__ = "tickets"
 
@@ -60,10 +76,79 @@ class Ticket(Base):
 
     # company и оператор можно подключить через relationship, но для простоты достаточно хранить поля.
 
+    # Индексы под горячие запросы из bot/crud.py (для существующих баз их добавляет bot/migrations.py)
+    __table_args__ = (
+        # get_open_tickets
+        Index("ix_tickets_company_status", "company_id", "status"),
+        # get_active_ticket_by_user — на каждое сообщение клиента
+        Index("ix_tickets_user_status", "user_id", "status"),
+        # get_tickets_by_operator
+        Index("ix_tickets_operator_company_status", "operator_id", "company_id", "status"),
+        # архивация (bot/archive.py): WHERE status = 'closed' AND updated_at < ? ORDER BY updated_at
+        Index("ix_tickets_status_updated_at", "status", "updated_at"),
+        # SQLite: id не переиспользуются, даже когда архивация удалила строки с наибольшими id
+        {"sqlite_autoincrement": True},
+    )
+
+class ArchivedTicket(Base):
+    """
+    Закрытый тикет, перенесённый из tickets фоновой архивацией (bot/archive.py).
+    Колонки те же, что у Ticket, плюс время переноса.
+    """
+    __tablename__ = "tickets_archive"
+
+    id = Column(Integer, primary_key=True)
+    company_id = Column(Integer, nullable=True)
+    user_id = Column(String(32), nullable=False)
+    operator_id = Column(String(32), nullable=True)
+    question_text = Column(Text, nullable=False)
+    status = Column(String(20), nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), nullable=True)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class TicketMessage(Base):
+    """
+    Одно сообщение переписки по тикету (клиент → оператор или оператор → клиент).
+    Пишется пачками из bot/transcript.py, поэтому created_at ставит бот, а не БД.
+    """
+    __tablename__ = "ticket_messages"
+
+    id = Column(Integer, primary_key=True)
+    ticket_id = Column(Integer, ForeignKey("tickets.id", ondelete="CASCADE"), nullable=False)
+    direction = Column(String(20), nullable=False)     # "to_operator" или "to_customer"
+    sender_id = Column(String(32), nullable=False)     # Telegram user_id отправителя
+    text = Column(Text, nullable=False)
+    # Исходное сообщение в Telegram (чат отправителя и message_id в нём)
+    chat_id = Column(BigInteger, nullable=True)
+    message_id = Column(BigInteger, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        # get_ticket_messages: WHERE ticket_id = ? ORDER BY id
+        Index("ix_ticket_messages_ticket_id", "ticket_id", "id"),
+        {"sqlite_autoincrement": True},
+    )
+
+class ArchivedTicketMessage(Base):
+    """Сообщение переписки архивного тикета (переносится вместе с тикетом)."""
+    __tablename__ = "ticket_messages_archive"
+
+    id = Column(Integer, primary_key=True)
+    ticket_id = Column(Integer, nullable=False, index=True)
+    direction = Column(String(20), nullable=False)
+    sender_id = Column(String(32), nullable=False)
+    text = Column(Text, nullable=False)
+    chat_id = Column(BigInteger, nullable=True)
+    message_id = Column(BigInteger, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+
 class UserSession(Base):
     """
     Вспомогательная таблица для хранения состояния взаимодействия клиента с ботом.
     Например, клиент выбрал FAQ, но ещё не ввёл текст, или находится в режиме переписки с оператором.
+    Больше не используется: состояния клиента (CustomerStates) живут в FSM-хранилище
+    (bot/fsm_storage.py, таблица fsm_records). Модель оставлена ради существующих баз.
     """
     __tablename__ = "user_sessions"
 
@@ -76,3 +161,33 @@ class UserSession(Base):
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
     company = relationship("Company")
+
+class OutboxMessage(Base):
+    """
+    Исходящее сообщение, ожидающее доставки фоновыми воркерами (bot/outbox.py).
+    Хэндлеры только кладут строку сюда; после успешной отправки строка удаляется,
+    при ошибке — переносится на next_attempt_at. Таблица переживает перезапуск бота.
+    """
+    __tablename__ = "outbox_messages"
+
+    id = Column(Integer, primary_key=True)
+    chat_id = Column(BigInteger, nullable=False, index=True)
+    text = Column(Text, nullable=False)
+    # InlineKeyboardMarkup в JSON или NULL, если сообщение без кнопок
+    reply_markup = Column(Text, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class FSMRecord(Base):
+    """
+    Состояние FSM aiogram (state + data) одного чата/пользователя, см. bot/fsm_storage.py.
+    key — строка из DefaultKeyBuilder; пустые контексты не хранятся, а простаивающие
+    дольше FSM_TTL удаляются фоновой очисткой.
+    """
+    __tablename__ = "fsm_records"
+
+    key = Column(String(255), primary_key=True)
+    state = Column(String(100), nullable=True)
+    data = Column(Text, nullable=True)
+    updated_at = Column(DateTime(timezone=True), nullable=False, index=True)
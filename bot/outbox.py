@@ -0,0 +1,196 @@
+# bot/outbox.py
+
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+from aiogram.types import InlineKeyboardMarkup
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.crud import (
+    delete_outbox_messages,
+    enqueue_outbox_message,
+    get_due_outbox_messages,
+    reschedule_outbox_message
+)
+from bot.database import after_commit, async_session
+from bot.models import OutboxMessage
+from bot.pubsub import cache_bus
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_WORKERS = 4
+OUTBOX_BATCH_SIZE = 100
+# Как часто заглядывать в таблицу, если никто не разбудил через enqueue()
+OUTBOX_POLL_INTERVAL = 1.0
+# После стольких неудачных попыток сообщение выбрасывается
+OUTBOX_MAX_ATTEMPTS = 8
+
+
+def backoff_delay(attempts: int) -> float:
+    """Экспоненциальная пауза перед повтором: 1, 2, 4, ... но не больше 5 минут."""
+    return min(2.0 ** attempts, 300.0)
+
+
+class Outbox:
+    """
+    Надёжная очередь исходящих сообщений поверх таблицы outbox_messages.
+      • enqueue() — добавляет сообщение в сессию хэндлера и будит воркеры после её
+        commit; это всё, что делает хэндлер, сам запрос в Telegram идёт в фоне;
+      • фоновый цикл забирает пачку созревших сообщений и раздаёт её пулу воркеров
+        по chat_id % workers — сообщения одного чата отправляет один воркер строго
+        по порядку, разные чаты идут параллельно;
+      • отправленные строки удаляются одной командой, неудачные переносятся
+        с экспоненциальной паузой, при этом остальные сообщения того же чата ждут.
+    Неотправленные сообщения остаются в таблице и дойдут после перезапуска.
+    В кластере (bot/cluster.py) каждый воркер доставляет только свою долю чатов
+    (shard=(index, total)), поэтому одно сообщение не уйдёт дважды.
+    """
+
+    def __init__(
+        self,
+        workers: int = OUTBOX_WORKERS,
+        batch_size: int = OUTBOX_BATCH_SIZE,
+        poll_interval: float = OUTBOX_POLL_INTERVAL,
+        max_attempts: int = OUTBOX_MAX_ATTEMPTS,
+        shard: Optional[Tuple[int, int]] = None
+    ):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.shard = shard
+        self.sent = 0
+        self._bot: Optional[Bot] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def enqueue(
+        self,
+        session: AsyncSession,
+        chat_id: int,
+        text: str,
+        reply_markup: Optional[InlineKeyboardMarkup] = None
+    ) -> None:
+        markup = reply_markup.model_dump_json(exclude_none=True) if reply_markup is not None else None
+        await enqueue_outbox_message(session, chat_id, text, markup)
+
+        def committed():
+            # Чат может принадлежать другому воркеру кластера — будим и его
+            self.wakeup_for(chat_id)
+            cache_bus.publish("outbox", chat_id)
+
+        after_commit(session, committed)
+
+    def owns(self, chat_id: int) -> bool:
+        return self.shard is None or abs(chat_id) % self.shard[1] == self.shard[0]
+
+    def wakeup_for(self, chat_id: int) -> None:
+        if self.owns(chat_id):
+            self.wakeup()
+
+    def wakeup(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def start(self, bot: Bot) -> None:
+        """Запускает фоновую доставку (регистрируется в dp.startup)."""
+        if self._task is not None:
+            return
+        self._bot = bot
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Останавливает доставку (dp.shutdown). Неотправленное остаётся в БД."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def drain_once(self) -> int:
+        """Отправляет одну пачку созревших сообщений; возвращает размер пачки."""
+        async with async_session() as session:
+            batch = await get_due_outbox_messages(session, self.batch_size, self.shard)
+        if not batch:
+            return 0
+
+        shards: Dict[int, List[OutboxMessage]] = {}
+        for msg in batch:
+            shards.setdefault(msg.chat_id % self.workers, []).append(msg)
+
+        results = await asyncio.gather(*(self._deliver(msgs) for msgs in shards.values()))
+
+        sent_ids: List[int] = []
+        async with async_session() as session:
+            for delivered, retries in results:
+                sent_ids.extend(delivered)
+                for message_id, delay in retries:
+                    await reschedule_outbox_message(session, message_id, delay)
+            await delete_outbox_messages(session, sent_ids)
+            await session.commit()
+        self.sent += len(sent_ids)
+        return len(batch)
+
+    async def _deliver(self, messages: List[OutboxMessage]):
+        """
+        Отправляет сообщения одного шарда по порядку. Возвращает
+        (id отправленных/выброшенных, [(id, пауза), ...] для повтора).
+        После первой ошибки в чате остальные его сообщения из пачки не трогаем.
+        """
+        done: List[int] = []
+        retries: List[tuple[int, float]] = []
+        stalled_chats = set()
+
+        for msg in messages:
+            if msg.chat_id in stalled_chats:
+                continue
+            try:
+                markup = InlineKeyboardMarkup.model_validate_json(msg.reply_markup) if msg.reply_markup else None
+                await self._bot.send_message(chat_id=msg.chat_id, text=msg.text, reply_markup=markup)
+                done.append(msg.id)
+            except TelegramRetryAfter as e:
+                stalled_chats.add(msg.chat_id)
+                retries.append((msg.id, float(e.retry_after)))
+            except TelegramForbiddenError:
+                logger.info("Outbox: chat %s blocked the bot, dropping message %s", msg.chat_id, msg.id)
+                done.append(msg.id)
+            except Exception as e:
+                if msg.attempts + 1 >= self.max_attempts:
+                    logger.error("Outbox: giving up on message %s to %s: %s", msg.id, msg.chat_id, e)
+                    done.append(msg.id)
+                    continue
+                logger.warning("Outbox: message %s to %s failed: %s", msg.id, msg.chat_id, e)
+                stalled_chats.add(msg.chat_id)
+                retries.append((msg.id, backoff_delay(msg.attempts)))
+        return done, retries
+
+    async def _run(self) -> None:
+        while True:
+            # Сбрасываем флаг до выборки: enqueue(), пришедший во время отправки, не потеряется
+            self._wakeup.clear()
+            try:
+                processed = await self.drain_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Outbox: delivery loop error")
+                processed = 0
+
+            # Пачка была полной — скорее всего, есть ещё; иначе ждём enqueue() или таймаут
+            if processed >= self.batch_size:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+outbox = Outbox()
+cache_bus.subscribe("outbox", outbox.wakeup_for)
@@ -0,0 +1,215 @@
+# bot/presence.py
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Set
+
+from bot.config import config
+from bot.crud import get_operator_presence, save_operator_presence
+from bot.database import async_session
+from bot.pubsub import cache_bus
+
+logger = logging.getLogger(__name__)
+
+ONLINE = "online"
+AWAY = "away"
+OFFLINE = "offline"
+MODES = (ONLINE, AWAY, OFFLINE)
+
+# Активность оператора сообщается остальным воркерам кластера не чаще раза в столько
+# секунд (смена режима — сразу). Должно быть заметно меньше presence_away_after
+PRESENCE_GOSSIP_INTERVAL = 60.0
+
+
+class Presence:
+    """
+    Присутствие операторов: кому слать уведомления о новых тикетах и кого назначать.
+      • режим оператор выбирает сам командами /online, /away, /offline (по умолчанию online);
+      • last_seen — время последнего апдейта оператора, его в памяти обновляет
+        PresenceMiddleware на operator_router, без запросов к БД;
+      • статус — выбранный режим, но online без активности дольше away_after
+        становится away, дольше offline_after — offline; пересчитывается при
+        активности и фоновой задачей раз в flush_interval;
+      • оператор, о котором ничего не известно (ещё ничего не писал, например сразу
+        после первого деплоя), считается online: из ротации выводят только явные
+        /away, /offline или таймаут после активности, иначе после перезапуска
+        тикеты некому было бы назначать;
+      • изменившиеся режимы и last_seen та же задача пишет в operator_presence одним
+        upsert (как журнал переписки), start() читает их оттуда при старте;
+      • другим воркерам кластера режим и активность уходят через cache_bus "presence".
+    version растёт при каждой смене статуса — по нему AssignmentEngine понимает,
+    что множество доступных операторов изменилось.
+    """
+
+    def __init__(
+        self,
+        away_after: float = config.presence_away_after,
+        offline_after: float = config.presence_offline_after,
+        flush_interval: float = config.presence_flush_interval
+    ):
+        self.away_after = away_after
+        self.offline_after = offline_after
+        self.flush_interval = flush_interval
+        self.mode: Dict[int, str] = {}
+        self.last_seen: Dict[int, float] = {}
+        self.status: Dict[int, str] = {}
+        self.version = 0
+        self._dirty: Set[int] = set()
+        self._published: Dict[int, float] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    # --- статус ---
+
+    def _refresh(self, operator_id: int, now: float) -> str:
+        status = self.mode.get(operator_id, ONLINE)
+        seen = self.last_seen.get(operator_id)
+        # Таймаут отсчитывается только от известной активности
+        if status == ONLINE and seen is not None:
+            idle = now - seen
+            if idle >= self.offline_after:
+                status = OFFLINE
+            elif idle >= self.away_after:
+                status = AWAY
+        if self.status.get(operator_id, ONLINE) != status:
+            self.status[operator_id] = status
+            self.version += 1
+        return status
+
+    def sweep(self, now: Optional[float] = None) -> None:
+        """Пересчитывает статусы всех известных операторов (истёкшие таймауты)."""
+        now = time.time() if now is None else now
+        for operator_id in self.last_seen.keys() | self.mode.keys():
+            self._refresh(operator_id, now)
+
+    def status_of(self, operator_id: int) -> str:
+        if operator_id not in self.last_seen and operator_id not in self.mode:
+            return ONLINE
+        return self._refresh(operator_id, time.time())
+
+    def available(self, operator_ids: Iterable[int]) -> List[int]:
+        """Операторы из operator_ids, которые сейчас на связи."""
+        return [op for op in operator_ids if self.status_of(op) == ONLINE]
+
+    def recipients(self, operator_ids: Iterable[int]) -> List[int]:
+        """
+        Кого уведомлять о новом тикете: операторов на связи, если таких нет — отошедших,
+        если нет и их — всех (тикет не должен остаться незамеченным).
+        """
+        operator_ids = list(operator_ids)
+        by_status: Dict[str, List[int]] = {ONLINE: [], AWAY: [], OFFLINE: []}
+        for op in operator_ids:
+            by_status[self.status_of(op)].append(op)
+        return by_status[ONLINE] or by_status[AWAY] or operator_ids
+
+    # --- события ---
+
+    def touch(self, operator_id: int) -> None:
+        """Оператор что-то сделал в боте (вызывается на каждый его апдейт)."""
+        now = time.time()
+        self.last_seen[operator_id] = now
+        self._dirty.add(operator_id)
+        self._refresh(operator_id, now)
+        if now - self._published.get(operator_id, 0.0) >= PRESENCE_GOSSIP_INTERVAL:
+            self._publish(operator_id, now)
+
+    def set_mode(self, operator_id: int, mode: str) -> str:
+        """Режим, выбранный оператором командой; возвращает получившийся статус."""
+        if mode not in MODES:
+            raise ValueError(f"Unknown presence mode: {mode}")
+        now = time.time()
+        self.mode[operator_id] = mode
+        self.last_seen[operator_id] = now
+        self._dirty.add(operator_id)
+        self._publish(operator_id, now)
+        return self._refresh(operator_id, now)
+
+    def _publish(self, operator_id: int, now: float) -> None:
+        self._published[operator_id] = now
+        cache_bus.publish("presence", (operator_id, self.mode.get(operator_id, ONLINE), now))
+
+    def apply(self, payload) -> None:
+        """Событие от другого воркера кластера; в БД его пишет тот воркер."""
+        operator_id, mode, seen = payload
+        self.mode[operator_id] = mode
+        self.last_seen[operator_id] = max(seen, self.last_seen.get(operator_id, 0.0))
+        self._refresh(operator_id, time.time())
+
+    def reset(self) -> None:
+        self.mode.clear()
+        self.last_seen.clear()
+        self.status.clear()
+        self._dirty.clear()
+        self._published.clear()
+        self.version += 1
+
+    # --- БД и фоновая задача ---
+
+    async def load(self) -> None:
+        async with async_session() as session:
+            rows = await get_operator_presence(session)
+        for row in rows:
+            operator_id = int(row.telegram_id)
+            self.mode[operator_id] = row.mode
+            seen = row.last_seen_at
+            if seen is not None:
+                if seen.tzinfo is None:  # SQLite возвращает время без часового пояса
+                    seen = seen.replace(tzinfo=timezone.utc)
+                self.last_seen[operator_id] = seen.timestamp()
+        self.sweep()
+        logger.info("Presence: загружено операторов: %s", len(rows))
+
+    async def flush(self) -> int:
+        """Пишет режимы и last_seen изменившихся операторов; возвращает число строк."""
+        if not self._dirty:
+            return 0
+        batch, self._dirty = self._dirty, set()
+        rows = [
+            {
+                "telegram_id": str(op),
+                "mode": self.mode.get(op, ONLINE),
+                "last_seen_at": datetime.fromtimestamp(self.last_seen.get(op, time.time()), timezone.utc),
+            }
+            for op in batch
+        ]
+        try:
+            async with async_session() as session:
+                await save_operator_presence(session, rows)
+                await session.commit()
+        except BaseException:
+            self._dirty |= batch
+            raise
+        return len(rows)
+
+    async def start(self) -> None:
+        """Загружает присутствие из БД и запускает фоновую задачу (dp.startup)."""
+        await self.load()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Останавливает фоновую задачу и дописывает last_seen (dp.shutdown)."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            self.sweep()
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Presence: flush failed")
+
+
+presence = Presence()
+cache_bus.subscribe("presence", presence.apply)
@@ -0,0 +1,144 @@
+# bot/profiling.py
+#
+# Режим профилирования SQL (DB_PROFILE=true в .env). Включается только явно:
+# для каждого запроса ищется место вызова по стеку, а это заметно дороже самого
+# счётчика в bot/metrics.py.
+#   • запросы дольше DB_SLOW_QUERY_MS пишутся в лог с параметрами, местом вызова
+#     (crud-функция и хэндлер) и id апдейта;
+#   • на каждый апдейт считается число запросов; больше DB_MAX_QUERIES_PER_UPDATE —
+#     предупреждение с разбивкой по видам запросов (поиск N+1);
+#   • итоги по апдейтам лежат в query_profiler.updates — по ним
+#     benchmarks/check_query_counts.py сверяет число запросов с бюджетом в CI.
+
+import logging
+import os
+import sys
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import List, Optional
+
+import greenlet
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from bot.config import config
+from bot.metrics import statement_label
+
+logger = logging.getLogger(__name__)
+
+_BOT_DIR = os.path.dirname(os.path.abspath(__file__))
+_THIS_FILE = os.path.abspath(__file__)
+
+# Сколько кадров кода бота показывать в месте вызова: crud-функция ← хэндлер
+CALL_SITE_DEPTH = 2
+# Сколько итогов по апдейтам хранить
+UPDATES_HISTORY = 10_000
+
+
+class UpdateQueries:
+    """Запросы одного апдейта: счётчик и метки вида "SELECT tickets @ crud.py:85 get_x"."""
+
+    __slots__ = ("update_id", "update_type", "count", "statements", "finished")
+
+    def __init__(self, update_id: int, update_type: str):
+        self.update_id = update_id
+        self.update_type = update_type
+        self.count = 0
+        self.statements: List[str] = []
+        # После окончания апдейта запросы фоновых задач, унаследовавших контекст, не считаем
+        self.finished = False
+
+    def summary(self) -> str:
+        return ", ".join(f"{label} ×{n}" for label, n in Counter(self.statements).most_common())
+
+
+_current_update: ContextVar[Optional[UpdateQueries]] = ContextVar("current_update", default=None)
+
+
+def call_site(depth: int = CALL_SITE_DEPTH) -> str:
+    """
+    "crud.py:85 get_active_operator_ids ← user_handlers.py:170 handle_text_during_states".
+    Запрос выполняется в дочернем greenlet (SQLAlchemy asyncio), поэтому стек корутин
+    берём из родительского greenlet, который ждёт результата.
+    """
+    frames = []
+    parent = greenlet.getcurrent().parent
+    frame = parent.gr_frame if parent is not None else sys._getframe(1)
+    while frame is not None and len(frames) < depth:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if filename.startswith(_BOT_DIR) and filename != _THIS_FILE:
+            frames.append(f"{os.path.basename(filename)}:{frame.f_lineno} {frame.f_code.co_name}")
+        frame = frame.f_back
+    return " ← ".join(frames) or "?"
+
+
+class QueryProfiler:
+    """Slow-query log и подсчёт запросов на апдейт; attach() вешает его на движок."""
+
+    def __init__(
+        self,
+        slow_query_ms: float = config.db_slow_query_ms,
+        max_queries_per_update: int = config.db_max_queries_per_update
+    ):
+        self.slow_query_ms = slow_query_ms
+        self.max_queries_per_update = max_queries_per_update
+        self.updates: List[UpdateQueries] = []
+        self.slow_queries = 0
+
+    def attach(self, engine: AsyncEngine) -> None:
+        sync_engine = engine.sync_engine
+        if event.contains(sync_engine, "before_cursor_execute", self._before_cursor_execute):
+            return
+        event.listen(sync_engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", self._after_cursor_execute)
+
+    def detach(self, engine: AsyncEngine) -> None:
+        sync_engine = engine.sync_engine
+        if event.contains(sync_engine, "before_cursor_execute", self._before_cursor_execute):
+            event.remove(sync_engine, "before_cursor_execute", self._before_cursor_execute)
+            event.remove(sync_engine, "after_cursor_execute", self._after_cursor_execute)
+
+    def begin_update(self, update_id: int, update_type: str):
+        """Начинает учёт запросов апдейта; вернёт токен для end_update()."""
+        return _current_update.set(UpdateQueries(update_id, update_type))
+
+    def end_update(self, token) -> UpdateQueries:
+        stats = _current_update.get()
+        _current_update.reset(token)
+        stats.finished = True
+        self.updates.append(stats)
+        if len(self.updates) > UPDATES_HISTORY:
+            del self.updates[:len(self.updates) - UPDATES_HISTORY]
+        if stats.count > self.max_queries_per_update:
+            logger.warning(
+                "Update %s (%s): %s SQL queries (limit %s) — possible N+1: %s",
+                stats.update_id, stats.update_type, stats.count,
+                self.max_queries_per_update, stats.summary()
+            )
+        return stats
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        context._profile_started = time.perf_counter()
+        stats = _current_update.get()
+        if stats is not None and not stats.finished:
+            stats.count += 1
+            stats.statements.append(f"{statement_label(statement)} @ {call_site(1)}")
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_profile_started", None)
+        if started is None:
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1e3
+        if elapsed_ms < self.slow_query_ms:
+            return
+        self.slow_queries += 1
+        stats = _current_update.get()
+        update_id = stats.update_id if stats is not None and not stats.finished else "-"
+        logger.warning(
+            "Slow query %.1f ms [update %s] at %s\n%s\nparams: %r",
+            elapsed_ms, update_id, call_site(), statement, parameters
+        )
+
+
+query_profiler = QueryProfiler()
@@ -0,0 +1,45 @@
+# bot/pubsub.py
+
+import logging
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBus:
+    """
+    Локальный pub/sub между процессами бота (см. bot/cluster.py):
+      • publish(channel, payload) — сообщить ОСТАЛЬНЫМ процессам (свой процесс код
+        обновляет сам, как и раньше); в однопроцессном режиме это no-op;
+      • subscribe(channel, callback) — callback(payload) вызывается, когда событие
+        опубликовал другой процесс.
+    Каналы: "roles" (company_id | None), "faq" (company_id), "outbox" (chat_id),
+    "routes" (событие RoutingTable), "presence" (режим и активность оператора).
+    Транспорт подключает воркер кластера через attach().
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[str, List[Callable[[Any], None]]] = defaultdict(list)
+        self._transport: Optional[Callable[[str, Any], None]] = None
+
+    def subscribe(self, channel: str, callback: Callable[[Any], None]) -> None:
+        self._subscribers[channel].append(callback)
+
+    def attach(self, transport: Optional[Callable[[str, Any], None]]) -> None:
+        self._transport = transport
+
+    def publish(self, channel: str, payload: Any = None) -> None:
+        if self._transport is not None:
+            self._transport(channel, payload)
+
+    def deliver(self, channel: str, payload: Any = None) -> None:
+        """Вызывает подписчиков канала (событие пришло от другого процесса)."""
+        for callback in self._subscribers.get(channel, ()):
+            try:
+                callback(payload)
+            except Exception:
+                logger.exception("CacheBus: subscriber for %s failed", channel)
+
+
+cache_bus = CacheBus()
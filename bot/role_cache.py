@@ -0,0 +1,90 @@
+# bot/role_cache.py
+
+import time
+from typing import Dict, FrozenSet, NamedTuple, Optional
+
+from sqlalchemy.future import select
+
+from bot.config import config
+from bot.database import async_session
+from bot.models import Operator
+from bot.pubsub import cache_bus
+
+# Через сколько секунд кэш операторов считается устаревшим, даже если
+# никто явно не вызвал invalidate() (например, оператора поменяли руками в БД).
+ROLE_CACHE_TTL = 60.0
+
+
+class OperatorInfo(NamedTuple):
+    """
+    Лёгкий снимок строки Operator, который кладётся в данные хэндлера
+    (не ORM-объект — не привязан к сессии и не «протухает»).
+    """
+    id: int
+    company_id: int
+    telegram_id: int
+    full_name: Optional[str]
+
+
+class RoleCache:
+    """
+    In-process кэш ролей:
+      • admin_ids — множество ID админов, разбирается из BotConfig.admin_ids один раз;
+      • per-company множество telegram_id активных операторов.
+    Проверка роли — обычный lookup в set, без обращений к БД,
+    пока кэш компании не сброшен через invalidate() или не истёк TTL.
+    """
+
+    def __init__(self, ttl: float = ROLE_CACHE_TTL):
+        self.ttl = ttl
+        self.admin_ids: FrozenSet[int] = frozenset(config.get_admin_list)
+        # company_id → ({telegram_id: OperatorInfo}, время загрузки)
+        self._operators: Dict[int, tuple[Dict[int, OperatorInfo], float]] = {}
+
+    def is_admin(self, user_id: int) -> bool:
+        return user_id in self.admin_ids
+
+    async def operators(self, company_id: int) -> Dict[int, OperatorInfo]:
+        cached = self._operators.get(company_id)
+        if cached is not None and time.monotonic() - cached[1] < self.ttl:
+            return cached[0]
+        return await self._load(company_id)
+
+    async def operator_ids(self, company_id: int) -> FrozenSet[int]:
+        return frozenset(await self.operators(company_id))
+
+    async def get_operator(self, user_id: int, company_id: int = 1) -> Optional[OperatorInfo]:
+        return (await self.operators(company_id)).get(user_id)
+
+    async def is_operator(self, user_id: int, company_id: int = 1) -> bool:
+        return user_id in await self.operators(company_id)
+
+    def invalidate(self, company_id: Optional[int] = None) -> None:
+        """
+        Сбрасывает кэш операторов компании (или всех компаний, если company_id=None).
+        Следующая проверка роли перечитает список из БД.
+        """
+        if company_id is None:
+            self._operators.clear()
+        else:
+            self._operators.pop(company_id, None)
+
+    async def _load(self, company_id: int) -> Dict[int, OperatorInfo]:
+        async with async_session() as session:
+            result = await session.execute(
+                select(Operator.id, Operator.telegram_id, Operator.full_name).where(
+                    Operator.company_id == company_id,
+                    Operator.is_active == True
+                )
+            )
+            ops = {
+                int(tg_id): OperatorInfo(op_id, company_id, int(tg_id), full_name)
+                for op_id, tg_id, full_name in result.all()
+            }
+        self._operators[company_id] = (ops, time.monotonic())
+        return ops
+
+
+role_cache = RoleCache()
+# Операторов поменяли в другом процессе кластера — сбрасываем и свой кэш
+cache_bus.subscribe("roles", role_cache.invalidate)
@@ -0,0 +1,106 @@
+# bot/routing.py
+
+import logging
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from sqlalchemy.future import select
+
+from bot.database import async_session
+from bot.models import Ticket
+from bot.pubsub import cache_bus
+
+logger = logging.getLogger(__name__)
+
+
+class Route(NamedTuple):
+    """Активный тикет (in_progress): кто клиент и какой оператор его ведёт."""
+    ticket_id: int
+    customer_id: int
+    operator_id: int
+
+
+class RoutingTable:
+    """
+    Таблица маршрутов пересылки в памяти — чтобы сообщение клиента или оператора
+    в активном тикете пересылалось без чтения тикета из БД:
+      • by_ticket   — ticket_id → Route (для оператора: current_ticket лежит в FSM);
+      • by_customer — user_id клиента → его активные тикеты; сообщение идёт в самый
+        ранний, как раньше делал get_active_ticket_by_user.
+    Заполняется load() при старте (dp.startup) и обновляется после commit принятия и
+    закрытия тикета (handle_ticket_action); в кластере изменения расходятся по
+    остальным воркерам через cache_bus (канал "routes").
+    listeners(kind, route) вызываются на каждое изменение: "assign", "close" и
+    "reset" (route=None) перед перечитыванием из БД — так bot/assignment.py
+    ведёт загрузку операторов.
+    """
+
+    def __init__(self):
+        self.by_ticket: Dict[int, Route] = {}
+        self.by_customer: Dict[int, Dict[int, Route]] = {}
+        self.listeners: List[Callable[[str, Optional[Route]], None]] = []
+
+    def _notify(self, kind: str, route: Optional[Route]) -> None:
+        for listener in self.listeners:
+            listener(kind, route)
+
+    def for_customer(self, customer_id: int) -> Optional[Route]:
+        tickets = self.by_customer.get(customer_id)
+        if not tickets:
+            return None
+        return tickets[min(tickets)]
+
+    def for_ticket(self, ticket_id: int) -> Optional[Route]:
+        return self.by_ticket.get(ticket_id)
+
+    def assign(self, ticket_id: int, customer_id: int, operator_id: int) -> None:
+        route = Route(ticket_id, customer_id, operator_id)
+        self.by_ticket[ticket_id] = route
+        self.by_customer.setdefault(customer_id, {})[ticket_id] = route
+        self._notify("assign", route)
+
+    def close(self, ticket_id: int) -> None:
+        route = self.by_ticket.pop(ticket_id, None)
+        if route is None:
+            return
+        tickets = self.by_customer.get(route.customer_id)
+        if tickets is not None:
+            tickets.pop(ticket_id, None)
+            if not tickets:
+                del self.by_customer[route.customer_id]
+        self._notify("close", route)
+
+    def publish_assign(self, ticket_id: int, customer_id: int, operator_id: int) -> None:
+        """assign() здесь и во всех остальных воркерах кластера."""
+        self.assign(ticket_id, customer_id, operator_id)
+        cache_bus.publish("routes", ["assign", ticket_id, customer_id, operator_id])
+
+    def publish_close(self, ticket_id: int) -> None:
+        """close() здесь и во всех остальных воркерах кластера."""
+        self.close(ticket_id)
+        cache_bus.publish("routes", ["close", ticket_id])
+
+    def apply(self, event: list) -> None:
+        """Событие из cache_bus от другого воркера."""
+        if event[0] == "assign":
+            self.assign(*event[1:])
+        elif event[0] == "close":
+            self.close(event[1])
+
+    async def load(self) -> None:
+        """Перечитывает все тикеты in_progress из БД (регистрируется в dp.startup)."""
+        async with async_session() as session:
+            result = await session.execute(
+                select(Ticket.id, Ticket.user_id, Ticket.operator_id)
+                .where(Ticket.status == "in_progress")
+            )
+            rows = result.all()
+        self.by_ticket.clear()
+        self.by_customer.clear()
+        self._notify("reset", None)
+        for ticket_id, user_id, operator_id in rows:
+            self.assign(ticket_id, int(user_id), int(operator_id))
+        logger.info("Routing table: loaded %s active tickets", len(rows))
+
+
+routing_table = RoutingTable()
+cache_bus.subscribe("routes", routing_table.apply)
@@ -0,0 +1,192 @@
+# bot/search.py
+#
+# Полнотекстовый поиск по FAQ.
+#   • SQLite      — отдельная FTS5-таблица faq_entries_fts (rowid = faq_entries.id),
+#                   которую синхронизируют create/update/delete_faq_entry в bot/crud.py;
+#   • PostgreSQL  — GIN-индекс по to_tsvector(question || ' ' || answer),
+#                   его PostgreSQL поддерживает в актуальном состоянии сам;
+#   • иначе       — прежний ILIKE '%kw%' как запасной вариант.
+
+import re
+from typing import List, Optional
+
+from sqlalchemy import bindparam, func, literal_column, or_, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+from sqlalchemy.future import select
+
+from bot.models import FAQEntry
+
+FAQ_SEARCH_LIMIT = 10
+FTS_TABLE = "faq_entries_fts"
+PG_FTS_CONFIG = "simple"
+# Выражение документа для PostgreSQL. Один и тот же текст используется и в DDL
+# индекса, и в запросе: планировщик берёт GIN-индекс по выражению, только если
+# выражение в запросе совпадает с индексным (bind-параметры вместо литералов не подходят).
+PG_FTS_DOCUMENT = f"to_tsvector('{PG_FTS_CONFIG}'::regconfig, question || ' ' || answer)"
+
+# Результат проверки, есть ли FTS5-таблица в SQLite (None — ещё не проверяли)
+_fts5_ready: Optional[bool] = None
+
+
+def _tokens(keyword: str) -> List[str]:
+    return re.findall(r"\w+", keyword.lower())
+
+
+async def init_faq_search(conn: AsyncConnection) -> None:
+    """
+    Создаёт поисковый индекс, если его ещё нет. Вызывается из init_models().
+    Для SQLite при первом создании FTS-таблица заполняется из faq_entries.
+    """
+    global _fts5_ready
+    dialect = conn.dialect.name
+
+    if dialect == "sqlite":
+        exists = await conn.scalar(
+            text("SELECT 1 FROM sqlite_master WHERE type='table' AND name=:name"),
+            {"name": FTS_TABLE}
+        )
+        if exists:
+            _fts5_ready = True
+            return
+        try:
+            await conn.execute(text(
+                f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                "question, answer, company_id UNINDEXED, "
+                "tokenize='unicode61 remove_diacritics 2')"
+            ))
+        except Exception:
+            # SQLite собран без FTS5 — остаёмся на ILIKE
+            _fts5_ready = False
+            return
+        await conn.execute(text(
+            f"INSERT INTO {FTS_TABLE}(rowid, question, answer, company_id) "
+            "SELECT id, question, answer, company_id FROM faq_entries"
+        ))
+        _fts5_ready = True
+
+    elif dialect == "postgresql":
+        await conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_faq_entries_fts ON faq_entries USING GIN "
+            f"(({PG_FTS_DOCUMENT}))"
+        ))
+
+
+async def _use_fts5(session: AsyncSession) -> bool:
+    global _fts5_ready
+    if session.bind.dialect.name != "sqlite":
+        return False
+    if _fts5_ready is None:
+        exists = await session.scalar(
+            text("SELECT 1 FROM sqlite_master WHERE type='table' AND name=:name"),
+            {"name": FTS_TABLE}
+        )
+        _fts5_ready = bool(exists)
+    return _fts5_ready
+
+
+# === Синхронизация индекса (вызывается из crud в той же транзакции) ===
+
+async def index_faq_entry(session: AsyncSession, entry: FAQEntry) -> None:
+    if not await _use_fts5(session):
+        return
+    await session.execute(
+        text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), {"id": entry.id}
+    )
+    await session.execute(
+        text(
+            f"INSERT INTO {FTS_TABLE}(rowid, question, answer, company_id) "
+            "VALUES (:id, :question, :answer, :company_id)"
+        ),
+        {
+            "id": entry.id,
+            "question": entry.question,
+            "answer": entry.answer,
+            "company_id": entry.company_id,
+        }
+    )
+
+
+async def reindex_faq_entries(session: AsyncSession, entry_ids: List[int]) -> None:
+    """Пересобирает строки индекса для пачки пунктов (массовый импорт): один DELETE и один INSERT ... SELECT."""
+    if not entry_ids or not await _use_fts5(session):
+        return
+    ids = bindparam("ids", expanding=True)
+    await session.execute(
+        text(f"DELETE FROM {FTS_TABLE} WHERE rowid IN :ids").bindparams(ids), {"ids": entry_ids}
+    )
+    await session.execute(
+        text(
+            f"INSERT INTO {FTS_TABLE}(rowid, question, answer, company_id) "
+            "SELECT id, question, answer, company_id FROM faq_entries WHERE id IN :ids"
+        ).bindparams(ids),
+        {"ids": entry_ids}
+    )
+
+
+async def unindex_faq_entry(session: AsyncSession, entry_id: int) -> None:
+    if not await _use_fts5(session):
+        return
+    await session.execute(
+        text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), {"id": entry_id}
+    )
+
+
+# === Поиск ===
+
+async def search_faq(
+    session: AsyncSession,
+    company_id: int,
+    keyword: str,
+    limit: int = FAQ_SEARCH_LIMIT
+) -> List[FAQEntry]:
+    """
+    Ищет пункты FAQ по словам из keyword (каждое слово — префикс, все слова обязательны).
+    Результаты отсортированы по релевантности и обрезаны до limit.
+    """
+    tokens = _tokens(keyword)
+    if not tokens:
+        return []
+
+    dialect = session.bind.dialect.name
+
+    if await _use_fts5(session):
+        match = " ".join(f'"{t}"*' for t in tokens)
+        rows = await session.execute(
+            text(
+                f"SELECT rowid FROM {FTS_TABLE} "
+                f"WHERE {FTS_TABLE} MATCH :match AND company_id = :company_id "
+                "ORDER BY rank LIMIT :limit"
+            ),
+            {"match": match, "company_id": company_id, "limit": limit}
+        )
+        ids = [r[0] for r in rows.all()]
+        if not ids:
+            return []
+        result = await session.execute(select(FAQEntry).where(FAQEntry.id.in_(ids)))
+        by_id = {e.id: e for e in result.scalars().all()}
+        return [by_id[i] for i in ids if i in by_id]
+
+    if dialect == "postgresql":
+        document = literal_column(PG_FTS_DOCUMENT)
+        query = func.to_tsquery(
+            literal_column(f"'{PG_FTS_CONFIG}'::regconfig"),
+            " & ".join(f"{t}:*" for t in tokens)
+        )
+        result = await session.execute(
+            select(FAQEntry)
+            .where(FAQEntry.company_id == company_id, document.op("@@")(query))
+            .order_by(func.ts_rank(document, query).desc())
+            .limit(limit)
+        )
+        return result.scalars().all()
+
+    result = await session.execute(
+        select(FAQEntry).where(
+            FAQEntry.company_id == company_id,
+            or_(
+                FAQEntry.question.ilike(f"%{keyword}%"),
+                FAQEntry.answer.ilike(f"%{keyword}%")
+            )
+        ).limit(limit)
+    )
+    return result.scalars().all()
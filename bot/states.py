@@ -6,3 +6,10 @@ class OperatorStates(StatesGroup):
     # Это состояние говорит, что оператор находится в режиме “отвечать клиенту”
     # и может использовать `current_ticket` из FSMContext, чтобы понимать, кому шлёт сообщение
     chatting = State()
+
+
+class CustomerStates(StatesGroup):
+    # Клиент открыл FAQ: любой текст считается поисковым запросом
+    browsing_faq = State()
+    # Клиент нажал «Связаться с оператором»: следующий текст станет тикетом
+    awaiting_ticket_text = State()
@@ -0,0 +1,138 @@
+# bot/transcript.py
+
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from aiogram.types import Message
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.crud import add_ticket_messages
+from bot.database import after_commit, async_session
+
+logger = logging.getLogger(__name__)
+
+# Пачка уходит в БД, когда накопилось столько сообщений или прошло столько секунд
+TRANSCRIPT_BATCH_SIZE = 500
+TRANSCRIPT_FLUSH_INTERVAL = 1.0
+
+TO_OPERATOR = "to_operator"
+TO_CUSTOMER = "to_customer"
+
+
+def message_text(message: Message) -> str:
+    """Текст сообщения для пересылки и журнала: у фото, стикера и т.п. — подпись или тип."""
+    return message.text or message.caption or f"<{message.content_type.value}>"
+
+
+class Transcript:
+    """
+    Журнал переписки по тикетам (таблица ticket_messages) с отложенной записью:
+      • record() вызывается из хэндлера пересылки и только откладывает строку в буфер
+        (после commit апдейта — откаченная пересылка в журнал не попадёт);
+      • фоновая задача раз в flush_interval или при batch_size строках вставляет буфер
+        одним INSERT ... VALUES; хэндлер своего commit на журнал не тратит.
+    stop() (dp.shutdown) дописывает остаток. При аварийном падении теряется не больше
+    последних flush_interval секунд журнала — сами сообщения доставит outbox.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = TRANSCRIPT_BATCH_SIZE,
+        flush_interval: float = TRANSCRIPT_FLUSH_INTERVAL
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enabled = True
+        self.written = 0
+        self._buffer: List[dict] = []
+        self._flush_now: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def record(self, session: AsyncSession, ticket_id: int, direction: str, message: Message) -> None:
+        if not self.enabled:
+            return
+        row = {
+            "ticket_id": ticket_id,
+            "direction": direction,
+            "sender_id": str(message.from_user.id),
+            "text": message_text(message),
+            "chat_id": message.chat.id,
+            "message_id": message.message_id,
+            "created_at": datetime.now(timezone.utc),
+        }
+        after_commit(session, lambda: self._append(row))
+
+    def _append(self, row: dict) -> None:
+        self._buffer.append(row)
+        if self._task is None:
+            self._flush_now = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+        if len(self._buffer) >= self.batch_size:
+            self._flush_now.set()
+
+    async def flush(self) -> int:
+        """Записывает весь буфер (пачками по batch_size); возвращает число строк."""
+        if not self._buffer:
+            return 0
+        batch, self._buffer = self._buffer, []
+        try:
+            async with async_session() as session:
+                for start in range(0, len(batch), self.batch_size):
+                    await add_ticket_messages(session, batch[start:start + self.batch_size])
+                await session.commit()
+        except (IntegrityError, DataError):
+            # Повтор той же пачки упадёт так же и застопорит журнал — пишем по строке
+            return await self._flush_one_by_one(batch)
+        except BaseException:
+            # Не потеряли — вернём в начало буфера, запишем со следующей пачкой
+            self._buffer[:0] = batch
+            raise
+        self.written += len(batch)
+        return len(batch)
+
+    async def _flush_one_by_one(self, batch: List[dict]) -> int:
+        """Записывает строки по одной; строки, которые БД отвергла, уходят в лог и отбрасываются."""
+        written = 0
+        async with async_session() as session:
+            for row in batch:
+                try:
+                    async with session.begin_nested():
+                        await add_ticket_messages(session, [row])
+                except (IntegrityError, DataError) as e:
+                    logger.error("Transcript: dropped row %r: %s", row, e.orig)
+                    continue
+                written += 1
+            await session.commit()
+        self.written += written
+        return written
+
+    async def stop(self) -> None:
+        """Останавливает фоновую запись и дописывает буфер (регистрируется в dp.shutdown)."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_now.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_now.clear()
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Transcript: flush failed")
+
+
+transcript = Transcript()
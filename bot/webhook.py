@@ -0,0 +1,110 @@
+# bot/webhook.py
+#
+# Режим webhook: Telegram сам присылает апдейты POST-запросами на aiohttp-сервер,
+# вместо последовательного цикла getUpdates. Запуск: python -m bot.main --mode webhook
+
+import asyncio
+import logging
+import secrets
+from typing import List, Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from bot.config import config
+from bot.metrics import setup_metrics_route
+
+logger = logging.getLogger(__name__)
+
+
+def concurrency_limit_middleware(limit: int):
+    """
+    Не даёт обрабатывать больше limit апдейтов одновременно: лишние запросы ждут
+    своей очереди, а не конкурируют за пул соединений БД.
+    """
+    semaphore = asyncio.Semaphore(limit)
+
+    @web.middleware
+    async def _middleware(request: web.Request, handler):
+        async with semaphore:
+            return await handler(request)
+
+    return _middleware
+
+
+def create_webhook_app(
+    bot: Bot,
+    dp: Dispatcher,
+    secret_token: Optional[str] = None,
+    path: str = config.webhook_path,
+    max_connections: int = config.webhook_max_connections
+) -> web.Application:
+    """
+    Собирает aiohttp-приложение с обработчиком апдейтов на path.
+      • запросы без правильного X-Telegram-Bot-Api-Secret-Token получают 401;
+      • апдейт обрабатывается прямо в запросе (handle_in_background=False): если
+        хэндлер вернул метод API (return message.answer(...)), он уходит в теле
+        ответа на webhook — без отдельного HTTP-запроса к Telegram;
+      • одновременно обрабатывается не больше max_connections апдейтов;
+      • GET METRICS_PATH отдаёт метрики (bot/metrics.py).
+    dp.startup / dp.shutdown вызываются вместе со стартом и остановкой приложения.
+    """
+    app = web.Application(middlewares=[concurrency_limit_middleware(max_connections)])
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        handle_in_background=False,
+        secret_token=secret_token,
+    ).register(app, path=path)
+    # Метрики Prometheus на том же порту (GET, без секретного токена)
+    setup_metrics_route(app)
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+def webhook_secret_token() -> Optional[str]:
+    """WEBHOOK_SECRET из .env; если не задан, но webhook регистрируем сами — случайный."""
+    secret_token = config.webhook_secret
+    if config.webhook_url and not secret_token:
+        secret_token = secrets.token_urlsafe(32)
+    if not secret_token:
+        logger.warning("WEBHOOK_SECRET не задан: запросы на %s не проверяются", config.webhook_path)
+    return secret_token
+
+
+async def register_webhook(bot: Bot, secret_token: Optional[str], allowed_updates: List[str]) -> None:
+    """Вызывает setWebhook, если задан WEBHOOK_URL (иначе webhook настроен снаружи)."""
+    if not config.webhook_url:
+        return
+    await bot.set_webhook(
+        url=config.webhook_url.rstrip("/") + config.webhook_path,
+        secret_token=secret_token,
+        max_connections=config.webhook_max_connections,
+        allowed_updates=allowed_updates,
+    )
+    logger.info("Webhook установлен: %s%s", config.webhook_url, config.webhook_path)
+
+
+async def serve_app(app: web.Application) -> None:
+    """Слушает WEBAPP_HOST:WEBAPP_PORT, пока задачу не отменят."""
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host=config.webapp_host, port=config.webapp_port)
+    await site.start()
+    logger.info("Webhook-сервер слушает %s:%s", config.webapp_host, config.webapp_port)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+async def run_webhook(bot: Bot, dp: Dispatcher) -> None:
+    """Регистрирует webhook в Telegram (если задан WEBHOOK_URL) и слушает порт до остановки."""
+    secret_token = webhook_secret_token()
+
+    async def set_webhook(bot: Bot) -> None:
+        await register_webhook(bot, secret_token, dp.resolve_used_update_types())
+
+    dp.startup.register(set_webhook)
+    await serve_app(create_webhook_app(bot, dp, secret_token=secret_token))
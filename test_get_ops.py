@@ -2,9 +2,11 @@
 
 import asyncio
 from bot.crud import get_active_operator_ids
+from bot.database import async_session
 
 async def main():
-    ops = await get_active_operator_ids(1)
+    async with async_session() as session:
+        ops = await get_active_operator_ids(session, 1)
     print("⊛ Результат get_active_operator_ids(1):", ops)
 
 if __name__ == "__main__":